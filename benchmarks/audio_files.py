@@ -0,0 +1,85 @@
+"""Functions for generating audio files to benchmark with.
+
+This file defines helpers for generating audio files of any length with
+FFmpeg, in the formats the file caches store audio in, so benchmarks play
+audio like what the bot plays, without downloading anything.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for spawning subprocesses for running command-line prompts
+import subprocess
+
+# Import operating system API for things like checking files exist
+import os
+
+# Import helper for managing new files
+from discord_slash_commands.helpers import file_cache
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+def make_audio_file(
+    directory: str,
+    length_in_seconds: float,
+    audio_format: str = file_cache.AUDIO_FORMAT_OPUS,
+    frequency: int = 440
+) -> str:
+    """Make a file of a sine wave, if it doesn't already exist.
+
+    Make a file of a sine wave at frequency Hz lasting length_in_seconds, in
+    directory, encoded the same way a file cache would store audio_format.
+
+    Args:
+        directory: The directory to make the file in
+        length_in_seconds: How long the audio should be
+        audio_format: The file extension of the format, from
+            file_cache.AUDIO_FORMAT_DICT, to encode the audio as
+        frequency: The pitch of the sine wave, in Hz
+
+    Returns:
+        The path to the file.
+
+    Raises:
+        OSError: FFmpeg could not make the file.
+    """
+    file_path = f"{directory}/sine_{frequency}hz_{length_in_seconds}s." \
+        + audio_format
+    if os.path.isfile(file_path):
+        return file_path
+
+    encoder, bitrate, sample_rate = file_cache.AUDIO_FORMAT_DICT[audio_format]
+    os.makedirs(directory, exist_ok = True)
+    try:
+        subprocess.run([
+            # Command name, don't ask before overwriting files, only print
+            # errors
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            # Input, a generated sine wave
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency={frequency}:duration={length_in_seconds}",
+            # Use encoder for audio_format, in stereo, like audio from YouTube
+            "-ac",
+            "2",
+            "-c:a",
+            encoder,
+        ] + (["-b:a", bitrate] if bitrate is not None else []) \
+        + (["-ar", sample_rate] if sample_rate is not None else []) \
+        + [
+            # Output file
+            file_path,
+        ], check = True)
+    except subprocess.CalledProcessError as error:
+        # Don't leave a partial file, to be mistaken for a finished one later
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+        raise OSError(f"FFmpeg could not make {file_path}.") from error
+    return file_path
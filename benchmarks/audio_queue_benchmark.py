@@ -0,0 +1,358 @@
+"""Benchmarks of the audio queue, run without Discord.
+
+This file runs the audio queue against fake Discord objects and generated audio
+files, and prints how long audio takes to start playing, how much CPU playing
+audio takes, what higher priority audio interrupting lower priority audio
+costs, and how long queue operations take on large queues, so changes to the
+audio queue and its audio sources can be evaluated before they reach a guild.
+Needs FFmpeg, and py-cord[voice] for the Opus library.
+Run it from the root of the repository with:
+python3 -m benchmarks.audio_queue_benchmark
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for parsing command-line arguments
+import argparse
+
+# Import API for waiting on events without blocking the bot
+import asyncio
+
+# Import API for getting the CPU time used by this process and its children
+import resource
+
+# Import API for keeping track of time
+import time
+
+# Import API for finding shared libraries, such as Opus
+import ctypes.util
+
+# Import Discord Python API
+import discord
+
+# Import stand-ins for Discord objects
+from benchmarks import fake_discord
+
+# Import helper for generating audio files
+from benchmarks import audio_files
+
+# Import helper for queueing audio in voice chat
+from discord_slash_commands.helpers import audio_queue
+
+# Import helper for shaping audio before it's played
+from discord_slash_commands.helpers import audio_source
+
+# Import helper for measuring how long audio takes to play
+from discord_slash_commands.helpers import audio_latency
+
+# Import helper for managing new files
+from discord_slash_commands.helpers import file_cache
+
+#==============================================================================#
+# Define constants                                                             #
+#==============================================================================#
+
+# Default directory to generate audio files in
+DEFAULT_DIRECTORY = f"{file_cache.CACHE_DIR}/benchmark"
+
+# Default number of times faster than real time to play audio, where not
+# measuring latency, 0 = as fast as possible
+DEFAULT_SPEED = 0
+
+# Queue sizes to time queue operations at
+QUEUE_SIZE_TUPLE = (100, 1000, 10000, 100000)
+
+# Most audio files to time each queue operation on, other than adding and
+# removing, which are timed on every audio file
+MAX_NUM_OPERATIONS = 1000
+
+# Number of times faster than real time to play audio while measuring
+# preemption, if told to play audio as fast as possible, since interruptions
+# are timed in real time
+DEFAULT_PREEMPTION_SPEED = 10
+
+# Number of seconds to wait for audio to finish before giving up
+TIMEOUT_SECONDS = 600
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+def get_cpu_seconds() -> float:
+    """Get the CPU time used by this process and its finished children.
+
+    Returns:
+        The user and system CPU time, in seconds, used by this process and
+        every child process, such as FFmpeg, that has finished.
+    """
+    cpu_seconds = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu_seconds += usage.ru_utime + usage.ru_stime
+    return cpu_seconds
+
+
+
+def count_audio_sources_made() -> list:
+    """Count every audio source the audio queue makes from now on.
+
+    Wrap audio_queue.AudioQueueElement.make_audio_source(), so each call,
+    which each starts an FFmpeg process, is counted.
+
+    Returns:
+        A list whose only element is the number of audio sources made so far.
+    """
+    counter = [0]
+    make_audio_source = audio_queue.AudioQueueElement.make_audio_source
+    def counting_make_audio_source(self, *args, **kwargs):
+        counter[0] += 1
+        return make_audio_source(self, *args, **kwargs)
+    audio_queue.AudioQueueElement.make_audio_source = counting_make_audio_source
+    return counter
+
+
+
+async def wait_until_empty(audio_queue_list: audio_queue.AudioQueueList):
+    """Wait until audio_queue_list has played everything in it.
+
+    Args:
+        audio_queue_list: The AudioQueueList to wait on
+
+    Raises:
+        TimeoutError: Audio took longer than TIMEOUT_SECONDS to finish.
+    """
+    deadline = time.time() + TIMEOUT_SECONDS
+    while audio_queue_list.get_num_audio_files_queued() > 0:
+        if time.time() > deadline:
+            raise TimeoutError("Audio took too long to finish playing.")
+        await asyncio.sleep(.01)
+
+
+
+async def benchmark_scheduler_latency(directory: str) -> None:
+    """Print how long short clips take to start playing, in real time.
+
+    Queue short clips one at a time, each after the last finished, as TTS
+    messages would be, and print the percentiles of each stage of getting them
+    to play.
+
+    Args:
+        directory: The directory to generate audio files in
+    """
+    file_path = audio_files.make_audio_file(directory, 1)
+    ctx = fake_discord.FakeApplicationContext(guild_id = 1)
+    audio_queue_list = audio_queue.AudioQueueList(
+        fake_discord.FakeVoiceClient(speed = 1.0),
+        ctx.guild_id
+    )
+    for _ in range(20):
+        audio_queue_list.add(ctx, "clip", file_path, audio_queue.HIGH_PRIORITY)
+        await wait_until_empty(audio_queue_list)
+    audio_queue_list.close()
+
+    print("\nScheduler latency, 20 clips of 1s, each queued on its own:")
+    print(audio_latency.to_str(ctx.guild_id).strip())
+
+
+
+async def benchmark_cpu(directory: str, speed: float) -> None:
+    """Print how much CPU each way of playing audio takes per second of audio.
+
+    Play 30s of audio passed through as Opus, changed in volume, and mixed
+    with other audio, and print the CPU time each took, including FFmpeg and
+    encoding, per second of audio played.
+
+    Args:
+        directory: The directory to generate audio files in
+        speed: How many times faster than real time to play audio
+    """
+    file_path = audio_files.make_audio_file(directory, 30)
+    other_file_path = audio_files.make_audio_file(directory, 30, frequency=660)
+
+    print("\nCPU per second of audio played:")
+    for name, gain, is_mixed in (
+        ("Opus passed through", 1.0, False),
+        ("Volume changed", 2.0, False),
+        ("Mixed with higher priority audio", 1.0, True),
+    ):
+        ctx = fake_discord.FakeApplicationContext(guild_id = 2)
+        voice_client = fake_discord.FakeVoiceClient(speed, encode = True)
+        audio_queue_list = audio_queue.AudioQueueList(
+            voice_client,
+            ctx.guild_id
+        )
+        cpu_seconds = get_cpu_seconds()
+        audio_queue_list.add(
+            ctx,
+            "music",
+            file_path,
+            audio_queue.LOW_PRIORITY,
+            gain = gain
+        )
+        if is_mixed:
+            await asyncio.sleep(.1)
+            audio_queue_list.add(
+                ctx,
+                "speech",
+                other_file_path,
+                audio_queue.HIGH_PRIORITY
+            )
+        await wait_until_empty(audio_queue_list)
+        audio_queue_list.close()
+        await voice_client.disconnect()
+        cpu_seconds = get_cpu_seconds() - cpu_seconds
+        audio_seconds = len(voice_client.frame_log_list) \
+            * audio_source.FRAME_LENGTH_SECONDS
+        print(f"{name}: {cpu_seconds / audio_seconds * 1000:.2f}ms CPU per " \
+            + f"second of audio, over {audio_seconds:.1f}s of audio")
+
+
+
+async def benchmark_preemption(directory: str, speed: float) -> None:
+    """Print what high priority audio interrupting low priority audio costs.
+
+    Play long low priority audio, interrupted by a short high priority clip
+    every 2 seconds, with and without ducking, and print how long the clips
+    took to start, how many audio sources (FFmpeg processes) were made, and
+    the CPU time taken.
+
+    Args:
+        directory: The directory to generate audio files in
+        speed: How many times faster than real time to play audio,
+            DEFAULT_PREEMPTION_SPEED if 0
+    """
+    if speed <= 0:
+        speed = DEFAULT_PREEMPTION_SPEED
+    music_file_path = audio_files.make_audio_file(directory, 30)
+    clip_file_path = audio_files.make_audio_file(directory, 1, frequency=660)
+    counter = count_audio_sources_made()
+
+    print("\nPreemption, 30s of music interrupted by 10 clips of 1s:")
+    for guild_id, is_ducking_enabled in ((3, True), (4, False)):
+        ctx = fake_discord.FakeApplicationContext(guild_id = guild_id)
+        voice_client = fake_discord.FakeVoiceClient(speed, encode = True)
+        audio_queue_list = audio_queue.AudioQueueList(
+            voice_client,
+            ctx.guild_id
+        )
+        audio_queue_list.is_ducking_enabled = is_ducking_enabled
+        counter[0] = 0
+        cpu_seconds = get_cpu_seconds()
+        audio_queue_list.add(
+            ctx,
+            "music",
+            music_file_path,
+            audio_queue.LOW_PRIORITY
+        )
+        for _ in range(10):
+            await asyncio.sleep(2 / speed)
+            audio_queue_list.add(
+                ctx,
+                "clip",
+                clip_file_path,
+                audio_queue.HIGH_PRIORITY
+            )
+        await wait_until_empty(audio_queue_list)
+        audio_queue_list.close()
+        await voice_client.disconnect()
+        cpu_seconds = get_cpu_seconds() - cpu_seconds
+        _, percentile_list = audio_latency.get_percentiles(guild_id)[
+            audio_latency.STAGE_TOTAL
+        ]
+        print(f"Ducking {'on' if is_ducking_enabled else 'off'}: " \
+            + f"{counter[0]} audio sources made, {cpu_seconds:.2f}s CPU, " \
+            + f"start latency p50 {percentile_list[0] * 1000:.0f}ms, " \
+            + f"p90 {percentile_list[1] * 1000:.0f}ms")
+
+
+
+async def benchmark_queue_operations() -> None:
+    """Print how long queue operations take on queues of different sizes.
+
+    Fill a paused audio queue, so nothing plays, with each of QUEUE_SIZE_TUPLE
+    audio files, and print how long adding, getting, bumping, finding the
+    position of, and removing audio takes on average. Getting, bumping, and
+    finding the position of audio is timed on up to MAX_NUM_OPERATIONS audio
+    files spread across the queue.
+    """
+    print("\nQueue operations, average time per operation:")
+    for queue_size in QUEUE_SIZE_TUPLE:
+        ctx = fake_discord.FakeApplicationContext(guild_id = 5)
+        audio_queue_list = audio_queue.AudioQueueList(
+            fake_discord.FakeVoiceClient(),
+            ctx.guild_id
+        )
+        audio_queue_list.pause()
+        audio_queue_list.max_queue_length = queue_size
+        time_dict = {}
+
+        # Give each audio file its own path, so none could be coalesced
+        start_time = time.perf_counter()
+        id_list = [
+            audio_queue_list.add(
+                ctx,
+                "clip",
+                f"clip_{index}",
+                audio_queue.LOW_PRIORITY
+            ) for index in range(queue_size)
+        ]
+        time_dict["add"] = (time.perf_counter() - start_time) / queue_size
+        sample_id_list = id_list[::max(1, queue_size // MAX_NUM_OPERATIONS)]
+        for name, operation, operation_id_list in (
+            ("get", audio_queue_list.get, sample_id_list),
+            ("bump", audio_queue_list.move_to_front, sample_id_list),
+            (
+                "find position",
+                audio_queue_list.get_index_in_queue,
+                sample_id_list
+            ),
+            ("remove", audio_queue_list.remove, id_list),
+        ):
+            start_time = time.perf_counter()
+            for audio_queue_element_id in operation_id_list:
+                operation(audio_queue_element_id)
+            time_dict[name] = (time.perf_counter() - start_time) \
+                / len(operation_id_list)
+        audio_queue_list.close()
+
+        print(f"{queue_size} audio files: " + ", ".join([
+            f"{name} {seconds * 1000000:.2f}us" \
+            for name, seconds in time_dict.items()
+        ]))
+
+
+
+async def main() -> None:
+    """Run every benchmark, with options from the command line."""
+    argument_parser = argparse.ArgumentParser(description = __doc__)
+    argument_parser.add_argument(
+        "--directory",
+        default = DEFAULT_DIRECTORY,
+        help = "the directory to generate audio files in"
+    )
+    argument_parser.add_argument(
+        "--speed",
+        type = float,
+        default = DEFAULT_SPEED,
+        help = "how many times faster than real time to play audio, where " \
+            + "not measuring latency, 0 = as fast as possible"
+    )
+    arguments = argument_parser.parse_args()
+
+    # Load the system's Opus library, to encode audio like Discord
+    if not discord.opus.is_loaded():
+        opus_library_path = ctypes.util.find_library("opus")
+        if opus_library_path is None:
+            raise OSError("Could not find the Opus library, install libopus.")
+        discord.opus.load_opus(opus_library_path)
+    await benchmark_scheduler_latency(arguments.directory)
+    await benchmark_cpu(arguments.directory, arguments.speed)
+    await benchmark_preemption(arguments.directory, arguments.speed)
+    await benchmark_queue_operations()
+
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
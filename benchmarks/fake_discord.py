@@ -0,0 +1,298 @@
+"""Stand-ins for Discord objects, for exercising the bot without Discord.
+
+This file defines fake versions of the Discord objects the audio queue needs,
+such as a voice client that reads audio sources like Discord's audio player
+does, in real time or faster, but sends their audio nowhere, so the audio queue
+can be run and measured on any computer, without connecting to Discord.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for sharing data between threads safely
+import threading
+
+# Import API for keeping track of time
+import time
+
+# Import Discord Python API
+import discord
+
+# Import helper for shaping audio before it's played
+from discord_slash_commands.helpers import audio_source
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+class FakeVoiceClient():
+    """Define a stand-in for discord.VoiceClient that sends audio nowhere.
+
+    Define a voice client that, like discord.VoiceClient, reads its audio
+    source in another thread, one frame every 20ms, until it runs out of audio
+    or is stopped, then calls its after function, but only keeps a log of the
+    frames read, instead of sending them to Discord.
+
+    Attributes:
+        speed: How many times faster than real time to read frames, for
+            example, 1.0 = real time, 10.0 = 10x faster. 0 = as fast as
+            possible.
+        encoder: A discord.opus.Encoder to encode PCM frames with, as
+            discord.VoiceClient would before sending them, None to not encode
+            them.
+        source: The audio source being played, None if none has been.
+        frame_log_list: A list of a tuple for every frame read, of when it was
+            read, measured in seconds since the last epoch, whether it was Opus
+            encoded, and its length in bytes.
+        stop_event: A threading.Event set to stop playing self.source.
+        thread: The threading.Thread reading self.source, None if none has.
+    """
+    def __init__(self, speed: float = 1.0, encode: bool = False):
+        """Initialize this FakeVoiceClient.
+
+        Set the members of this FakeVoiceClient to their defaults or passed in
+        values.
+
+        Args:
+            self: This FakeVoiceClient
+            speed: What to initialize self.speed as
+            encode: Whether to encode PCM frames, which needs the Opus library
+                to be loaded
+        """
+        self.speed = speed
+        self.encoder = discord.opus.Encoder() if encode is True else None
+        self.source = None
+        self.frame_log_list = []
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def play(self, source: discord.AudioSource, *, after = None) -> None:
+        """Start reading source in another thread.
+
+        Args:
+            self: This FakeVoiceClient
+            source: The audio source to play
+            after: A function called with any error raised while playing
+                source, once it's done playing
+
+        Raises:
+            discord.ClientException: Already playing audio.
+            TypeError: source is not a discord.AudioSource, or after is not
+                callable.
+        """
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        if not isinstance(source, discord.AudioSource):
+            raise TypeError(
+                f"source must be an AudioSource not {type(source).__name__}"
+            )
+        if after is not None and not callable(after):
+            raise TypeError('Expected a callable for the "after" parameter.')
+        self.source = source
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target = self.run,
+            args = (source, self.stop_event, after),
+            daemon = True
+        )
+        self.thread.start()
+
+    def run(
+        self,
+        source: discord.AudioSource,
+        stop_event: threading.Event,
+        after
+    ) -> None:
+        """Read source until it runs out of audio or stop_event is set.
+
+        Read source one frame at a time, every 20ms divided by self.speed, the
+        same way discord.VoiceClient's audio player does, then clean up source
+        and call after.
+
+        Args:
+            self: This FakeVoiceClient
+            source: The audio source to play
+            stop_event: The threading.Event set to stop playing source
+            after: A function called with any error raised while playing
+                source, once it's done playing
+        """
+        error = None
+        try:
+            num_frames = 0
+            start_time = time.perf_counter()
+            while not stop_event.is_set():
+                frame = source.read()
+                if not frame:
+                    break
+                is_opus = source.is_opus()
+                if self.encoder is not None and not is_opus:
+                    self.encoder.encode(frame, self.encoder.SAMPLES_PER_FRAME)
+                self.frame_log_list.append((time.time(), is_opus, len(frame)))
+
+                # Wait until it's time for the next frame
+                num_frames += 1
+                if self.speed > 0:
+                    next_frame_time = start_time + num_frames \
+                        * audio_source.FRAME_LENGTH_SECONDS / self.speed
+                    time.sleep(max(0, next_frame_time - time.perf_counter()))
+        except Exception as exception:
+            error = exception
+        stop_event.set()
+        source.cleanup()
+        if after is not None:
+            after(error)
+
+    def is_playing(self) -> bool:
+        """Get whether audio is being played.
+
+        Args:
+            self: This FakeVoiceClient
+
+        Returns:
+            Whether self.source is being read.
+        """
+        return self.thread is not None and not self.stop_event.is_set()
+
+    def is_connected(self) -> bool:
+        """Get whether this FakeVoiceClient is connected, which it always is.
+
+        Args:
+            self: This FakeVoiceClient
+
+        Returns:
+            True
+        """
+        return True
+
+    def stop(self) -> None:
+        """Stop playing audio.
+
+        Args:
+            self: This FakeVoiceClient
+        """
+        self.stop_event.set()
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        """Stop playing audio, and wait for it to stop.
+
+        Args:
+            self: This FakeVoiceClient
+            force: Ignored
+        """
+        self.stop()
+        if self.thread is not None:
+            self.thread.join()
+
+
+
+class FakeUser():
+    """Define a stand-in for discord.Member, with only what commands read.
+
+    Attributes:
+        id: The ID of this user.
+        name: The name of this user.
+        display_name: The name shown for this user.
+        nick: The nickname of this user in the guild, None if none.
+        voice: The voice state of this user, None if not in voice chat.
+    """
+    def __init__(self, user_id: int, name: str = "tester"):
+        """Initialize this FakeUser.
+
+        Args:
+            self: This FakeUser
+            user_id: What to initialize self.id as
+            name: What to initialize self.name and self.display_name as
+        """
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.nick = None
+        self.voice = None
+
+
+
+class FakeGuild():
+    """Define a stand-in for discord.Guild, with only what commands read.
+
+    Attributes:
+        id: The ID of this guild.
+        voice_client: The voice client connected in this guild, None if none.
+    """
+    def __init__(self, guild_id: int, voice_client = None):
+        """Initialize this FakeGuild.
+
+        Args:
+            self: This FakeGuild
+            guild_id: What to initialize self.id as
+            voice_client: What to initialize self.voice_client as
+        """
+        self.id = guild_id
+        self.voice_client = voice_client
+
+
+
+class FakeCommand():
+    """Define a stand-in for discord.SlashCommand, with only its name.
+
+    Attributes:
+        qualified_name: The full name of this command, for example
+            "tts play".
+    """
+    def __init__(self, qualified_name: str):
+        """Initialize this FakeCommand.
+
+        Args:
+            self: This FakeCommand
+            qualified_name: What to initialize self.qualified_name as
+        """
+        self.qualified_name = qualified_name
+
+
+
+class FakeApplicationContext():
+    """Define a stand-in for discord.ApplicationContext.
+
+    Define a context a slash command or the audio queue can be called with,
+    that keeps what is responded with, instead of sending it to Discord.
+
+    Attributes:
+        author: The FakeUser calling the command.
+        guild: The FakeGuild the command is called in.
+        guild_id: The ID of self.guild.
+        voice_client: The voice client connected in self.guild.
+        command: The FakeCommand being called.
+        response_list: A list of the content of every response.
+    """
+    def __init__(
+        self,
+        guild_id: int = 1,
+        author_user_id: int = 1,
+        command_name: str = "benchmark",
+        voice_client = None
+    ):
+        """Initialize this FakeApplicationContext.
+
+        Args:
+            self: This FakeApplicationContext
+            guild_id: What to initialize self.guild_id as
+            author_user_id: What to initialize self.author's ID as
+            command_name: What to initialize self.command's name as
+            voice_client: What to initialize self.voice_client as
+        """
+        self.author = FakeUser(author_user_id)
+        self.guild = FakeGuild(guild_id, voice_client)
+        self.guild_id = guild_id
+        self.voice_client = voice_client
+        self.command = FakeCommand(command_name)
+        self.response_list = []
+
+    async def respond(self, content: str = "", **kwargs) -> None:
+        """Keep content, instead of responding to Discord with it.
+
+        Args:
+            self: This FakeApplicationContext
+            content: The content of the response
+            kwargs: Ignored, such as ephemeral
+        """
+        self.response_list.append(content)
@@ -0,0 +1,128 @@
+"""Micro-benchmark of the CPU cost of changing the volume of voice chat audio.
+
+This file times how long each volume stage audio can be played through takes to
+read one 20ms frame, so the CPU cost of playing audio in each voice channel can
+be compared between them.
+Run it from the root of the repository with:
+python3 -m benchmarks.volume_benchmark
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for timing small bits of code
+import timeit
+
+# Import Discord Python API
+import discord
+
+# Import API for fast operations on arrays of audio samples
+import numpy
+
+# Import helper for shaping audio before it's played
+from discord_slash_commands.helpers import audio_source
+
+#==============================================================================#
+# Define constants                                                             #
+#==============================================================================#
+
+# Number of frames each volume stage reads per timing
+NUM_FRAMES = 5000
+
+# Number of timings taken of each volume stage, the fastest of which is kept
+NUM_REPEATS = 5
+
+# Gains to time each volume stage at
+GAIN_TUPLE = (1.0, .5, 2.0)
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+class RepeatingAudio(discord.AudioSource):
+    """Define a PCM audio source that reads the same frame forever.
+
+    Attributes:
+        frame: The 20ms of 16-bit 48kHz stereo PCM audio read every time.
+    """
+    def __init__(self, frame: bytes):
+        """Initialize this RepeatingAudio.
+
+        Args:
+            self: This RepeatingAudio
+            frame: What to initialize self.frame as
+        """
+        self.frame = frame
+
+    def read(self) -> bytes:
+        """Read self.frame.
+
+        Args:
+            self: This RepeatingAudio
+
+        Returns:
+            self.frame
+        """
+        return self.frame
+
+
+
+def time_per_frame(source: discord.AudioSource) -> float:
+    """Time how long source takes to read one frame.
+
+    Args:
+        source: The audio source to time
+
+    Returns:
+        The fastest number of seconds source took to read one frame, out of
+        NUM_REPEATS timings of NUM_FRAMES frames.
+    """
+    return min(timeit.repeat(
+        source.read,
+        number = NUM_FRAMES,
+        repeat = NUM_REPEATS
+    )) / NUM_FRAMES
+
+
+
+def main() -> None:
+    """Print how long each volume stage takes to read one frame, at each gain.
+
+    Time discord.PCMVolumeTransformer, if this version of Python still has the
+    audioop module it needs, and audio_source.VolumeAudio, reading random audio.
+    Print each time in microseconds, and as a percentage of the 20ms each frame
+    lasts, which is the share of one CPU core each voice channel playing audio
+    through that stage takes.
+    """
+    # Make a frame of random audio
+    frame = numpy.random.default_rng(0).integers(
+        -32768,
+        32768,
+        size = audio_source.FRAME_NUM_SAMPLES,
+        dtype = numpy.int16
+    ).tobytes()
+
+    # Time each volume stage, at each gain
+    for gain in GAIN_TUPLE:
+        source_dict = {
+            "audio_source.VolumeAudio":
+                audio_source.VolumeAudio(RepeatingAudio(frame), gain)
+        }
+        try:
+            source_dict["discord.PCMVolumeTransformer"] = \
+                discord.PCMVolumeTransformer(RepeatingAudio(frame), gain)
+        except (ImportError, AttributeError):
+            print("discord.PCMVolumeTransformer cannot be timed, since " \
+                + "audioop is not available in this version of Python.")
+        for name, source in source_dict.items():
+            seconds = time_per_frame(source)
+            print(f"{name} at gain {gain}: {seconds * 1000000:.2f}us per " \
+                + "frame, " \
+                + f"{seconds / audio_source.FRAME_LENGTH_SECONDS * 100:.3f}% " \
+                + "of a CPU core per voice channel")
+
+
+
+if __name__ == "__main__":
+    main()
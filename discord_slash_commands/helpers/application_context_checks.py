@@ -15,6 +15,9 @@ import discord
 # Import user permissions for each guild
 import discord_slash_commands.helpers.user_permission as user_perm
 
+# Import helper for queueing audio in voice chat
+from discord_slash_commands.helpers import audio_queue
+
 #==============================================================================#
 # Define underlying structure                                                  #
 #==============================================================================#
@@ -65,7 +68,8 @@ def assert_bot_is_in_voice_chat(
 ) -> bool:
     """Assert the bot is connected to voice chat.
 
-    Assert the bot has an active connection established with a voice channel.
+    Assert the bot has an active connection established with a voice channel
+    in the guild the slash command was called from.
 
     Args:
         ctx: The context the slash command using this check was called under
@@ -74,8 +78,7 @@ def assert_bot_is_in_voice_chat(
         Whether the check passed.
     """
     return application_context_check(
-        len(ctx.bot.voice_clients) != 0 and \
-            ctx.bot.voice_clients[0].is_connected(),
+        ctx.voice_client is not None and ctx.voice_client.is_connected(),
         "I must be connected to a voice chat to use this command." \
             + "\nPlease connect me to a voice chat to speak in via " \
             + "`/voice join`."
@@ -89,7 +92,7 @@ def assert_bot_is_not_in_voice_chat(
     """Assert the bot is not connected to voice chat.
 
     Assert the bot does not have an active connection established with any
-    voice channel.
+    voice channel in the guild the slash command was called from.
 
     Args:
         ctx: The context the slash command using this check was called under
@@ -98,8 +101,8 @@ def assert_bot_is_not_in_voice_chat(
         Whether the check passed.
     """
     return application_context_check(
-        not(len(ctx.bot.voice_clients) != 0 and \
-            ctx.bot.voice_clients[0].is_connected()),
+        not(ctx.voice_client is not None and \
+            ctx.voice_client.is_connected()),
         "I must not be connected to a voice chat to use this command." \
             + "\nPlease disconnect me from voice chat via `/voice leave`."
     )
@@ -122,7 +125,7 @@ def assert_bot_is_in_same_voice_chat_as_author(
     """
     return application_context_check(
         assert_bot_is_in_voice_chat(ctx) and \
-            (ctx.author in ctx.bot.voice_clients[0].channel.members),
+            (ctx.author in ctx.voice_client.channel.members),
         "You must be in the same voice chat as me to use this command." \
             + "\nPlease connect to my voice chat, or make me join your " \
             + "voice chat via `/voice leave` then `/voice join`."
@@ -145,7 +148,7 @@ def assert_bot_is_playing_audio_in_voice_chat(
     """
     return application_context_check(
         assert_bot_is_in_voice_chat(ctx) and \
-            ctx.bot.voice_clients[0].is_playing(),
+            ctx.voice_client.is_playing(),
         "I must already be playing other audio to use this command." \
             + "\nThis can be done via many commands, such as `/tts play`."
     )
@@ -167,7 +170,7 @@ def assert_bot_is_not_playing_audio_in_voice_chat(
     """
     return application_context_check(
         not(assert_bot_is_in_voice_chat(ctx) and \
-            ctx.bot.voice_clients[0].is_playing()),
+            ctx.voice_client.is_playing()),
         "I must not already be playing other audio to use this command." \
             + "\nPlease wait until I finish playing my current audio, or " \
             + "stop my current audio via `/voice queue remove`."
@@ -303,8 +306,9 @@ def assert_bot_audio_queue_length_is_non_zero(
 ) -> bool:
     """Assert the bot's audio queue length is non-zero.
 
-    Assert the bot has an audio queue (this should only be possible when it is
-    in voice chat) and the length of its audio queue is greater than 0.
+    Assert the bot has an audio queue in the guild the slash command was called
+    from (this should only be possible when it is in voice chat there) and the
+    length of its audio queue is greater than 0.
 
     Args:
         ctx: The context the slash command using this check was called under
@@ -312,7 +316,7 @@ def assert_bot_audio_queue_length_is_non_zero(
     Returns:
         Whether the check passed.
     """
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild_id)
     return application_context_check(
         audio_queue_list is not None and \
             audio_queue_list.get_num_audio_files_queued() > 0,
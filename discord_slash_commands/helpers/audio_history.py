@@ -0,0 +1,156 @@
+"""Functions for remembering what audio has played in voice chat.
+
+This file defines helpers for recording each piece of audio that finishes
+playing in voice chat, per guild, in a small, fixed-size history, so recently
+played audio can be listed and queued again straight from the file cache,
+without making it again.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for efficient double-ended queues
+import collections
+
+# Import API for keeping track of time
+import time
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+# Define how many of the most recently played audio files to remember per guild
+HISTORY_LENGTH = 50
+
+
+
+class PlayedAudio():
+    """Define a record of audio that finished playing in voice chat.
+
+    Define only what's needed to list the audio and queue it again, in
+    __slots__, so a full history of every guild takes little memory.
+
+    Attributes:
+        author_user_id: The ID of the member who queued the audio
+        description: A human-readable description of the audio
+        file_path: The path to the audio file that was played
+        priority: The priority level the audio was played with
+        gain: What the volume of the audio was multiplied by
+        duration: The length of the audio, in seconds, None if unknown
+        time_finished: When the audio finished playing, measured in seconds
+            since the last epoch
+    """
+    __slots__ = (
+        "author_user_id",
+        "description",
+        "file_path",
+        "priority",
+        "gain",
+        "duration",
+        "time_finished",
+    )
+
+    def __init__(
+        self,
+        author_user_id: int,
+        description: str,
+        file_path: str,
+        priority: int,
+        gain: float,
+        duration: float,
+        time_finished: float
+    ):
+        """Initialize this PlayedAudio.
+
+        Set the members of this PlayedAudio to the passed in values.
+
+        Args:
+            self: This PlayedAudio
+            author_user_id: What to initialize self.author_user_id as
+            description: What to initialize self.description as
+            file_path: What to initialize self.file_path as
+            priority: What to initialize self.priority as
+            gain: What to initialize self.gain as
+            duration: What to initialize self.duration as
+            time_finished: What to initialize self.time_finished as
+        """
+        self.author_user_id = author_user_id
+        self.description = description
+        self.file_path = file_path
+        self.priority = priority
+        self.gain = gain
+        self.duration = duration
+        self.time_finished = time_finished
+
+    def to_str(self, history_index: int) -> str:
+        """Convert this PlayedAudio to a one line string.
+
+        Args:
+            self: This PlayedAudio
+            history_index: Where this PlayedAudio is in its guild's history,
+                1 = most recently played
+
+        Returns:
+            A string of history_index, who queued this audio, the first 50
+            characters of its description, and how long ago it finished
+            playing, formatted for Discord.
+        """
+        minutes_ago = int((time.time() - self.time_finished) // 60)
+        return f"\n`{history_index} :` <@{self.author_user_id}> " \
+            + f"`: {self.description[:49]} : {minutes_ago}m ago`"
+
+
+
+# Define a global dictionary of histories, where each key is the ID of a guild,
+# and each value is a collections.deque of the last HISTORY_LENGTH PlayedAudio
+# to finish playing in that guild, most recent last. Kept outside of the audio
+# queues, so history outlives the bot leaving voice chat.
+global history_dict
+history_dict = {}
+
+
+
+def record(guild_id: int, played_audio: PlayedAudio) -> None:
+    """Record that played_audio finished playing in guild_id.
+
+    Args:
+        guild_id: The ID of the guild the audio played in
+        played_audio: The record of the audio that finished playing
+    """
+    history_dict.setdefault(
+        guild_id,
+        collections.deque(maxlen = HISTORY_LENGTH)
+    ).append(played_audio)
+
+
+
+def get_history(guild_id: int) -> list:
+    """Get the audio that most recently finished playing in guild_id.
+
+    Args:
+        guild_id: The ID of the guild to get the history of
+
+    Returns:
+        A list of up to HISTORY_LENGTH PlayedAudio, most recently played
+        first, so the PlayedAudio at index i has a history index of i + 1.
+    """
+    return list(reversed(history_dict.get(guild_id, ())))
+
+
+
+def get(guild_id: int, history_index: int):
+    """Get the audio at history_index in guild_id's history.
+
+    Args:
+        guild_id: The ID of the guild to get the audio played in
+        history_index: Where the audio is in the guild's history, 1 = most
+            recently played
+
+    Returns:
+        The PlayedAudio at history_index, None if there is none.
+    """
+    history = history_dict.get(guild_id, ())
+    if history_index < 1 or history_index > len(history):
+        return None
+    return history[-history_index]
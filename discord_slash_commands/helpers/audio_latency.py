@@ -0,0 +1,151 @@
+"""Functions for measuring how long audio takes to play in voice chat.
+
+This file defines helpers for recording how long each stage of getting queued
+audio to play takes, from the command queueing it being called to its first
+frame being sent to Discord, per guild, and summarizing the most recent
+measurements as percentiles, so slow stages can be found and fixes verified.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for efficient double-ended queues
+import collections
+
+# Import API for doing basic math conversion
+import math
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+# Define the stages of playing queued audio that are measured, each as the
+# time from the end of the stage before it, as tuples of the name of the stage
+# and a human-readable description of it
+STAGE_FILE_READY = "file_ready"
+STAGE_SOURCE_CREATED = "source_created"
+STAGE_FIRST_FRAME = "first_frame"
+STAGE_TOTAL = "total"
+STAGE_PLAYED = "played"
+STAGE_WAIT_LOW = "wait_low"
+STAGE_WAIT_MEDIUM = "wait_medium"
+STAGE_WAIT_HIGH = "wait_high"
+STAGE_TUPLE = (
+    (STAGE_FILE_READY, "Command called to file ready"),
+    (STAGE_SOURCE_CREATED, "File ready to audio source ready to play"),
+    (STAGE_FIRST_FRAME, "Audio source ready to first frame sent"),
+    (STAGE_TOTAL, "Command called to first frame sent"),
+    (STAGE_PLAYED, "First frame sent to finished"),
+    (STAGE_WAIT_LOW, "Waiting in queue to playing, low priority"),
+    (STAGE_WAIT_MEDIUM, "Waiting in queue to playing, medium priority"),
+    (STAGE_WAIT_HIGH, "Waiting in queue to playing, high priority"),
+)
+
+# Define the stage of waiting to play audio of each priority is measured as,
+# where the index is the priority. Measured from when audio is added to queue,
+# or paused, to when it starts playing, each time it does.
+STAGE_WAIT_TUPLE = (STAGE_WAIT_LOW, STAGE_WAIT_MEDIUM, STAGE_WAIT_HIGH)
+
+# Define how many of the most recent measurements of each stage to keep
+LATENCY_WINDOW_SIZE = 200
+
+# Define which percentiles to summarize measurements with by default
+DEFAULT_PERCENTILE_TUPLE = (50, 90, 99)
+
+
+
+# Define a global dictionary of measurements, where each key is the ID of a
+# guild, and each value is a dictionary, where each key is the name of a stage
+# and each value is a collections.deque of the last LATENCY_WINDOW_SIZE
+# measurements of that stage, in seconds. Kept outside of the audio queues, so
+# measurements outlive the bot leaving voice chat.
+global latency_dict
+latency_dict = {}
+
+
+
+def record(guild_id: int, stage: str, start_time, end_time) -> bool:
+    """Record how long stage took to play some audio in guild_id.
+
+    Args:
+        guild_id: The ID of the guild the audio played in
+        stage: The name of the stage, from STAGE_TUPLE
+        start_time: When the stage started, in seconds since the last epoch,
+            None if unknown
+        end_time: When the stage ended, in seconds since the last epoch, None
+            if unknown
+
+    Returns:
+        Whether both times were known, and the measurement was recorded.
+    """
+    if start_time is None or end_time is None:
+        return False
+    stage_dict = latency_dict.setdefault(guild_id, {})
+    window = stage_dict.setdefault(
+        stage,
+        collections.deque(maxlen = LATENCY_WINDOW_SIZE)
+    )
+    window.append(max(0.0, end_time - start_time))
+    return True
+
+
+
+def get_percentiles(
+    guild_id: int,
+    percentile_tuple: tuple = DEFAULT_PERCENTILE_TUPLE
+) -> dict:
+    """Summarize the recent measurements of each stage in guild_id.
+
+    Get the nearest-rank percentiles in percentile_tuple of the last
+    LATENCY_WINDOW_SIZE measurements of each stage recorded for guild_id.
+
+    Args:
+        guild_id: The ID of the guild to summarize the measurements of
+        percentile_tuple: The percentiles to get, each between 0 and 100
+
+    Returns:
+        A dictionary, where each key is the name of a stage with measurements,
+        and each value is a tuple of the number of measurements, and a list of
+        the percentiles in percentile_tuple, in seconds.
+    """
+    percentile_dict = {}
+    for stage, window in latency_dict.get(guild_id, {}).items():
+        if len(window) == 0:
+            continue
+        sorted_list = sorted(window)
+        percentile_dict[stage] = (len(sorted_list), [
+            sorted_list[max(
+                0,
+                math.ceil(percentile / 100 * len(sorted_list)) - 1
+            )] for percentile in percentile_tuple
+        ])
+    return percentile_dict
+
+
+
+def to_str(
+    guild_id: int,
+    percentile_tuple: tuple = DEFAULT_PERCENTILE_TUPLE
+) -> str:
+    """Summarize the recent measurements of each stage in guild_id as text.
+
+    Args:
+        guild_id: The ID of the guild to summarize the measurements of
+        percentile_tuple: The percentiles to show, each between 0 and 100
+
+    Returns:
+        A string with a new-line seperated list of each stage with
+        measurements, and its percentiles in milliseconds, formatted for
+        Discord. An empty string if there are no measurements.
+    """
+    percentile_dict = get_percentiles(guild_id, percentile_tuple)
+    content = ""
+    for stage, description in STAGE_TUPLE:
+        if stage not in percentile_dict:
+            continue
+        num_measurements, percentile_list = percentile_dict[stage]
+        content += f"\n{description} (`{num_measurements}` measurements):"
+        for percentile, seconds in zip(percentile_tuple, percentile_list):
+            content += f" p{percentile} `{seconds * 1000:.0f}ms`"
+    return content
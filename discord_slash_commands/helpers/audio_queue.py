@@ -1,6 +1,8 @@
 """Functions for 'queueing' audio to play in voice chat.
 
 This file defines some helpers for playing audio consecutively in voice chat.
+Each guild the bot is in voice chat in gets its own audio queue, so the bot can
+play audio in many guilds at once.
 The current implementation in this file is very ugly and basic, and open to
 improvements.
 """
@@ -12,14 +14,38 @@ improvements.
 # Import API for doing basic math conversion
 import math
 
+# Import API for waiting on events without blocking the bot
+import asyncio
+
 # Import API for keeping track of time
 import time
 
+# Import operating system API for checking files still exist
+import os
+
 # Import Discord Python API
 import discord
 
-# Import Discord extended APIs to create timed tasks
-from discord.ext import commands, tasks
+# Import helper for shaping audio before it's played
+from discord_slash_commands.helpers import audio_source
+
+# Import helper for interacting with internal database
+from discord_slash_commands.helpers import sqlite
+
+# Import helper for measuring how long audio takes to play
+from discord_slash_commands.helpers import audio_latency
+
+# Import helper for limiting how many FFmpeg processes run at once
+from discord_slash_commands.helpers import ffmpeg_pool
+
+# Import helper for picking which queued audio of a priority plays next
+from discord_slash_commands.helpers import audio_scheduling
+
+# Import helper for looking up what's been measured about cached files
+from discord_slash_commands.helpers import file_cache
+
+# Import helper for remembering what audio has played
+from discord_slash_commands.helpers import audio_history
 
 #==============================================================================#
 # Define underlying structure                                                  #
@@ -31,6 +57,88 @@ MAX_VOLUME = 2
 LOW_PRIORITY = 0
 MEDIUM_PRIORITY = 1
 HIGH_PRIORITY = 2
+DEFAULT_MAX_QUEUE_LENGTH = 20
+MAX_MAX_QUEUE_LENGTH = 500
+
+# Define the most seconds of audio that may be queued for each priority, where
+# the index is the priority, in total, and by any one member, so a few long
+# videos fill the queue as quickly as many short TTS messages do, and no one
+# member can take up all of it
+MAX_QUEUED_SECONDS_TUPLE = (2 * 60 * 60, 15 * 60, 5 * 60)
+MAX_AUTHOR_QUEUED_SECONDS_TUPLE = (60 * 60, 5 * 60, 2 * 60)
+
+# Define how many frames (20ms each) of the next audio to play to read ahead of
+# time, so it is ready to play the moment the current audio finishes
+NUM_PREBUFFERED_FRAMES = 5
+
+# Define the file extensions of audio files known to be Ogg/Opus encoded, which
+# can be sent to Discord as-is, without decoding and re-encoding them
+OPUS_FILE_EXTENSION_TUPLE = (".opus",)
+
+# Define the FFmpeg input options to stream audio from a URL with, so FFmpeg
+# reconnects, instead of ending the audio early, if the connection drops
+STREAM_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 " \
+    + "-reconnect_delay_max 5"
+
+# Define how many seconds to wait after an audio queue changes before saving a
+# snapshot of it, so changes made around the same time are saved together, and
+# how often to keep saving it while audio plays, so progress isn't lost
+SNAPSHOT_DELAY_SECONDS = 5
+
+# Name of the scheduling policy each priority level picks its next audio with,
+# where the index is the priority. Music and other long audio is shared by how
+# long each member's audio has played, and TTS and short clips by turns.
+DEFAULT_SCHEDULING_POLICY_TUPLE = (
+    audio_scheduling.POLICY_FAIR_SHARE,
+    audio_scheduling.POLICY_ROUND_ROBIN,
+    audio_scheduling.POLICY_ROUND_ROBIN,
+)
+
+# Define how many seconds audio has to wait to play before it's treated as one
+# priority level higher, so low priority audio, such as music, still gets to
+# play in a voice chat where higher priority audio, such as TTS, never stops.
+# 0 = never raise the priority of waiting audio.
+DEFAULT_AGING_SECONDS = 120
+
+# Define how many priority levels higher than playing audio other audio has to
+# be to stop it, so audio whose priority was raised by waiting isn't stopped
+# again by the next audio to wait a little longer. Less than 1, so audio of a
+# higher priority level that hasn't waited still always does.
+PREEMPTION_MARGIN = .5
+
+# Define the priority whose audio is played faster when a lot of it is queued,
+# so TTS is still read out while it's relevant in a busy voice chat, how many
+# seconds of it have to be queued to start speeding it up, how many to reach
+# the fastest tempo, the fastest tempo, for example 1.5 = 50% faster, and what
+# step to round tempos to, so audio prepared ahead of time is still at the
+# right tempo once it plays. Tempo is changed by FFmpeg's atempo filter while
+# playing, which keeps pitch, so cached files never need re-encoding.
+ADAPTIVE_TEMPO_PRIORITY = HIGH_PRIORITY
+DEFAULT_MIN_TEMPO_QUEUED_SECONDS = 30
+DEFAULT_MAX_TEMPO_QUEUED_SECONDS = 120
+DEFAULT_MAX_TEMPO = 1.5
+TEMPO_STEP = .05
+
+# Define how many seconds from its end audio has to be to be left to finish,
+# instead of being stopped for higher priority audio, since stopping it only to
+# play its last few seconds later costs more than the wait
+DEFAULT_NEAR_END_SECONDS = 5
+
+# Define how many seconds after a member's last TTS message was queued, or
+# finished playing, their next one can still skip announcing their name, as
+# long as nobody else's audio of the same priority plays in between
+DEFAULT_SPEAKER_WINDOW_SECONDS = 30
+
+# Define what to do with audio a member queues again, with the same file,
+# within DEFAULT_COALESCE_WINDOW_SECONDS of last queueing it, while it's still
+# in queue: drop it, or merge it into the copy in queue, which plays once more
+# for each copy merged, up to MAX_REPEAT_COUNT times, after which copies are
+# dropped. Either way, spamming the same audio takes up one spot in queue.
+COALESCE_DROP = "drop"
+COALESCE_REPEAT = "repeat"
+DEFAULT_COALESCE_POLICY = COALESCE_REPEAT
+DEFAULT_COALESCE_WINDOW_SECONDS = 10
+MAX_REPEAT_COUNT = 3
 
 
 
@@ -106,6 +214,267 @@ def seconds_to_timestamp(total_seconds : float) -> str:
 
 
 
+class AudioPlayback():
+    """Define a handle on one play of an AudioQueueElement.
+
+    The audio mixer tells us when a track runs out of audio by calling its
+    on_stop function from the audio player's thread. Define a handle, unique to
+    each play, that turns that call into a future resolved on the bot's event
+    loop, so whatever started the play can await it without sharing state with
+    any other play.
+
+    Attributes:
+        audio_source: The discord.AudioSource being played.
+        mixer_track: The audio_source.AudioMixerTrack playing
+            self.audio_source, None until it starts playing.
+        loop: The event loop self.stopped should be resolved on.
+        stopped: An asyncio.Future resolved with the error the audio player
+            stopped on (None if there was no error), once self.audio_source has
+            stopped playing, whether it finished or was stopped early.
+        is_stopped_early: Whether self.audio_source was stopped on purpose,
+            for example to pause it, instead of playing until its end.
+    """
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        loop: asyncio.AbstractEventLoop
+    ):
+        """Initialize this AudioPlayback.
+
+        Set the members of this AudioPlayback to their defaults or passed in
+        values.
+
+        Args:
+            self: This AudioPlayback
+            source: What to initialize self.audio_source as
+            loop: What to initialize self.loop as
+        """
+        self.audio_source = source
+        self.mixer_track = None
+        self.loop = loop
+        self.stopped = loop.create_future()
+        self.is_stopped_early = False
+
+    def after(self, error) -> None:
+        """An on_stop function for audio_source.AudioMixer.add_track().
+
+        Resolve self.stopped with error, thread-safely, from the audio player's
+        thread.
+
+        Args:
+            self: This AudioPlayback
+            error: Any error that occurred during playing self.audio_source.
+        """
+        if error is not None:
+            print(error)
+        self.loop.call_soon_threadsafe(self.set_stopped, error)
+
+    def set_stopped(self, error) -> None:
+        """Resolve self.stopped with error if it isn't resolved already.
+
+        Args:
+            self: This AudioPlayback
+            error: Any error that occurred during playing self.audio_source.
+        """
+        if not self.stopped.done():
+            self.stopped.set_result(error)
+
+
+
+class LinkedQueueNode():
+    """Define a node holding one value in a LinkedQueue.
+
+    Attributes:
+        value: The value held by this node, for example, an AudioQueueElement.
+        queue: The LinkedQueue this node is in, None if it is in none.
+        previous_node: The node before this one in self.queue, None if this is
+            the first node.
+        next_node: The node after this one in self.queue, None if this is the
+            last node.
+    """
+    def __init__(self, value):
+        """Initialize this LinkedQueueNode.
+
+        Set self.value to the passed in value, and leave it out of any queue.
+
+        Args:
+            self: This LinkedQueueNode
+            value: What to initialize self.value as
+        """
+        self.value = value
+        self.queue = None
+        self.previous_node = None
+        self.next_node = None
+
+
+
+class LinkedQueue():
+    """Define a doubly linked list to use as a queue.
+
+    Define a queue that, like collections.deque, can add and remove values from
+    either end in O(1) time, but, unlike collections.deque, can also remove or
+    move any node in O(1) time, given the node. Pair it with a dictionary of
+    nodes to find and remove any value without searching the queue.
+
+    Attributes:
+        head_node: The first node in this queue, None if it is empty.
+        tail_node: The last node in this queue, None if it is empty.
+        length: The number of nodes in this queue.
+    """
+    def __init__(self):
+        """Initialize this LinkedQueue.
+
+        Make this LinkedQueue empty.
+
+        Args:
+            self: This LinkedQueue
+        """
+        self.head_node = None
+        self.tail_node = None
+        self.length = 0
+
+    def __len__(self) -> int:
+        """Get the number of nodes in this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+
+        Returns:
+            self.length.
+        """
+        return self.length
+
+    def __iter__(self):
+        """Iterate over the values in this LinkedQueue, from first to last.
+
+        Args:
+            self: This LinkedQueue
+
+        Yields:
+            The value of each node in this LinkedQueue.
+        """
+        node = self.head_node
+        while node is not None:
+            # Get the next node first, in case the caller removes this one
+            next_node = node.next_node
+            yield node.value
+            node = next_node
+
+    def peek(self):
+        """Get the first value in this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+
+        Returns:
+            The value of self.head_node, None if this LinkedQueue is empty.
+        """
+        return None if self.head_node is None else self.head_node.value
+
+    def append_node(self, node: LinkedQueueNode) -> LinkedQueueNode:
+        """Add node to the end of this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+            node: The node to add, which must not be in any LinkedQueue
+
+        Returns:
+            node.
+        """
+        node.queue = self
+        node.previous_node = self.tail_node
+        node.next_node = None
+        if self.tail_node is None:
+            self.head_node = node
+        else:
+            self.tail_node.next_node = node
+        self.tail_node = node
+        self.length += 1
+        return node
+
+    def append_node_left(self, node: LinkedQueueNode) -> LinkedQueueNode:
+        """Add node to the start of this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+            node: The node to add, which must not be in any LinkedQueue
+
+        Returns:
+            node.
+        """
+        node.queue = self
+        node.previous_node = None
+        node.next_node = self.head_node
+        if self.head_node is None:
+            self.tail_node = node
+        else:
+            self.head_node.previous_node = node
+        self.head_node = node
+        self.length += 1
+        return node
+
+    def insert_node_after(
+        self,
+        node: LinkedQueueNode,
+        previous_node: LinkedQueueNode
+    ) -> LinkedQueueNode:
+        """Add node right after previous_node in this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+            node: The node to add, which must not be in any LinkedQueue
+            previous_node: The node to add node after, which must be in this
+                LinkedQueue, None to add node to the start
+
+        Returns:
+            node.
+        """
+        if previous_node is None:
+            return self.append_node_left(node)
+        if previous_node.next_node is None:
+            return self.append_node(node)
+        node.queue = self
+        node.previous_node = previous_node
+        node.next_node = previous_node.next_node
+        previous_node.next_node.previous_node = node
+        previous_node.next_node = node
+        self.length += 1
+        return node
+
+    def append(self, value) -> LinkedQueueNode:
+        """Add a new node for value to the end of this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+            value: The value to add
+
+        Returns:
+            The node made to hold value.
+        """
+        return self.append_node(LinkedQueueNode(value))
+
+    def remove_node(self, node: LinkedQueueNode) -> None:
+        """Remove node from this LinkedQueue.
+
+        Args:
+            self: This LinkedQueue
+            node: The node to remove, which must be in this LinkedQueue
+        """
+        if node.previous_node is None:
+            self.head_node = node.next_node
+        else:
+            node.previous_node.next_node = node.next_node
+        if node.next_node is None:
+            self.tail_node = node.previous_node
+        else:
+            node.next_node.previous_node = node.previous_node
+        node.queue = None
+        node.previous_node = None
+        node.next_node = None
+        self.length -= 1
+
+
+
 class AudioQueueElement():
     """Define an instance of information held on audio queued for playing.
 
@@ -133,15 +502,54 @@ class AudioQueueElement():
             AudioQueueElement's turn to play in voice chat.
         priority: The priority level of this audio, for example, 0 =
             LOW_PRIORITY, and 2 = HIGH_PRIORITY.
+        gain: What to multiply the volume of this audio by, on top of the
+            volume of the AudioQueueList it's in, for example 2.0 = twice as
+            loud.
+        queue_position: A number that orders this AudioQueueElement among the
+            rest of its priority, lower = closer to the front. Saved with
+            snapshots of the AudioQueueList, to restore the order from.
         time_started_play: When this audio file last had play() called on it,
             measured in seconds since the last epoch.
-        time_played: The number of seconds of this audio played in voice chat.
+        time_enqueued: When the command that queued this audio was called,
+            measured in seconds since the last epoch, None if unknown.
+        time_file_ready: When self.file_path was ready, and this audio was
+            added to queue, measured in seconds since the last epoch, None if
+            unknown.
+        time_source_created: When the audio source this audio first played
+            with was ready to play, measured in seconds since the last epoch,
+            None if it has never been played.
+        time_first_frame_read: When the first frame of this audio was sent to
+            be played, measured in seconds since the last epoch, None if none
+            has been yet.
+        time_finished: When this audio finished playing, measured in seconds
+            since the last epoch, None if it hasn't.
+        time_played: The number of seconds of this audio played in voice chat,
+            counted from the frames actually read out for playing.
             Used to know from what timestamp to resume paused audio from.
-        is_finished: Whether this audio source has played until its end.
-        is_paused: Whether this audio source has stopped playing because it was
-            paused. Used by play's after function to determine whether the audio
-            source stopped because it was finished and it can be removed, or to
-            be paused and later resumed.
+        time_waiting_since: When this audio was last added to queue or
+            paused, and so started waiting to play, measured in seconds since
+            the last epoch.
+        seconds_waited: The number of seconds this audio waited to play
+            before each time it started playing, added up.
+        duration: The length of this audio, in seconds, None if unknown.
+        queued_seconds: The seconds left to play of this audio, counted in
+            the AudioQueueList.queued_seconds_list of the AudioQueueList it's
+            in, as of when it was last counted.
+        playback: The AudioPlayback of the last time this audio was played,
+            None if it has never been played.
+        prepared_audio_source: The audio source made by prepare() for the next
+            play of this audio, None if there is none.
+        prepared_for: A tuple of the time_played, volume, gain, and tempo
+            prepared_audio_source was made for.
+        tempo: How many times faster than normal this audio is playing, or
+            last played, at, for example 1.25 = 25% faster.
+        stream_url: A URL to stream this audio from while self.file_path is
+            still being made, None if there is none.
+        repeat_count: How many more times this audio is to be played,
+            counting the play in progress, if any. More than 1 when copies of
+            it queued again were merged into it.
+        time_last_queued: When this audio, or a copy merged into it, was last
+            added to queue, measured in seconds since the last epoch.
     """
     def __init__(
         self,
@@ -151,6 +559,9 @@ class AudioQueueElement():
         source_command: str = "",
         file_path: str = "",
         priority: int = 0,
+        gain: float = 1.0,
+        stream_url: str = None,
+        duration: float = None
     ):
         """Initialize this AudioQueueElement.
 
@@ -165,6 +576,9 @@ class AudioQueueElement():
             source_command: What to initialize self.source_command as
             file_path: What to initialize self.file_path as
             priority: What to initialize self.priority as
+            gain: What to initialize self.gain as
+            stream_url: What to initialize self.stream_url as
+            duration: What to initialize self.duration as
         """
         self.audio_queue_element_id = audio_queue_element_id
         self.author_user_id = author_user_id
@@ -172,10 +586,39 @@ class AudioQueueElement():
         self.source_command = source_command
         self.file_path = file_path
         self.priority = priority
+        self.gain = gain
+        self.queue_position = audio_queue_element_id
         self.time_started_play = 0.00
+        self.time_enqueued = None
+        self.time_file_ready = None
+        self.time_source_created = None
+        self.time_first_frame_read = None
+        self.time_finished = None
         self.time_played = 0.00
-        self.is_finished = False
-        self.is_paused = False
+        self.time_waiting_since = time.time()
+        self.seconds_waited = 0.00
+        self.duration = duration
+        self.queued_seconds = 0.00
+        self.playback = None
+        self.prepared_audio_source = None
+        self.prepared_for = None
+        self.tempo = 1.0
+        self.stream_url = stream_url
+        self.repeat_count = 1
+        self.time_last_queued = time.time()
+
+    def is_streamed(self) -> bool:
+        """Get whether this AudioQueueElement has to be streamed to be played.
+
+        Args:
+            self: This AudioQueueElement
+
+        Returns:
+            Whether self.stream_url is set and self.file_path doesn't exist
+            yet.
+        """
+        return self.stream_url is not None and \
+            not os.path.isfile(self.file_path)
 
     def to_str(self) -> str:
         """Convert this AudioQueueElement to a string.
@@ -194,91 +637,324 @@ class AudioQueueElement():
             + f"\nAuthor: <@{self.author_user_id}>" \
             + f"\nDescription: `{self.description}`" \
             + f"\nSource: `{self.source_command}`" \
-            + f"\nPriority: `{self.priority}`"
+            + f"\nPriority: `{self.priority}`" \
+            + (
+                f"\nTimes left to play: `{self.repeat_count}`" \
+                if self.repeat_count > 1 else ""
+            )
 
-    def play(
+    def get_seconds_waited(self, now: float) -> float:
+        """Get how many seconds this AudioQueueElement has waited to play.
+
+        Args:
+            self: This AudioQueueElement
+            now: The current time, measured in seconds since the last epoch
+
+        Returns:
+            self.seconds_waited, plus how long it has waited since
+            self.time_waiting_since, if it's not playing.
+        """
+        if self.is_playing():
+            return self.seconds_waited
+        return self.seconds_waited + max(0.0, now - self.time_waiting_since)
+
+    def get_seconds_played(self) -> float:
+        """Get how many seconds into this AudioQueueElement it has played.
+
+        Args:
+            self: This AudioQueueElement
+
+        Returns:
+            self.time_played, plus how far into the audio its current play has
+            gotten, if it's playing, counting self.tempo.
+        """
+        seconds_played = self.time_played
+        if self.is_playing():
+            seconds_played += self.playback.audio_source.get_seconds_read() \
+                * self.tempo
+        return seconds_played
+
+    def get_seconds_left(self):
+        """Get how many seconds of this AudioQueueElement are left to play.
+
+        Args:
+            self: This AudioQueueElement
+
+        Returns:
+            The number of seconds it will take to play from the current play
+            position to the end of the audio, at self.tempo if it's playing,
+            otherwise at normal tempo, None if self.duration is unknown.
+        """
+        if self.duration is None:
+            return None
+        seconds_left = max(0.0, self.duration - self.get_seconds_played())
+        if self.is_playing():
+            seconds_left /= self.tempo
+        return seconds_left
+
+    def get_seconds_left_with_repeats(self):
+        """Get how many seconds of this AudioQueueElement are left to play.
+
+        Unlike get_seconds_left(), count every time this audio is left to be
+        played again, at normal tempo, not just the play in progress.
+
+        Args:
+            self: This AudioQueueElement
+
+        Returns:
+            The number of seconds it will take to play this audio
+            self.repeat_count times, from the current play position, None if
+            self.duration is unknown.
+        """
+        seconds_left = self.get_seconds_left()
+        if seconds_left is None:
+            return None
+        return seconds_left + (self.repeat_count - 1) * self.duration
+
+    def make_audio_source(
         self,
-        voice_client: discord.VoiceClient,
-        volume: int = 1.0
-    ) -> bool:
-        """Play this AudioQueueElement in voice_client.
+        volume: int = 1.0,
+        is_required: bool = True,
+        tempo: float = 1.0
+    ):
+        """Make an audio source to play this AudioQueueElement with.
 
-        Play self.file_path on voice_client at a (volume * 100)% volume.
+        Make an audio source that reads self.file_path, or streams
+        self.stream_url if self.file_path isn't made yet, from self.time_played
+        on, at a (volume * self.gain * 100)% volume, and tempo times faster than
+        normal. Making it starts its FFmpeg process, counted as live playback
+        by ffmpeg_pool until the audio source is cleaned up.
 
         Args:
             self: This AudioQueueElement
-            voice_client: What voice client to play self.file_path on
             volume: At what volume to play self.file_path at.
                 1.0 = 100% = normal volume, 2.0 = 200% = high volume, etc.
+            is_required: Whether the audio source is needed to play now, so it's
+                made even if ffmpeg_pool is full of live playback, instead of
+                only being made ahead of time
+            tempo: How many times faster than normal to play self.file_path,
+                keeping its pitch, for example 1.25 = 25% faster.
 
         Returns:
-            Whether self.file_path could be successfully played in voice_client.
+            An audio_source.PrebufferedAudio reading self.file_path, if one
+            could be made, otherwise None.
         """
         # Check validity of arguments
         if volume < MIN_VOLUME or volume > MAX_VOLUME:
-            return False
+            return None
 
-        # Assert file can be opened and read
+        # Assert file can be opened and read, unless it's streamed instead
+        is_streamed = self.is_streamed()
+        source_path = self.stream_url if is_streamed else self.file_path
         try:
-            file_handle = open(self.file_path, "rb")
-            file_handle.close()
+            if is_streamed is False:
+                file_handle = open(self.file_path, "rb")
+                file_handle.close()
         except OSError:
             print(f"WARNING: Audio source for {self.description} was " \
                 + "requested but could not be produced because its file " \
                 + f"location, {self.file_path}, could not be opened and read.")
-            return False
+            return None
+
+        # Don't start another FFmpeg process only to prepare audio ahead of
+        # time, if too many are already running for live playback
+        if ffmpeg_pool.start_live_job(is_required) is False:
+            return None
 
         # Make audio source, if possible
-        audio_source = None
+        source = None
         try:
+            # ss = at what timestamp to start audio from, given before the
+            # input, so FFmpeg seeks in the file instead of decoding and
+            # throwing away all audio before the timestamp
+            before_options = "-ss " \
+                + f"{seconds_to_timestamp(self.time_played)}"
+            if is_streamed is True:
+                before_options = f"{STREAM_BEFORE_OPTIONS} {before_options}"
             # vn = disable video
             # sn = disable subtitles
-            # ss = at what timestamp to start audio from
-            audio_source = discord.PCMVolumeTransformer(
-                original = discord.FFmpegPCMAudio(
+            options = "-vn -sn"
+            # atempo = change tempo without changing pitch
+            if tempo != 1.0:
+                options += f" -filter:a atempo={tempo}"
+
+            # If the file is already Opus encoded and its volume and tempo do
+            # not need to change, pass its Opus packets straight through to
+            # Discord, instead of decoding them to PCM and encoding them back
+            # to Opus
+            gain = volume * self.gain
+            if is_streamed is False and \
+                self.file_path.endswith(OPUS_FILE_EXTENSION_TUPLE) and \
+                gain == 1.0 and tempo == 1.0:
+                source = discord.FFmpegOpusAudio(
                     source = self.file_path,
-                    options = "-vn -sn -ss " \
-                        + f"{seconds_to_timestamp(self.time_played)}"
-                ),
-                volume = volume
-            )
+                    codec = "copy",
+                    before_options = before_options,
+                    options = options
+                )
+            else:
+                source = discord.FFmpegPCMAudio(
+                    source = source_path,
+                    before_options = before_options,
+                    options = options
+                )
+                # Only change the volume if it isn't already right
+                if gain != 1.0:
+                    source = audio_source.VolumeAudio(
+                        original = source,
+                        gain = gain
+                    )
         except TypeError:
             print(f"WARNING: Audio source for {self.description} was " \
                 + "requested but could not be produced because its file, " \
                 + f"{self.file_path}, was a non-audio source.")
-            return False
+            ffmpeg_pool.end_live_job()
+            return None
         except discord.ClientException:
             print(f"WARNING: Audio source for {self.description} was " \
                 + "requested but could not be produced because its file, " \
                 + f"{self.file_path}, was opus encoded (and used as a PCM " \
                 + "audio source, not an Opus audio source).")
-            return False
+            ffmpeg_pool.end_live_job()
+            return None
 
-        # Play audio source
-        try:
-            init_play_after(self, "set_is_finished", (True,))
-            voice_client.play(audio_source, after=play_after)
-        except discord.ClientException:
-            print("WARNING: Could not play audio source for " \
-                + f"{self.description} ({self.file_path}) because the voice " \
-                + "connection was already playing audio or isn't connected.")
-            return False
-        except TypeError:
-            print("WARNING: Could not play audio source for " \
-                + f"{self.description} ({self.file_path}) because the audio " \
-                + "source or after is not callable. ")
-            return False
-        except discord.opus.OpusNotLoaded:
-            print("WARNING: Could not play audio source for " \
-                + f"{self.description} ({self.file_path}) because the audio " \
-                + "source is Opus encoded and opus is not loaded.")
-            return False
+        return audio_source.PrebufferedAudio(
+            original = source,
+            on_cleanup = ffmpeg_pool.end_live_job
+        )
+
+    def prepare(self, volume: int = 1.0, tempo: float = 1.0):
+        """Make the audio source for the next play of this AudioQueueElement.
+
+        Make an audio source ahead of time, via make_audio_source(), for play()
+        to use instead of making its own, if this AudioQueueElement is played
+        from the same point at the same volume and tempo. Not made if
+        ffmpeg_pool is full of live playback.
+
+        Args:
+            self: This AudioQueueElement
+            volume: At what volume to play self.file_path at.
+            tempo: How many times faster than normal to play self.file_path.
+
+        Returns:
+            The audio_source.PrebufferedAudio made, to prebuffer, if one could
+            be made, otherwise None.
+        """
+        self.unprepare()
+        self.prepared_audio_source = self.make_audio_source(
+            volume = volume,
+            is_required = False,
+            tempo = tempo
+        )
+        self.prepared_for = (self.time_played, volume, self.gain, tempo)
+        return self.prepared_audio_source
+
+    def is_prepared_for(self, volume: int = 1.0, tempo: float = 1.0) -> bool:
+        """Get whether prepare() was last called to play at volume from here.
+
+        Args:
+            self: This AudioQueueElement
+            volume: At what volume self.file_path is to be played at.
+            tempo: How many times faster than normal self.file_path is to be
+                played.
+
+        Returns:
+            Whether prepare() was last called for playing from self.time_played
+            at volume and tempo, with self.gain.
+        """
+        return self.prepared_for == (
+            self.time_played,
+            volume,
+            self.gain,
+            tempo
+        )
+
+    def unprepare(self) -> None:
+        """Throw away the audio source prepare() made, if it wasn't played.
+
+        Args:
+            self: This AudioQueueElement
+        """
+        if self.prepared_audio_source is not None:
+            self.prepared_audio_source.cleanup()
+        self.prepared_audio_source = None
+        self.prepared_for = None
+
+    def play(
+        self,
+        mixer: audio_source.AudioMixer,
+        volume: int = 1.0,
+        tempo: float = 1.0
+    ):
+        """Play this AudioQueueElement through mixer.
+
+        Add self.file_path to mixer at a (volume * self.gain * 100)% volume,
+        tempo times faster than normal. Use the audio source made by prepare(),
+        if it still fits, otherwise make a new one. Must be called from within
+        the bot's event loop.
+
+        Args:
+            self: This AudioQueueElement
+            mixer: What audio mixer to play self.file_path through
+            volume: At what volume to play self.file_path at.
+                1.0 = 100% = normal volume, 2.0 = 200% = high volume, etc.
+            tempo: How many times faster than normal to play self.file_path.
+
+        Returns:
+            An AudioPlayback to await the end of this play with, if
+            self.file_path could be successfully played through mixer,
+            otherwise None.
+        """
+        # Get the audio source made ahead of time, or make one now
+        source = None
+        if self.prepared_audio_source is not None and \
+            self.is_prepared_for(volume, tempo):
+            source = self.prepared_audio_source
+            self.prepared_audio_source = None
+            self.prepared_for = None
+        else:
+            self.unprepare()
+            source = self.make_audio_source(volume, tempo = tempo)
+        if source is None:
+            return None
+        if self.time_source_created is None:
+            self.time_source_created = time.time()
+
+        # Play audio source alongside anything else mixer is playing
+        playback = AudioPlayback(source, asyncio.get_running_loop())
+        playback.mixer_track = mixer.add_track(
+            source,
+            self.priority,
+            playback.after
+        )
 
         self.time_started_play = time.time()
-        self.is_paused = False
-        return True
+        self.tempo = tempo
+        self.seconds_waited += max(
+            0.0,
+            self.time_started_play - self.time_waiting_since
+        )
+        self.playback = playback
+        return playback
+
+    def is_playing(self) -> bool:
+        """Get whether this AudioQueueElement is playing.
+
+        Get whether this AudioQueueElement's latest play has not been stopped
+        early and the audio player has not yet said it stopped. Audio that just
+        played until its end counts as playing until then.
+
+        Args:
+            self: This AudioQueueElement
+
+        Returns:
+            Whether this AudioQueueElement is playing.
+        """
+        return self.playback is not None and \
+            self.playback.is_stopped_early is False and \
+            not self.playback.stopped.done()
 
-    def pause(self, voice_client: discord.VoiceClient) -> None:
+    def pause(self, mixer: audio_source.AudioMixer) -> None:
         """Pause playing this AudioQueueElement.
 
         Stop playing this AudioQueueElement in voice chat, and remember current
@@ -286,59 +962,220 @@ class AudioQueueElement():
 
         Args:
             self: This AudioQueueElement
-            voice_client: What voice client to stop playing on
+            mixer: What audio mixer to stop playing through
         """
-        self.is_paused = True
-        if voice_client.is_playing():
-            voice_client.stop()
-            self.time_played += time.time() - self.time_started_play
+        # Don't do anything if this audio isn't playing
+        if self.is_playing() is False:
+            return
 
+        # Mark this play as stopped early, so it is not taken as finished, and
+        # take it out of mixer if it hasn't run out of audio already
+        self.playback.is_stopped_early = True
+        if mixer.remove_track(self.playback.mixer_track):
+            self.playback.after(None)
+        self.time_played += self.playback.audio_source.get_seconds_read() \
+            * self.tempo
+        self.time_waiting_since = time.time()
 
-class AudioQueueList(commands.Cog):
-    """Define a cog for managing a queue of audio to be played in voice chat.
 
-    Define a Cog with a task to check for outstanding audio to play every
-    second, while handling numerous edge cases, such as pausing, removing
+class AudioQueueList():
+    """Define an instance managing a queue of audio to be played in voice chat.
+
+    Define a queue of audio for a single voice chat, with a task that sleeps
+    until something happens that could change what audio should be playing,
+    such as audio being added, removed, paused, or finishing, then plays the
+    right audio, while handling numerous edge cases, such as pausing, removing
     currently playing audio, and more.
 
+    All audio is played through one audio mixer, so when higher priority audio
+    is queued while lower priority audio plays, such as TTS while music plays,
+    the higher priority audio is played over the lower priority audio, which is
+    ducked, rather than paused and restarted.
+
+    Changes to the audio queue are saved to the audio_queues and
+    audio_queue_settings databases a few at a time, so the queue can be
+    restored after the bot leaves voice chat or restarts.
+
     Attributes:
         voice_client: The discord.VoiceClient to play audio on.
+        guild_id: The ID of the guild voice_client is connected in, which
+            snapshots of this AudioQueueList are saved under.
         num_priority_levels: The number of levels of priority an audio source
             can have. Higher number = higher priority. Low priority audio is
             always paused and delayed for as long as it takes to play higher
             priority audio.
-        queue_list: A list of num_priority_levels lists of AudioQueueElement.
-            queue_list[0] = a list of what audio is queued with a priority of 0.
-            queue_list[0][0] = the AudioQueueElement that's been in priority 0
-            queue the longest, in other words, the audio source that should be
-            played soonest (assmuming higher priority audio isn't
-            queued/playing).
+        queue_list: A list of num_priority_levels LinkedQueue of
+            AudioQueueElement. queue_list[0] = a queue of what audio is queued
+            with a priority of 0. queue_list[0].peek() = the AudioQueueElement
+            that's been in priority 0 queue the longest, in other words, the
+            audio source that should be played soonest (assmuming higher
+            priority audio isn't queued/playing).
+        node_dict: A dictionary of every LinkedQueueNode in queue_list, where
+            each key is the audio_queue_element_id of the AudioQueueElement the
+            node holds. Used to find and remove audio without searching.
+        policy_list: A list of num_priority_levels audio_scheduling policies,
+            where policy_list[0] picks which audio in queue_list[0] plays next,
+            such as by taking turns between the members who queued it, instead
+            of always queue_list[0].peek().
+        queued_seconds_list: A list of num_priority_levels running sums of the
+            queued_seconds of each AudioQueueElement in queue_list, where
+            queued_seconds_list[0] = how many seconds of audio are left to play
+            with a priority of 0, not counting audio of unknown duration. Kept
+            up to date as audio is added, paused, and removed, so how long
+            audio will wait to play never needs adding up.
+        author_queued_seconds_dict: A dictionary of running sums like
+            queued_seconds_list, but by member, where each key is a tuple of a
+            priority and the ID of a member with audio of that priority in
+            queue, and each value is how many seconds of their audio of that
+            priority are left to play.
+        next_audio_queue_element_id: The audio_queue_element_id to give the
+            next AudioQueueElement added. Only ever goes up, so no two
+            AudioQueueElement, of any priority, ever share an ID.
         max_queue_length: The maximum number of AudioQueueElement to allow
             across all of queue_list.
         latest_audio: The audio currently playing or paused in voice chat.
+        overlay_audio: The audio currently playing or paused in voice chat over
+            latest_audio, which is ducked while overlay_audio plays.
+        is_ducking_enabled: Whether higher priority audio is played over lower
+            priority audio, instead of pausing it.
+        aging_seconds: How many seconds audio has to wait to play before it's
+            treated as one priority level higher, 0 to never raise it.
+        near_end_seconds: How many seconds from its end audio has to be to be
+            left to finish, instead of being paused for higher priority audio.
+        min_tempo_queued_seconds: How many seconds of ADAPTIVE_TEMPO_PRIORITY
+            audio have to be queued for it to start playing faster.
+        max_tempo_queued_seconds: How many seconds of ADAPTIVE_TEMPO_PRIORITY
+            audio have to be queued for it to play at max_tempo.
+        max_tempo: The fastest tempo to play ADAPTIVE_TEMPO_PRIORITY audio at,
+            1.0 to never play it faster.
+        last_speaker_user_id: The ID of the member whose TTS message was
+            queued most recently, whose name was announced, or was skipped for
+            following their last message, None if there is none.
+        last_speaker_audio_queue_element_id: The ID of the AudioQueueElement
+            of last_speaker_user_id's most recent TTS message.
+        time_last_spoken: When last_speaker_user_id's most recent TTS message
+            was queued, or finished playing, whichever was later.
+        speaker_window_seconds: How many seconds after time_last_spoken
+            last_speaker_user_id's next TTS message can skip announcing their
+            name, 0 to always announce it.
+        coalesce_policy: What to do with audio queued again by the same member
+            within coalesce_window_seconds, COALESCE_DROP or COALESCE_REPEAT.
+        coalesce_window_seconds: How many seconds after a member last queued
+            audio the same audio queued again by them is coalesced, 0 to never
+            coalesce audio.
+        coalesce_dict: A dictionary of the audio in queue that audio queued
+            again could be coalesced into, where each key is a tuple of the ID
+            of the member who queued it and its file path, and each value is
+            the AudioQueueElement they most recently queued with that file.
+        mixer: The audio_source.AudioMixer all audio is played through, and
+            voice_client plays whenever there is audio to play.
         is_paused: Whether playing of all audio queues has been paused.
         volume: The current volume to play audio at, for example 1.0 = 100%.
+        loop: The event loop the bot, and so play_next_task, runs on.
+        wake_event: The asyncio.Event play_next_task sleeps on until there may
+            be new audio to play.
+        play_next_task: The asyncio.Task running self.play_next_forever().
+        playback_task_set: The set of asyncio.Task running
+            self.wait_for_playback(), one for each AudioPlayback that has not
+            stopped yet.
+        prepared_audio: The AudioQueueElement expected to play after the audio
+            currently playing, whose audio source has been made ahead of time,
+            None if there is none.
+        snapshot_dirty_id_set: The set of IDs of AudioQueueElement added or
+            changed since the last snapshot was saved.
+        snapshot_removed_id_set: The set of IDs of AudioQueueElement removed
+            since the last snapshot was saved.
+        snapshot_task: The asyncio.Task running self.save_snapshot_later(),
+            None if no snapshot has been needed yet.
     """
-    def __init__(self, voice_client: discord.VoiceClient):
+    def __init__(
+        self,
+        voice_client: discord.VoiceClient,
+        guild_id: int,
+        max_queue_length: int = DEFAULT_MAX_QUEUE_LENGTH
+    ):
         """Initialize this AudioQueueList.
 
         Set the members of this AudioQueueList to their defaults or passed in
-        values.
+        values. Must be called from within the bot's event loop.
 
         Args:
             self: This AudioQueueList
             voice_client: What to initialize self.voice_client as
+            guild_id: What to initialize self.guild_id as
+            max_queue_length: What to initialize self.max_queue_length as
         """
         self.voice_client = voice_client
+        self.guild_id = guild_id
         self.num_priority_levels = 3
         self.queue_list = []
         for i in range(self.num_priority_levels):
-            self.queue_list.append([])
-        self.max_queue_length = 20
+            self.queue_list.append(LinkedQueue())
+        self.node_dict = {}
+        self.queued_seconds_list = [0.0] * self.num_priority_levels
+        self.author_queued_seconds_dict = {}
+        self.policy_list = []
+        for i in range(self.num_priority_levels):
+            self.policy_list.append(audio_scheduling.POLICY_DICT[
+                DEFAULT_SCHEDULING_POLICY_TUPLE[i]
+            ](self.queue_list[i]))
+        self.next_audio_queue_element_id = 0
+        self.max_queue_length = max_queue_length
         self.latest_audio = None
+        self.overlay_audio = None
+        self.is_ducking_enabled = True
+        self.aging_seconds = DEFAULT_AGING_SECONDS
+        self.near_end_seconds = DEFAULT_NEAR_END_SECONDS
+        self.min_tempo_queued_seconds = DEFAULT_MIN_TEMPO_QUEUED_SECONDS
+        self.max_tempo_queued_seconds = DEFAULT_MAX_TEMPO_QUEUED_SECONDS
+        self.max_tempo = DEFAULT_MAX_TEMPO
+        self.last_speaker_user_id = None
+        self.last_speaker_audio_queue_element_id = None
+        self.time_last_spoken = 0.0
+        self.speaker_window_seconds = DEFAULT_SPEAKER_WINDOW_SECONDS
+        self.coalesce_policy = DEFAULT_COALESCE_POLICY
+        self.coalesce_window_seconds = DEFAULT_COALESCE_WINDOW_SECONDS
+        self.coalesce_dict = {}
+        self.mixer = audio_source.AudioMixer()
         self.is_paused = False
         self.volume = 1.0
-        self.play_next.start()
+        self.loop = asyncio.get_running_loop()
+        self.wake_event = asyncio.Event()
+        self.play_next_task = self.loop.create_task(self.play_next_forever())
+        self.playback_task_set = set()
+        self.prepared_audio = None
+        self.snapshot_dirty_id_set = set()
+        self.snapshot_removed_id_set = set()
+        self.snapshot_task = None
+
+    def close(self) -> None:
+        """Stop this AudioQueueList's task and any audio it is playing.
+
+        Cancel self.play_next_task, so it does not keep sleeping, or playing
+        audio, after this AudioQueueList is no longer used. Save a last
+        snapshot of it, to restore it from later.
+
+        Args:
+            self: This AudioQueueList
+        """
+        self.play_next_task.cancel()
+        self.pause_playing_audio()
+        self.prepare_next_audio(None)
+        self.mixer.clear()
+        if self.snapshot_task is not None:
+            self.snapshot_task.cancel()
+        self.save_snapshot()
+
+    def wake(self) -> None:
+        """Wake play_next_task to check if it should play different audio.
+
+        Wake self.play_next_task from within the bot's event loop. Call this
+        after anything happens that could change what audio should be playing.
+
+        Args:
+            self: This AudioQueueList
+        """
+        self.wake_event.set()
 
     def get_num_audio_files_queued(self) -> int:
         """Get the combined length of all this AudioQueueList's audio queues.
@@ -352,128 +1189,464 @@ class AudioQueueList(commands.Cog):
         Returns:
             The number of AudioQueueElement self.queue_list stores.
         """
-        num_audio_files_queued = 0
-        for queue in self.queue_list:
-            num_audio_files_queued += len(queue)
-        return num_audio_files_queued
+        return len(self.node_dict)
 
-    def get_index_in_queue(
-        self,
-        audio_queue_element_id: int,
-        priority: int
-    ) -> int:
-        """Get AudioQueueElement index with audio_queue_element_id and priority.
+    def get(self, audio_queue_element_id: int):
+        """Get the AudioQueueElement matching audio_queue_element_id.
 
-        Get the index in self.queue_list[priority] of the AudioQueueElement
-        matching audio_queue_element_id.
+        Args:
+            self: This AudioQueueList
+            audio_queue_element_id: The ID of the AudioQueueElement to get
+
+        Returns:
+            The AudioQueueElement matching audio_queue_element_id, None if no
+            match was found.
+        """
+        node = self.node_dict.get(audio_queue_element_id, None)
+        return None if node is None else node.value
+
+    def get_index_in_queue(self, audio_queue_element_id: int) -> int:
+        """Get the index of the AudioQueueElement with audio_queue_element_id.
+
+        Get the number of AudioQueueElement expected to play before the
+        AudioQueueElement matching audio_queue_element_id among audio of its
+        priority, by its priority's scheduling policy.
 
         Args:
             self: This AudioQueueList
             audio_queue_element_id: The ID of the AudioQueueElement to find.
-            priority: The priority level of the AudioQueueElement to find.
 
         Returns:
             The index of the AudioQueueElement matching audio_queue_element_id
-            and priority. -1 if no match was found.
+            in the order its priority's audio is expected to play. -1 if no
+            match was found.
         """
-        # The queue to view depends on the priority
-        if priority >= self.num_priority_levels:
+        node = self.node_dict.get(audio_queue_element_id, None)
+        if node is None:
             return -1
-        queue = self.queue_list[priority]
+        return self.policy_list[node.value.priority].get_num_ahead(node.value)
 
-        # Find the index in queue of the AudioQueueSource with matching ID
-        for i in range(len(queue)):
-            if queue[i].audio_queue_element_id == audio_queue_element_id:
-                return i
+    def set_scheduling_policy(self, priority: int, policy_name: str) -> bool:
+        """Change the scheduling policy audio of priority is picked by.
 
-        # No match was found, return failure
-        return -1
-
-    def add(
-        self,
-        ctx: discord.ApplicationContext,
-        description: str,
-        file_path: str,
-        priority: int
-    ) -> int:
-        """Add a new AudioQueueElement to this AudioQueueList.
-
-        If there is room in the audio queue, append new AudioQueueElement to the
-        end of self.queue with the passed in parameters and a unique ID.
+        Replace the scheduling policy of priority with a new one named
+        policy_name, which starts keeping track of the audio already in queue.
 
         Args:
             self: This AudioQueueList
-            ctx: The ctx of the SlashCommand this function is being called from
-            description: A human-readable description of the audio to play
-            file_path: The path to the audio file to actually play
-            priority: The priority level of the audio to play. Please use the
+            priority: The priority level whose scheduling policy to change
+            policy_name: The name of the scheduling policy to use, one of
+                audio_scheduling.POLICY_DICT
+
+        Returns:
+            Whether priority and policy_name were valid and the scheduling
+            policy was changed.
+        """
+        if priority < 0 or priority >= self.num_priority_levels or \
+            policy_name not in audio_scheduling.POLICY_DICT:
+            return False
+        policy = audio_scheduling.POLICY_DICT[policy_name](
+            self.queue_list[priority]
+        )
+        for audio_queue_element in self.queue_list[priority]:
+            policy.add(audio_queue_element)
+        self.policy_list[priority] = policy
+        self.wake()
+        return True
+
+    def count_queued_seconds(
+        self,
+        audio_queue_element: AudioQueueElement,
+        is_queued: bool
+    ) -> None:
+        """Update the seconds audio_queue_element counts in queued_seconds_list.
+
+        Call this after audio_queue_element is added, paused, or removed.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to count
+            is_queued: Whether audio_queue_element is still in queue, otherwise,
+                stop counting it
+        """
+        author_key = (
+            audio_queue_element.priority,
+            audio_queue_element.author_user_id
+        )
+        author_queued_seconds = self.author_queued_seconds_dict.get(
+            author_key,
+            0.0
+        ) - audio_queue_element.queued_seconds
+        self.queued_seconds_list[audio_queue_element.priority] -= \
+            audio_queue_element.queued_seconds
+        audio_queue_element.queued_seconds = 0.0
+        if is_queued is True:
+            audio_queue_element.queued_seconds = \
+                audio_queue_element.get_seconds_left_with_repeats() or 0.0
+            self.queued_seconds_list[audio_queue_element.priority] += \
+                audio_queue_element.queued_seconds
+            author_queued_seconds += audio_queue_element.queued_seconds
+
+        # Forget members with no audio left to play
+        if author_queued_seconds > 0.001:
+            self.author_queued_seconds_dict[author_key] = author_queued_seconds
+        else:
+            self.author_queued_seconds_dict.pop(author_key, None)
+
+    def get_queued_seconds(
+        self,
+        priority: int,
+        author_user_id: int = None
+    ) -> float:
+        """Get how many seconds of audio of priority are left to play.
+
+        Args:
+            self: This AudioQueueList
+            priority: The priority level of the audio to count
+            author_user_id: The ID of the member to only count the audio of,
+                None to count every member's
+
+        Returns:
+            The seconds left to play of every AudioQueueElement of priority,
+            queued by author_user_id if given, counting how far audio currently
+            playing has gotten, not counting audio of unknown duration.
+        """
+        if author_user_id is None:
+            queued_seconds = self.queued_seconds_list[priority]
+        else:
+            queued_seconds = self.author_queued_seconds_dict.get(
+                (priority, author_user_id),
+                0.0
+            )
+        for audio_queue_element in (self.latest_audio, self.overlay_audio):
+            if audio_queue_element is None or \
+                audio_queue_element.priority != priority or \
+                not audio_queue_element.is_playing() or \
+                author_user_id not in (
+                    None,
+                    audio_queue_element.author_user_id
+                ):
+                continue
+            queued_seconds += (audio_queue_element.get_seconds_left() or 0.0) \
+                - audio_queue_element.queued_seconds
+        return max(0.0, queued_seconds)
+
+    def can_admit(
+        self,
+        author_user_id: int,
+        priority: int,
+        seconds: float
+    ) -> bool:
+        """Get whether a member may queue seconds more audio of priority.
+
+        Check, before making the audio, so audio that won't be queued never
+        costs a download or CPU time, whether queueing it would put more than
+        MAX_QUEUED_SECONDS_TUPLE seconds of audio of priority in queue, or more
+        than MAX_AUTHOR_QUEUED_SECONDS_TUPLE seconds of it queued by
+        author_user_id.
+
+        Args:
+            self: This AudioQueueList
+            author_user_id: The ID of the member wanting to queue audio
+            priority: The priority level of the audio to queue
+            seconds: The length of the audio to queue, in seconds, estimated if
+                not known yet
+
+        Returns:
+            Whether the audio fits in queue. If not, tell the member how long
+            audio queued now would wait to play, from
+            get_seconds_until_new_audio_plays().
+        """
+        if priority < 0 or priority >= self.num_priority_levels:
+            return False
+        return self.get_queued_seconds(priority) + seconds <= \
+            MAX_QUEUED_SECONDS_TUPLE[priority] and \
+            self.get_queued_seconds(priority, author_user_id) + seconds <= \
+            MAX_AUTHOR_QUEUED_SECONDS_TUPLE[priority]
+
+    def get_seconds_until_new_audio_plays(self, priority: int) -> float:
+        """Estimate how long audio of priority queued now would wait to play.
+
+        Args:
+            self: This AudioQueueList
+            priority: The priority level of the audio
+
+        Returns:
+            The seconds left to play of all audio of priority or higher in
+            queue, from queued_seconds_list, not counting audio of unknown
+            duration.
+        """
+        return sum(
+            self.get_queued_seconds(queued_priority) for queued_priority in \
+            range(priority, self.num_priority_levels)
+        )
+
+    def get_seconds_until_played(self, audio_queue_element_id: int) -> float:
+        """Estimate how long until the matching AudioQueueElement plays.
+
+        Add up the seconds left of all higher priority audio, from
+        queued_seconds_list, and the seconds left of each audio of its own
+        priority expected to play before it, walking its priority's audio in
+        the order its scheduling policy expects to play it, which takes time
+        proportional to how much audio of its priority is queued. An estimate,
+        since audio may be added, moved, or removed meanwhile. Audio of
+        unknown duration counts as 0 seconds.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element_id: The ID of the AudioQueueElement to estimate
+                for
+
+        Returns:
+            The estimated number of seconds until the AudioQueueElement
+            matching audio_queue_element_id starts playing, 0.0 if it's
+            playing, -1.0 if no match was found.
+        """
+        node = self.node_dict.get(audio_queue_element_id, None)
+        if node is None:
+            return -1.0
+        audio_queue_element = node.value
+        if audio_queue_element.is_playing():
+            return 0.0
+
+        # All higher priority audio plays first
+        seconds = 0.0
+        for priority in range(
+            audio_queue_element.priority + 1,
+            self.num_priority_levels
+        ):
+            seconds += self.get_queued_seconds(priority)
+
+        # Then what's left of each audio of its priority expected to play
+        # before it, including any already started. Audio repeating only
+        # plays again from the back of the queue, so only its current play
+        # counts.
+        for queued_audio in self.policy_list[
+            audio_queue_element.priority
+        ].iterate_play_order():
+            if queued_audio == audio_queue_element:
+                break
+            seconds += queued_audio.get_seconds_left() or 0.0
+        return seconds
+
+    def set_max_queue_length(self, max_queue_length: int) -> bool:
+        """Change the maximum number of AudioQueueElement to allow in queue.
+
+        Set self.max_queue_length to max_queue_length, if it is between 1 and
+        MAX_MAX_QUEUE_LENGTH. Audio already in queue is kept, even if there is
+        now more of it than max_queue_length.
+
+        Args:
+            self: This AudioQueueList
+            max_queue_length: What to set self.max_queue_length to
+
+        Returns:
+            Whether max_queue_length was valid and self.max_queue_length was
+            changed.
+        """
+        if max_queue_length < 1 or max_queue_length > MAX_MAX_QUEUE_LENGTH:
+            return False
+        self.max_queue_length = max_queue_length
+        self.schedule_snapshot()
+        return True
+
+    def add(
+        self,
+        ctx: discord.ApplicationContext,
+        description: str,
+        file_path: str,
+        priority: int,
+        gain: float = 1.0,
+        time_enqueued: float = None,
+        stream_url: str = None,
+        duration: float = None,
+        is_coalescable: bool = False
+    ) -> int:
+        """Add a new AudioQueueElement to this AudioQueueList.
+
+        If there is room in the audio queue, append new AudioQueueElement to the
+        end of self.queue with the passed in parameters and a unique ID.
+
+        Args:
+            self: This AudioQueueList
+            ctx: The ctx of the SlashCommand this function is being called from
+            description: A human-readable description of the audio to play
+            file_path: The path to the audio file to actually play
+            priority: The priority level of the audio to play. Please use the
                 a constant at the top of this file for better readability
                 (LOW_PRIORITY, MEDIUM_PRIORITY, etc.).
+            gain: What to multiply the volume of the audio to play by, on top
+                of self.volume.
+            time_enqueued: When the command queueing the audio was called,
+                measured in seconds since the last epoch, None if it's now.
+            stream_url: A URL to stream the audio from until file_path is made,
+                None if file_path is already made.
+            duration: The length of the audio to play, in seconds, None to
+                look it up in the file cache index.
+            is_coalescable: Whether the audio may be coalesced, by
+                self.coalesce_policy, with the same audio the same member
+                queued with is_coalescable within self.coalesce_window_seconds.
+                Leave False for audio that has to keep its own place in queue,
+                such as a part of a larger message.
 
         Returns:
-            The ID of the element once placed in queue. -1 if it was not placed.
+            The ID of the element once placed in queue, or that it was
+            coalesced into. -1 if it was not placed.
         """
-        # Do not allow addition of another audio source if queue is already full
-        if self.get_num_audio_files_queued() >= self.max_queue_length:
-            return -1
-
         # The queue to modify depends on the priority
-        if priority >= self.num_priority_levels:
+        if priority < 0 or priority >= self.num_priority_levels:
             return -1
         queue = self.queue_list[priority]
 
-        # Generate unique audio_queue_element_id for audio_queue
-        audio_queue_element_id = 0
-        if len(queue) > 0:
-            audio_queue_element_id = \
-                (queue[-1].audio_queue_element_id + 1) % 1000
-
-        # Add a new AudioQueueElement to this AudioQueueList with unique ID
-        queue.append(
-            AudioQueueElement(
-                audio_queue_element_id = audio_queue_element_id,
+        # If the author just queued the same audio, coalesce it into that,
+        # which doesn't take up more room in queue
+        if is_coalescable is True:
+            coalesced_audio_queue_element_id = self.coalesce(
                 author_user_id = ctx.author.id,
-                source_command = f"/{ctx.command.qualified_name}",
-                description = description,
                 file_path = file_path,
                 priority = priority
             )
+            if coalesced_audio_queue_element_id > -1:
+                return coalesced_audio_queue_element_id
+
+        # Do not allow addition of another audio source if queue is already full
+        if self.get_num_audio_files_queued() >= self.max_queue_length:
+            return -1
+
+        # Generate unique audio_queue_element_id for audio_queue
+        audio_queue_element_id = self.next_audio_queue_element_id
+        self.next_audio_queue_element_id += 1
+
+        # Add a new AudioQueueElement to this AudioQueueList with unique ID
+        if duration is None:
+            duration = file_cache.get_duration(file_path)
+        audio_queue_element = AudioQueueElement(
+            audio_queue_element_id = audio_queue_element_id,
+            author_user_id = ctx.author.id,
+            source_command = f"/{ctx.command.qualified_name}",
+            description = description,
+            file_path = file_path,
+            priority = priority,
+            gain = gain,
+            stream_url = stream_url,
+            duration = duration
+        )
+        audio_queue_element.time_file_ready = time.time()
+        audio_queue_element.time_waiting_since = \
+            audio_queue_element.time_file_ready
+        audio_queue_element.time_enqueued = time_enqueued \
+            if time_enqueued is not None \
+            else audio_queue_element.time_file_ready
+        self.node_dict[audio_queue_element_id] = queue.append(
+            audio_queue_element
         )
+        self.policy_list[priority].add(audio_queue_element)
+        self.count_queued_seconds(audio_queue_element, True)
+        if is_coalescable is True:
+            self.coalesce_dict[(ctx.author.id, file_path)] = audio_queue_element
+
+        # The new audio may need to be played right away
+        self.mark_snapshot_dirty(audio_queue_element_id)
+        self.wake()
         return audio_queue_element_id
 
     # TODO: Remove all audio from a certain member
     #       when they leave or are blacklisted?
-    def remove(
-        self,
-        audio_queue_element_id: int,
-        priority: int
-    ) -> bool:
+    def remove(self, audio_queue_element_id: int) -> bool:
         """Remove an existing AudioQueueElement from this AudioQueueList.
 
-        If an AudioQueueElement matching priority and audio_queue_element_id
-        exists within self.queue_list, remove it, and stop playing it if it is
-        currently playing.
+        If an AudioQueueElement matching audio_queue_element_id exists within
+        self.queue_list, remove it, and stop playing it if it is currently
+        playing.
 
         Args:
             self: This AudioQueueList
             audio_queue_element_id: The ID of the AudioQueueElement to remove
-            priority: The priority level of the audio to remove.
 
         Returns:
             Whether the AudioQueueElement asking to be removed could be found
             and was removed.
         """
-        # Get the index of the AudioQueueSource with matching ID and priority
-        match_index = self.get_index_in_queue(audio_queue_element_id, priority)
-        if match_index == -1:
+        # Get the node holding the AudioQueueElement with matching ID
+        node = self.node_dict.pop(audio_queue_element_id, None)
+        if node is None:
             return False
 
         # Remove the audio from queue_list, stop it if it's currently playing
-        if self.latest_audio == self.queue_list[priority][match_index]:
-            self.latest_audio.pause(self.voice_client)
-        self.queue_list[priority].pop(match_index)
+        if self.latest_audio == node.value:
+            self.latest_audio.pause(self.mixer)
+            self.latest_audio = None
+        if self.overlay_audio == node.value:
+            self.overlay_audio.pause(self.mixer)
+            self.overlay_audio = None
+        if self.prepared_audio == node.value:
+            self.prepare_next_audio(None)
+        node.queue.remove_node(node)
+        self.policy_list[node.value.priority].remove(node.value)
+        self.count_queued_seconds(node.value, False)
+        self.forget_coalescable(node.value)
+        self.mark_snapshot_removed(audio_queue_element_id)
+
+        # If the last speaker's message is removed before it played, their
+        # name was never heard, so announce it next time
+        if audio_queue_element_id == \
+            self.last_speaker_audio_queue_element_id and \
+            node.value.time_started_play == 0.00:
+            self.last_speaker_user_id = None
+
+        # Something else may need to be played in place of the removed audio
+        self.wake()
+        return True
+
+    def move_to_front(self, audio_queue_element_id: int) -> bool:
+        """Move an existing AudioQueueElement to the front of its queue.
 
-        # Return success
+        If an AudioQueueElement matching audio_queue_element_id exists within
+        self.queue_list, move it in front of all other audio of its priority,
+        other than any audio of its priority already playing, so it is the next
+        of its priority to play, without cutting off what's playing.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element_id: The ID of the AudioQueueElement to move
+
+        Returns:
+            Whether the AudioQueueElement asking to be moved could be found and
+            was moved.
+        """
+        # Get the node holding the AudioQueueElement with matching ID
+        node = self.node_dict.get(audio_queue_element_id, None)
+        if node is None:
+            return False
+        policy = self.policy_list[node.value.priority]
+        if policy.current_audio == node.value:
+            return True
+
+        # Move the node to the front of its queue, right after the node of the
+        # audio playing, if any, numbering it between the two nodes around it
+        queue = node.queue
+        queue.remove_node(node)
+        previous_node = None if policy.current_audio is None \
+            else self.node_dict.get(
+                policy.current_audio.audio_queue_element_id,
+                None
+            )
+        queue.insert_node_after(node, previous_node)
+        if node.next_node is not None and node.previous_node is not None:
+            node.value.queue_position = (
+                node.previous_node.value.queue_position \
+                + node.next_node.value.queue_position
+            ) / 2
+        elif node.next_node is not None:
+            node.value.queue_position = node.next_node.value.queue_position - 1
+        elif node.previous_node is not None:
+            node.value.queue_position = \
+                node.previous_node.value.queue_position + 1
+        policy.bump(node.value)
+        self.mark_snapshot_dirty(audio_queue_element_id)
+
+        # The moved audio may need to be prepared in place of the next audio
+        self.wake()
         return True
 
     def pause(self) -> None:
@@ -491,9 +1664,11 @@ class AudioQueueList(commands.Cog):
 
         # Set is_paused to True so play_next() pauses playing audio
         self.is_paused = True
+        self.schedule_snapshot()
 
         # If audio is currently playing, stop it, and remember its progress
-        self.latest_audio.pause(self.voice_client)
+        self.pause_playing_audio()
+        self.wake()
 
     def unpause(self) -> None:
         """Keep playing audio until paused.
@@ -511,113 +1686,893 @@ class AudioQueueList(commands.Cog):
 
         # Resume queue, play_next() should automatically pick up progress
         self.is_paused = False
+        self.schedule_snapshot()
+        self.wake()
+
+    def pause_playing_audio(self) -> None:
+        """Pause latest_audio and overlay_audio, if they are playing.
+
+        Args:
+            self: This AudioQueueList
+        """
+        for audio_queue_element in (self.overlay_audio, self.latest_audio):
+            if audio_queue_element is not None:
+                self.pause_audio(audio_queue_element)
+
+    def pause_audio(self, audio_queue_element: AudioQueueElement) -> None:
+        """Pause audio_queue_element, and save its progress with the snapshot.
+
+        Count only what's left of it in queued_seconds_list from now on.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to pause
+        """
+        if audio_queue_element.is_playing():
+            audio_queue_element.pause(self.mixer)
+            self.count_queued_seconds(
+                audio_queue_element,
+                audio_queue_element.audio_queue_element_id in self.node_dict
+            )
+            self.mark_snapshot_dirty(
+                audio_queue_element.audio_queue_element_id
+            )
 
-    # NOTE: There's probably a more efficient way to do this, such as with
-    # events and listeners
     # TODO: Use discord.BaseActivity to display statuses of the bot, such as
     # paused, or the url and progress of what it's playing
-    @tasks.loop(seconds=1.0)
-    async def play_next(self) -> None:
-        """Play the next AudioQueueElement in queue.
+    def remove_finished(self, audio_queue_element: AudioQueueElement) -> None:
+        """Remove audio_queue_element from queue once it has finished playing.
+
+        Record the play in this guild's audio_history, then remove
+        audio_queue_element, or queue it again, if it has repeats left.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement that played until its end
+        """
+        if self.latest_audio == audio_queue_element:
+            self.latest_audio = None
+        if self.overlay_audio == audio_queue_element:
+            self.overlay_audio = None
+        audio_queue_element.time_finished = time.time()
+        self.record_latency(audio_queue_element)
+        audio_history.record(self.guild_id, audio_history.PlayedAudio(
+            author_user_id = audio_queue_element.author_user_id,
+            description = audio_queue_element.description,
+            file_path = audio_queue_element.file_path,
+            priority = audio_queue_element.priority,
+            gain = audio_queue_element.gain,
+            duration = audio_queue_element.duration,
+            time_finished = audio_queue_element.time_finished
+        ))
+        if audio_queue_element.audio_queue_element_id == \
+            self.last_speaker_audio_queue_element_id:
+            self.time_last_spoken = audio_queue_element.time_finished
+        node = self.node_dict.get(audio_queue_element.audio_queue_element_id)
+        if node is None or node.value != audio_queue_element:
+            return
+        queue = node.queue
+        del self.node_dict[audio_queue_element.audio_queue_element_id]
+        queue.remove_node(node)
+        self.policy_list[audio_queue_element.priority].remove(
+            audio_queue_element
+        )
+        self.count_queued_seconds(audio_queue_element, False)
+
+        # If copies of the audio were merged into it, queue it again, at the
+        # back of its priority, to play the next copy, as if it was just added
+        if audio_queue_element.repeat_count > 1:
+            audio_queue_element.repeat_count -= 1
+            audio_queue_element.time_played = 0.00
+            audio_queue_element.seconds_waited = 0.00
+            audio_queue_element.time_enqueued = \
+                audio_queue_element.time_finished
+            audio_queue_element.time_file_ready = \
+                audio_queue_element.time_finished
+            audio_queue_element.time_waiting_since = \
+                audio_queue_element.time_finished
+            audio_queue_element.time_source_created = None
+            audio_queue_element.time_first_frame_read = None
+            audio_queue_element.time_finished = None
+            if queue.tail_node is not None:
+                audio_queue_element.queue_position = \
+                    queue.tail_node.value.queue_position + 1
+            self.node_dict[audio_queue_element.audio_queue_element_id] = \
+                queue.append(audio_queue_element)
+            self.policy_list[audio_queue_element.priority].add(
+                audio_queue_element
+            )
+            self.count_queued_seconds(audio_queue_element, True)
+            self.mark_snapshot_dirty(audio_queue_element.audio_queue_element_id)
+            return
+
+        self.forget_coalescable(audio_queue_element)
+        self.mark_snapshot_removed(audio_queue_element.audio_queue_element_id)
+
+    async def wait_for_playback(
+        self,
+        audio_queue_element: AudioQueueElement,
+        playback: AudioPlayback
+    ) -> None:
+        """Wait for a play of audio_queue_element to stop, then handle it.
+
+        Await playback.stopped, and charge how long it played to its member,
+        for its priority's scheduling policy. If the audio was not stopped
+        early, such as to be paused, it finished, so remove it from queue.
+        Either way, wake play_next_task to play whatever should play next.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement being played
+            playback: The AudioPlayback audio_queue_element.play() returned
+        """
+        await playback.stopped
+        if audio_queue_element.time_first_frame_read is None:
+            audio_queue_element.time_first_frame_read = \
+                playback.audio_source.time_first_read
+        self.policy_list[audio_queue_element.priority].charge(
+            audio_queue_element,
+            playback.audio_source.get_seconds_read()
+        )
+        if playback.is_stopped_early is False:
+            self.remove_finished(audio_queue_element)
+        self.wake()
+
+    def record_latency(self, audio_queue_element: AudioQueueElement) -> None:
+        """Record how long each stage of playing audio_queue_element took.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement that finished playing
+        """
+        for stage, start_time, end_time in (
+            (
+                audio_latency.STAGE_FILE_READY,
+                audio_queue_element.time_enqueued,
+                audio_queue_element.time_file_ready
+            ),
+            (
+                audio_latency.STAGE_SOURCE_CREATED,
+                audio_queue_element.time_file_ready,
+                audio_queue_element.time_source_created
+            ),
+            (
+                audio_latency.STAGE_FIRST_FRAME,
+                audio_queue_element.time_source_created,
+                audio_queue_element.time_first_frame_read
+            ),
+            (
+                audio_latency.STAGE_TOTAL,
+                audio_queue_element.time_enqueued,
+                audio_queue_element.time_first_frame_read
+            ),
+            (
+                audio_latency.STAGE_PLAYED,
+                audio_queue_element.time_first_frame_read,
+                audio_queue_element.time_finished
+            ),
+        ):
+            audio_latency.record(self.guild_id, stage, start_time, end_time)
+
+    def coalesce(
+        self,
+        author_user_id: int,
+        file_path: str,
+        priority: int
+    ) -> int:
+        """Coalesce audio about to be queued into the same audio in queue.
+
+        If author_user_id queued audio with file_path and priority within
+        self.coalesce_window_seconds, and it's still in queue, drop the new
+        audio, or, by self.coalesce_policy, merge it into the audio in queue,
+        to play once more, up to MAX_REPEAT_COUNT times.
+
+        Args:
+            self: This AudioQueueList
+            author_user_id: The ID of the member queueing the audio
+            file_path: The path to the audio file being queued
+            priority: The priority level the audio is being queued with
+
+        Returns:
+            The ID of the AudioQueueElement the audio was coalesced into, -1 if
+            it wasn't, and should be queued on its own.
+        """
+        audio_queue_element = self.coalesce_dict.get(
+            (author_user_id, file_path)
+        )
+        now = time.time()
+        if audio_queue_element is None or \
+            audio_queue_element.priority != priority or \
+            now - audio_queue_element.time_last_queued > \
+            self.coalesce_window_seconds:
+            return -1
+
+        # Keep coalescing audio for as long as it's spammed
+        audio_queue_element.time_last_queued = now
+        if self.coalesce_policy == COALESCE_REPEAT and \
+            audio_queue_element.repeat_count < MAX_REPEAT_COUNT:
+            audio_queue_element.repeat_count += 1
+            self.count_queued_seconds(audio_queue_element, True)
+            self.mark_snapshot_dirty(audio_queue_element.audio_queue_element_id)
+        return audio_queue_element.audio_queue_element_id
+
+    def forget_coalescable(
+        self,
+        audio_queue_element: AudioQueueElement
+    ) -> None:
+        """Stop coalescing audio queued again into audio_queue_element.
+
+        Call this after audio_queue_element leaves queue for good.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement no longer in queue
+        """
+        coalesce_key = (
+            audio_queue_element.author_user_id,
+            audio_queue_element.file_path
+        )
+        if self.coalesce_dict.get(coalesce_key) == audio_queue_element:
+            del self.coalesce_dict[coalesce_key]
+
+    def is_last_speaker(self, author_user_id: int, priority: int) -> bool:
+        """Get whether a TTS message can skip announcing its author's name.
 
-        Play queue[0] in voice chat unless paused, already playing something,
-        or there is nothing to play.
+        A member's TTS message can skip announcing their name if the last TTS
+        message in this voice session was theirs, it's still queued, or
+        finished playing within self.speaker_window_seconds, and none of the
+        audio queued with priority is anyone else's, so their messages play
+        back to back.
 
         Args:
             self: This AudioQueueList
+            author_user_id: The ID of the member about to queue a TTS message
+            priority: The priority level the TTS message will be queued with
+
+        Returns:
+            Whether author_user_id was the last speaker, recently enough, that
+            their name doesn't need announcing again.
+        """
+        if self.last_speaker_user_id != author_user_id or \
+            self.speaker_window_seconds <= 0:
+            return False
+        if self.last_speaker_audio_queue_element_id not in self.node_dict and \
+            time.time() - self.time_last_spoken > self.speaker_window_seconds:
+            return False
+        for audio_queue_element in self.queue_list[priority]:
+            if audio_queue_element.author_user_id != author_user_id:
+                return False
+        return True
+
+    def set_last_speaker(
+        self,
+        author_user_id: int,
+        audio_queue_element_id: int
+    ) -> None:
+        """Remember who queued the most recent TTS message, and when.
+
+        Args:
+            self: This AudioQueueList
+            author_user_id: The ID of the member who queued the TTS message
+            audio_queue_element_id: The ID of the AudioQueueElement of the TTS
+                message
         """
-        # Remove finished audio from each queue
-        for queue in self.queue_list:
-            if len(queue) > 0 and queue[0].is_finished:
-                queue.pop(0)
+        self.last_speaker_user_id = author_user_id
+        self.last_speaker_audio_queue_element_id = audio_queue_element_id
+        self.time_last_spoken = time.time()
 
+    def get_effective_priority(
+        self,
+        audio_queue_element: AudioQueueElement,
+        now: float
+    ) -> float:
+        """Get the priority to pick audio_queue_element to play by.
+
+        Get the priority of audio_queue_element, raised by one level for every
+        self.aging_seconds it has waited to play, and by PREEMPTION_MARGIN if
+        it's playing, so playing audio is only stopped for audio that is
+        clearly more important.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to get the priority of
+            now: The current time, measured in seconds since the last epoch
+
+        Returns:
+            The effective priority of audio_queue_element.
+        """
+        effective_priority = audio_queue_element.priority
+        if self.aging_seconds > 0:
+            effective_priority += audio_queue_element.get_seconds_waited(now) \
+                / self.aging_seconds
+        if audio_queue_element.is_playing():
+            effective_priority += PREEMPTION_MARGIN
+        return effective_priority
+
+    def get_tempo(self, audio_queue_element: AudioQueueElement) -> float:
+        """Get the tempo to play audio_queue_element at.
+
+        Speed up ADAPTIVE_TEMPO_PRIORITY audio as more of it is queued, from
+        normal tempo at self.min_tempo_queued_seconds queued, to
+        self.max_tempo at self.max_tempo_queued_seconds queued, so a backlog
+        of it is played through faster. Counted from queued_seconds_list,
+        which only changes as audio is added, paused, or removed, so audio
+        prepared ahead of time still has the right tempo once it plays.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to play
+
+        Returns:
+            How many times faster than normal to play audio_queue_element,
+            rounded to TEMPO_STEP.
+        """
+        if audio_queue_element.priority != ADAPTIVE_TEMPO_PRIORITY or \
+            self.max_tempo <= 1.0:
+            return 1.0
+        queued_seconds = self.queued_seconds_list[ADAPTIVE_TEMPO_PRIORITY]
+        if queued_seconds <= self.min_tempo_queued_seconds:
+            return 1.0
+        fraction = min(1.0, (queued_seconds - self.min_tempo_queued_seconds) \
+            / max(
+                1.0,
+                self.max_tempo_queued_seconds - self.min_tempo_queued_seconds
+            ))
+        tempo = 1.0 + fraction * (self.max_tempo - 1.0)
+        return round(round(tempo / TEMPO_STEP) * TEMPO_STEP, 2)
+
+    def is_near_end(self, audio_queue_element: AudioQueueElement) -> bool:
+        """Get whether audio_queue_element is about to finish playing.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to check
+
+        Returns:
+            Whether audio_queue_element's length is known, and it has at most
+            self.near_end_seconds left to play.
+        """
+        seconds_left = audio_queue_element.get_seconds_left()
+        return seconds_left is not None and \
+            seconds_left <= self.near_end_seconds
+
+    def get_next_audio(self, playing_audio_list: list):
+        """Get the AudioQueueElement expected to play after playing_audio_list.
+
+        Get the highest priority audio in queue, other than the audio in
+        playing_audio_list, that its priority's scheduling policy would pick.
+        This is what will play once the audio in playing_audio_list finishes,
+        if nothing is added, removed, or moved before then.
+
+        Args:
+            self: This AudioQueueList
+            playing_audio_list: A list of the AudioQueueElement currently
+                playing
+
+        Returns:
+            The AudioQueueElement expected to play after playing_audio_list,
+            None if there is none.
+        """
+        for policy in reversed(self.policy_list):
+            next_audio = policy.peek_after(playing_audio_list)
+            if next_audio is not None:
+                return next_audio
+        return None
+
+    def prepare_next_audio(self, audio_queue_element) -> None:
+        """Make the audio source of audio_queue_element ahead of time.
+
+        Make the audio source of audio_queue_element, and read its first frames
+        in another thread, so it's ready to play the moment the current audio
+        finishes. Throw away the audio source of the previously prepared
+        AudioQueueElement, if it's not audio_queue_element.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element: The AudioQueueElement to prepare, None to only
+                throw away the previously prepared audio source.
+        """
+        # Don't do anything if audio_queue_element is already prepared
+        tempo = 1.0
+        if audio_queue_element is not None:
+            tempo = self.get_tempo(audio_queue_element)
+        if audio_queue_element is not None and \
+            audio_queue_element == self.prepared_audio and \
+            audio_queue_element.is_prepared_for(self.volume, tempo):
+            return
+
+        # Throw away what was prepared before
+        if self.prepared_audio is not None:
+            self.prepared_audio.unprepare()
+        self.prepared_audio = audio_queue_element
+        if audio_queue_element is None:
+            return
+
+        # Start audio_queue_element's FFmpeg process and, in another thread,
+        # wait for its first frames
+        prepared_audio_source = audio_queue_element.prepare(self.volume, tempo)
+        if prepared_audio_source is not None:
+            self.loop.run_in_executor(
+                None,
+                prepared_audio_source.prebuffer,
+                NUM_PREBUFFERED_FRAMES
+            )
+
+    async def play_next_forever(self) -> None:
+        """Call play_next() every time this AudioQueueList is woken.
+
+        Sleep until self.wake_event is set, then play_next(), forever. Sleeps
+        for as long as it takes when there is nothing to do, rather than
+        checking on a timer.
+
+        Args:
+            self: This AudioQueueList
+        """
+        while True:
+            await self.wake_event.wait()
+            self.wake_event.clear()
+            self.play_next()
+
+    def play_next(self) -> None:
+        """Play the next AudioQueueElement in queue.
+
+        Play the highest priority audio in voice chat unless paused, already
+        playing it, or there is nothing to play. Audio that has waited long is
+        treated as higher priority, by get_effective_priority(). If lower
+        priority audio is playing, play the highest priority audio over it, if
+        ducking is enabled, otherwise, pause the audio playing in its place,
+        unless it is about to end, in which case let it finish first.
+
+        Args:
+            self: This AudioQueueList
+        """
         # Don't do anything else if there is nothing to play or we are paused
         if self.get_num_audio_files_queued() == 0 or self.is_paused is True:
+            self.prepare_next_audio(None)
             return
 
-        # Get the highest priority audio
+        # Get the highest priority audio, as picked by its priority's
+        # scheduling policy, counting how long audio has waited
+        now = time.time()
         highest_priority_audio = self.latest_audio
-        for priority in reversed(range(self.num_priority_levels)):
-            if len(self.queue_list[priority]) > 0:
-                highest_priority_audio = self.queue_list[priority][0]
-                break
+        highest_effective_priority = -math.inf
+        for queue, policy in zip(
+            reversed(self.queue_list),
+            reversed(self.policy_list)
+        ):
+            if len(queue) == 0:
+                continue
+            audio_queue_element = policy.peek()
+            effective_priority = self.get_effective_priority(
+                audio_queue_element,
+                now
+            )
+            if effective_priority > highest_effective_priority:
+                highest_priority_audio = audio_queue_element
+                highest_effective_priority = effective_priority
+
+        # Get the audio currently playing, or stopped but not yet handled
+        is_latest_playing = self.latest_audio is not None and \
+            self.latest_audio.is_playing()
+        is_overlay_playing = self.overlay_audio is not None and \
+            self.overlay_audio.is_playing()
+        playing_audio_list = []
+        if is_latest_playing:
+            playing_audio_list.append(self.latest_audio)
+        if is_overlay_playing:
+            playing_audio_list.append(self.overlay_audio)
+
+        # If the highest priority audio is playing, let it keep going, and make
+        # sure what will play after it is ready
+        if highest_priority_audio in playing_audio_list:
+            self.play_mixer()
+            self.prepare_next_audio(self.get_next_audio(playing_audio_list))
+            return
 
-        # If audio is currently playing...
-        if self.voice_client.is_playing():
-            # If it's the highest priority audio, let it keep going
-            if self.latest_audio == highest_priority_audio:
+        # Play higher priority audio over the audio playing, if possible,
+        # otherwise pause the audio playing on top, and play in its place
+        is_overlay = False
+        audio_to_pause = None
+        if is_latest_playing and not is_overlay_playing and \
+            self.is_ducking_enabled is True and \
+            highest_priority_audio.priority > self.latest_audio.priority:
+            is_overlay = True
+        elif is_overlay_playing:
+            audio_to_pause = self.overlay_audio
+            is_overlay = True
+        elif is_latest_playing:
+            audio_to_pause = self.latest_audio
+
+        # Let audio about to end finish, instead of pausing it, and make sure
+        # the highest priority audio is ready to play once it does
+        if audio_to_pause is not None:
+            if self.is_near_end(audio_to_pause):
+                self.play_mixer()
+                self.prepare_next_audio(highest_priority_audio)
                 return
-            # Otherwise, we need to pause the audio currently being played
-            self.latest_audio.pause(self.voice_client)
+            self.pause_audio(audio_to_pause)
+
+        # Play highest priority audio, if possible, otherwise remove it and
+        # wake again to try the audio after it
+        if self.prepared_audio == highest_priority_audio:
+            self.prepared_audio = None
+        self.policy_list[highest_priority_audio.priority].start(
+            highest_priority_audio
+        )
+        playback = highest_priority_audio.play(
+            self.mixer,
+            self.volume,
+            self.get_tempo(highest_priority_audio)
+        )
+        if is_overlay:
+            self.overlay_audio = highest_priority_audio
+        else:
+            self.latest_audio = highest_priority_audio
+        if playback is None:
+            self.remove(highest_priority_audio.audio_queue_element_id)
+            return
+        audio_latency.record(
+            self.guild_id,
+            audio_latency.STAGE_WAIT_TUPLE[highest_priority_audio.priority],
+            highest_priority_audio.time_waiting_since,
+            highest_priority_audio.time_started_play
+        )
+
+        # Handle the audio stopping once it does
+        playback_task = self.loop.create_task(
+            self.wait_for_playback(highest_priority_audio, playback)
+        )
+        self.playback_task_set.add(playback_task)
+        playback_task.add_done_callback(self.playback_task_set.discard)
+        self.play_mixer()
+
+        # Make sure what will play after it is ready
+        self.prepare_next_audio(self.get_next_audio(
+            [self.latest_audio, self.overlay_audio]
+        ))
+
+    def play_mixer(self) -> None:
+        """Start voice_client playing self.mixer, if it has audio to play.
 
-        # Play highest priority audio, if possible, otherwise remove it
-        self.latest_audio = highest_priority_audio
-        if self.latest_audio.play(self.voice_client, self.volume) is False:
-            self.queue.pop(0)
+        voice_client stops playing self.mixer shortly after it runs out of
+        audio, or if the voice connection has a problem, so start it again
+        whenever there is audio to play and it isn't playing.
+
+        Args:
+            self: This AudioQueueList
+        """
+        if self.mixer.get_num_tracks() == 0 or self.voice_client.is_playing():
             return
+        try:
+            self.voice_client.play(self.mixer, after=self.mixer_after)
+        except discord.ClientException:
+            print("WARNING: Could not play audio mixer because the voice " \
+                + "connection was already playing audio or isn't connected.")
+        except discord.opus.OpusNotLoaded:
+            print("WARNING: Could not play audio mixer because opus is not " \
+                + "loaded.")
 
+    def mixer_after(self, error) -> None:
+        """An after function for discord.VoiceClient.play() of self.mixer.
+
+        Wake play_next_task, thread-safely, from the audio player's thread, to
+        play self.mixer again if it still has audio to play.
+
+        Args:
+            self: This AudioQueueList
+            error: Any error that occurred during playing self.mixer.
+        """
+        if error is not None:
+            print(error)
+        self.loop.call_soon_threadsafe(self.wake)
+
+    def mark_snapshot_dirty(self, audio_queue_element_id: int) -> None:
+        """Save the AudioQueueElement with audio_queue_element_id soon.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element_id: The ID of the AudioQueueElement added or
+                changed
+        """
+        self.snapshot_dirty_id_set.add(audio_queue_element_id)
+        self.schedule_snapshot()
+
+    def mark_snapshot_removed(self, audio_queue_element_id: int) -> None:
+        """Delete the AudioQueueElement with audio_queue_element_id soon.
+
+        Args:
+            self: This AudioQueueList
+            audio_queue_element_id: The ID of the AudioQueueElement removed
+        """
+        self.snapshot_dirty_id_set.discard(audio_queue_element_id)
+        self.snapshot_removed_id_set.add(audio_queue_element_id)
+        self.schedule_snapshot()
+
+    def schedule_snapshot(self) -> None:
+        """Save a snapshot of this AudioQueueList soon, if not already going to.
+
+        Args:
+            self: This AudioQueueList
+        """
+        if self.snapshot_task is None or self.snapshot_task.done():
+            self.snapshot_task = self.loop.create_task(
+                self.save_snapshot_later()
+            )
+
+    async def save_snapshot_later(self) -> None:
+        """Save a snapshot of this AudioQueueList in SNAPSHOT_DELAY_SECONDS.
+
+        Wait SNAPSHOT_DELAY_SECONDS, so changes made in the meantime are saved
+        together, then save_snapshot(). Keep saving one every
+        SNAPSHOT_DELAY_SECONDS for as long as audio is playing, so its progress
+        is saved.
+
+        Args:
+            self: This AudioQueueList
+        """
+        while True:
+            await asyncio.sleep(SNAPSHOT_DELAY_SECONDS)
+            self.save_snapshot()
+            if len(self.get_playing_audio_list()) == 0:
+                return
+
+    def get_playing_audio_list(self) -> list:
+        """Get a list of the AudioQueueElement currently playing.
+
+        Args:
+            self: This AudioQueueList
+
+        Returns:
+            A list of latest_audio and overlay_audio, if they are playing.
+        """
+        return [
+            audio_queue_element for audio_queue_element \
+            in (self.latest_audio, self.overlay_audio) \
+            if audio_queue_element is not None \
+            and audio_queue_element.is_playing()
+        ]
+
+    def save_snapshot(self) -> bool:
+        """Save what changed in this AudioQueueList since the last snapshot.
+
+        Write every AudioQueueElement added or changed, and the progress of any
+        playing, to the audio_queues database, delete every AudioQueueElement
+        removed from it, and write this AudioQueueList's settings to the
+        audio_queue_settings database, each in one batch.
+
+        Args:
+            self: This AudioQueueList
+
+        Returns:
+            Whether the snapshot could be saved.
+        """
+        # Get the rows of every AudioQueueElement added or changed, including
+        # how far into the audio playing right now it is
+        for audio_queue_element in self.get_playing_audio_list():
+            self.snapshot_dirty_id_set.add(
+                audio_queue_element.audio_queue_element_id
+            )
+        row_list = []
+        for audio_queue_element_id in self.snapshot_dirty_id_set:
+            audio_queue_element = self.get(audio_queue_element_id)
+            if audio_queue_element is None:
+                continue
+            time_played = audio_queue_element.get_seconds_played()
+            row_list.append((
+                self.guild_id,
+                audio_queue_element.audio_queue_element_id,
+                audio_queue_element.author_user_id,
+                audio_queue_element.description,
+                audio_queue_element.source_command,
+                audio_queue_element.file_path,
+                audio_queue_element.priority,
+                audio_queue_element.gain,
+                time_played,
+                audio_queue_element.queue_position,
+                audio_queue_element.repeat_count
+            ))
+
+        # Write every change, then commit them all at once
+        status_list = [
+            sqlite.run_many(
+                file_name = "audio_queues",
+                query = "INSERT OR REPLACE INTO queued_audio VALUES " \
+                    + "(?,?,?,?,?,?,?,?,?,?,?)",
+                query_parameters_list = row_list,
+                commit = False
+            ),
+            sqlite.run_many(
+                file_name = "audio_queues",
+                query = "DELETE FROM queued_audio WHERE guild_id=? AND " \
+                    + "audio_queue_element_id=?",
+                query_parameters_list = [
+                    (self.guild_id, audio_queue_element_id) \
+                    for audio_queue_element_id in self.snapshot_removed_id_set
+                ],
+                commit = True
+            ),
+            sqlite.run(
+                file_name = "audio_queue_settings",
+                query = "INSERT OR REPLACE INTO audio_queue_settings " \
+                    + "VALUES (?,?,?,?,?)",
+                query_parameters = (
+                    self.guild_id,
+                    self.volume,
+                    self.max_queue_length,
+                    int(self.is_paused),
+                    self.next_audio_queue_element_id
+                ),
+                commit = True
+            )
+        ]
+        if False in [status.success for status in status_list]:
+            return False
+        self.snapshot_dirty_id_set.clear()
+        self.snapshot_removed_id_set.clear()
+        return True
+
+    def restore_snapshot(self) -> int:
+        """Restore the last snapshot saved for self.guild_id.
+
+        Add every AudioQueueElement saved for self.guild_id whose file is still
+        on disk back to this AudioQueueList, in the same order, with the same
+        ID and progress, and restore this AudioQueueList's settings. Files are
+        reused from the file cache as is, so nothing is downloaded or made
+        again. Should be called before any audio is added.
+
+        Args:
+            self: This AudioQueueList
+
+        Returns:
+            The number of AudioQueueElement restored.
+        """
+        # Restore settings
+        status = sqlite.run(
+            file_name = "audio_queue_settings",
+            query = "SELECT volume,max_queue_length,is_paused," \
+                + "next_audio_queue_element_id FROM audio_queue_settings " \
+                + "WHERE guild_id=?",
+            query_parameters = (self.guild_id,),
+            commit = False
+        )
+        if status.success is False or len(status.result) == 0:
+            return 0
+        self.volume, self.max_queue_length, is_paused, \
+            self.next_audio_queue_element_id = status.result[0]
+        self.is_paused = is_paused == 1
+
+        # Restore the audio in queue, in order
+        status = sqlite.run(
+            file_name = "audio_queues",
+            query = "SELECT audio_queue_element_id,author_user_id," \
+                + "description,source_command,file_path,priority,gain," \
+                + "time_played,queue_position,repeat_count FROM " \
+                + "queued_audio WHERE " \
+                + "guild_id=? ORDER BY priority,queue_position",
+            query_parameters = (self.guild_id,),
+            commit = False
+        )
+        if status.success is False:
+            return 0
+        for row in status.result:
+            audio_queue_element = AudioQueueElement(
+                audio_queue_element_id = row[0],
+                author_user_id = row[1],
+                description = row[2],
+                source_command = row[3],
+                file_path = row[4],
+                priority = row[5],
+                gain = row[6],
+                duration = file_cache.get_duration(row[4])
+            )
+            audio_queue_element.time_played = row[7]
+            audio_queue_element.queue_position = row[8]
+            audio_queue_element.repeat_count = max(1, row[9])
+
+            # Forget audio whose file has since been removed from the cache, or
+            # whose priority or ID is no longer valid
+            if not os.path.isfile(audio_queue_element.file_path) or \
+                audio_queue_element.priority < 0 or \
+                audio_queue_element.priority >= self.num_priority_levels or \
+                audio_queue_element.audio_queue_element_id in self.node_dict:
+                self.mark_snapshot_removed(row[0])
+                continue
+            self.node_dict[audio_queue_element.audio_queue_element_id] = \
+                self.queue_list[audio_queue_element.priority].append(
+                    audio_queue_element
+                )
+            self.policy_list[audio_queue_element.priority].add(
+                audio_queue_element
+            )
+            self.count_queued_seconds(audio_queue_element, True)
+            self.next_audio_queue_element_id = max(
+                self.next_audio_queue_element_id,
+                audio_queue_element.audio_queue_element_id + 1
+            )
+
+        # Play the restored audio, if not paused
+        self.wake()
+        return self.get_num_audio_files_queued()
+
+
+
+# Define a global dictionary of audio queues, one for each guild the bot is in
+# voice chat in, where each key is the ID of the guild, and each value is the
+# AudioQueueList for the guild's voice client. Each AudioQueueList has its own
+# queue, volume, and task playing audio, so guilds do not affect each other.
+global audio_queue_list_dict
+audio_queue_list_dict = {}
 
 
-# The after functions of play() not allowing parameters make me sad :(
-# This code is horrible... Hiding it at the bottom.
-# Anyways, get around not having params with globals.
-global g_audio_queue_element
-g_audio_list = None
-global g_operation
-g_operation = ""
-global g_params
-g_params = ()
 
-def init_play_after(
-    audio_queue_element: AudioQueueElement,
-    operation: str,
-    params: tuple
-) -> None:
-    """Set parameters for Discord.VoiceClient.play()'s after function.
+def add_audio_queue_list(
+    guild_id: int,
+    voice_client: discord.VoiceClient
+) -> AudioQueueList:
+    """Create an AudioQueueList for guild_id playing on voice_client.
 
-    Initialize some global variables that will be used by play_after(), a
-    function meant to be used as the after parameter of
-    Discord.VoiceClient.play(). play()'s after function does not allow for any
-    other parameter than error, so this is the only way I could think of to get
-    around that, and do something very specific after an audio source has
-    exhausted itself.
+    Create a new AudioQueueList for voice_client, restored from the last
+    snapshot saved for guild_id, if any, and add it to audio_queue_list_dict
+    under guild_id. If guild_id already had an AudioQueueList, for example,
+    because the bot was disconnected from voice chat without /voice leave,
+    close and replace it. Must be called from within the bot's event loop.
 
     Args:
-        audio_queue_element: The AudioQueueElement to do operation on
-        operation: A string describing the operation on audio_queue_list you
-            want to have happen after Discord.VoiceClient.play() finishes.
-        params: A tuple of parameters for the operation, for example, if the
-            operation is to set some value, what to set that value to.
+        guild_id: The ID of the guild voice_client is connected in
+        voice_client: The voice client the new AudioQueueList should play on
+
+    Returns:
+        The new AudioQueueList for guild_id.
     """
-    global g_audio_queue_element
-    global g_operation
-    global g_params
-    g_audio_queue_element = audio_queue_element
-    g_operation = operation
-    g_params = params
+    remove_audio_queue_list(guild_id)
+    audio_queue_list = AudioQueueList(voice_client, guild_id)
+    audio_queue_list.restore_snapshot()
+    audio_queue_list_dict[guild_id] = audio_queue_list
+    return audio_queue_list
+
 
-def play_after(error) -> None:
-    """A fine-grained after function for Discord.VoiceClient.play().
 
-    A function meant to be be used as the after parameter of
-    Discord.VoiceClient.play(). What it does is determined by the previous
-    init_play_after() call, to allow very fine-grain control of what happens
-    after an audio source is exhausted or stop()ed.
+def get_audio_queue_list(guild_id: int):
+    """Get the AudioQueueList for guild_id.
+
+    Get the AudioQueueList previously made for guild_id via
+    add_audio_queue_list(), if it has not been removed since.
 
     Args:
-        error: Any error that occurred during playing play()'s audio source.
+        guild_id: The ID of the guild to get the AudioQueueList of
+
+    Returns:
+        The AudioQueueList for guild_id, if none exists, None.
     """
-    if error is not None:
-        print(error)
-
-    global g_audio_queue_element
-    global g_operation
-    global g_params
-    if g_operation == "set_is_finished":
-        # If the audio source was stopped because it is being paused, the
-        # audio source is not finished
-        if g_audio_queue_element.is_paused:
-            g_audio_queue_element.is_finished = False
-        # Otherwise, set it to whatever the parameter is
-        else:
-            g_audio_queue_element.is_finished = g_params[0]
+    return audio_queue_list_dict.get(guild_id, None)
+
+
+
+def remove_audio_queue_list(guild_id: int) -> bool:
+    """Close and forget the AudioQueueList for guild_id.
+
+    Stop the AudioQueueList for guild_id from playing any more audio and
+    remove it from audio_queue_list_dict.
+
+    Args:
+        guild_id: The ID of the guild to remove the AudioQueueList of
+
+    Returns:
+        Whether guild_id had an AudioQueueList to remove.
+    """
+    audio_queue_list = audio_queue_list_dict.pop(guild_id, None)
+    if audio_queue_list is None:
+        return False
+    audio_queue_list.close()
+    return True
+
+
+
+def remove_all_audio_queue_lists() -> None:
+    """Close and forget the AudioQueueList for every guild.
+
+    Call remove_audio_queue_list() for every guild in audio_queue_list_dict.
+    """
+    # (Removing while iterating straight on a dict causes a RuntimeError.)
+    for guild_id in list(audio_queue_list_dict):
+        remove_audio_queue_list(guild_id)
@@ -0,0 +1,679 @@
+"""Policies for picking which queued audio of a priority plays next.
+
+This file defines scheduling policies the audio queue uses to pick the next
+audio to play among audio of the same priority. The simplest plays audio in the
+order it was queued, which lets one member queuing lots of audio make everyone
+else wait. The others share playing time between the members who queued audio,
+taking turns or by how long each member's audio has played, so a busy voice
+chat stays responsive for everyone. Each policy keeps its own per-member
+bookkeeping as audio is queued, played, and removed, so picking the next audio
+never has to look through the whole queue.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for keeping a list sorted as a heap
+import heapq
+
+# Import API for counting up forever
+import itertools
+
+#==============================================================================#
+# Define constants                                                             #
+#==============================================================================#
+
+# Define the names of each scheduling policy, to pick them by
+POLICY_FIFO = "fifo"
+POLICY_ROUND_ROBIN = "round_robin"
+POLICY_FAIR_SHARE = "fair_share"
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+class FifoPolicy():
+    """Define a scheduling policy that plays audio in the order it was queued.
+
+    Define the policy every other scheduling policy builds on, which picks the
+    first audio in the queue of its priority. Audio is put in queue order by
+    the audio queue, including moving bumped audio right after the current
+    audio, so this policy keeps no bookkeeping of its own.
+
+    Attributes:
+        queue: The LinkedQueue of AudioQueueElement of the priority this policy
+            picks audio for, in the order they were queued.
+        current_audio: The AudioQueueElement this policy last started playing,
+            until it's removed from queue, None if there is none.
+    """
+    def __init__(self, queue):
+        """Initialize this FifoPolicy.
+
+        Args:
+            self: This FifoPolicy
+            queue: What to initialize self.queue as
+        """
+        self.queue = queue
+        self.current_audio = None
+
+    def add(self, audio_queue_element) -> None:
+        """Keep track of audio_queue_element, which was just added to queue.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: The AudioQueueElement added to self.queue
+        """
+
+    def remove(self, audio_queue_element) -> None:
+        """Forget audio_queue_element, which was just removed from queue.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: The AudioQueueElement removed from self.queue
+        """
+        if self.current_audio == audio_queue_element:
+            self.current_audio = None
+
+    def bump(self, audio_queue_element) -> None:
+        """Play audio_queue_element next, which was moved to the front of queue.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: The AudioQueueElement moved to the front of
+                self.queue, right after self.current_audio, if there is one
+        """
+
+    def start(self, audio_queue_element) -> None:
+        """Keep track of audio_queue_element starting or resuming playing.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: The AudioQueueElement started playing
+        """
+        self.current_audio = audio_queue_element
+
+    def charge(self, audio_queue_element, seconds_played: float) -> None:
+        """Count seconds_played of audio_queue_element as played.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: The AudioQueueElement that stopped playing
+            seconds_played: How many seconds of it played, since it last started
+        """
+
+    def peek(self):
+        """Get the AudioQueueElement that should be playing.
+
+        Args:
+            self: This FifoPolicy
+
+        Returns:
+            The AudioQueueElement to play, None if self.queue is empty.
+        """
+        return self.queue.peek()
+
+    def peek_after(self, playing_audio_list: list):
+        """Get the AudioQueueElement expected to play after playing_audio_list.
+
+        Args:
+            self: This FifoPolicy
+            playing_audio_list: A list of the AudioQueueElement currently
+                playing
+
+        Returns:
+            The first AudioQueueElement in self.queue not in
+            playing_audio_list, None if there is none.
+        """
+        node = self.queue.head_node
+        while node is not None and node.value in playing_audio_list:
+            node = node.next_node
+        return None if node is None else node.value
+
+    def get_num_ahead(self, audio_queue_element) -> int:
+        """Get how much audio will play before audio_queue_element.
+
+        Args:
+            self: This FifoPolicy
+            audio_queue_element: An AudioQueueElement in self.queue
+
+        Returns:
+            The number of AudioQueueElement ahead of audio_queue_element in
+            self.queue.
+        """
+        index = 0
+        for queued_audio in self.queue:
+            if queued_audio == audio_queue_element:
+                break
+            index += 1
+        return index
+
+    def iterate_play_order(self):
+        """Iterate over the audio in queue in the order it's expected to play.
+
+        Args:
+            self: This FifoPolicy
+
+        Yields:
+            self.current_audio, if there is one, then each other
+            AudioQueueElement in self.queue, in queue order.
+        """
+        if self.current_audio is not None:
+            yield self.current_audio
+        for queued_audio in self.queue:
+            if queued_audio != self.current_audio:
+                yield queued_audio
+
+
+
+class RoundRobinPolicy(FifoPolicy):
+    """Define a scheduling policy that takes turns between members.
+
+    Define a policy that keeps a queue of audio for each member who queued
+    audio, and a ring of those members, and plays the first audio of the member
+    at the front of the ring, moving them to the back once it starts, so each
+    member gets one turn before anyone gets a second.
+
+    Attributes:
+        author_queue_dict: A dictionary, where each key is the ID of a member
+            with audio in queue, and each value is a LinkedQueue of their
+            AudioQueueElement, in queue order.
+        author_node_dict: A dictionary, where each key is the ID of an
+            AudioQueueElement, and each value is its node in its member's
+            queue in self.author_queue_dict.
+        author_ring: A LinkedQueue of the ID of each member with audio in
+            queue, the member whose turn is next first.
+        ring_node_dict: A dictionary, where each key is the ID of a member with
+            audio in queue, and each value is their node in self.author_ring.
+    """
+    def __init__(self, queue):
+        """Initialize this RoundRobinPolicy.
+
+        Args:
+            self: This RoundRobinPolicy
+            queue: What to initialize self.queue as
+        """
+        super().__init__(queue)
+        self.author_queue_dict = {}
+        self.author_node_dict = {}
+        self.author_ring = type(queue)()
+        self.ring_node_dict = {}
+
+    def add(self, audio_queue_element) -> None:
+        """Add audio_queue_element to the end of its member's queue.
+
+        If its member had no audio in queue, they join the back of the ring.
+
+        Args:
+            self: This RoundRobinPolicy
+            audio_queue_element: The AudioQueueElement added to self.queue
+        """
+        author_user_id = audio_queue_element.author_user_id
+        if author_user_id not in self.author_queue_dict:
+            self.author_queue_dict[author_user_id] = type(self.queue)()
+            self.ring_node_dict[author_user_id] = self.author_ring.append(
+                author_user_id
+            )
+            self.activate(author_user_id)
+        self.author_node_dict[audio_queue_element.audio_queue_element_id] = \
+            self.author_queue_dict[author_user_id].append(audio_queue_element)
+
+    def activate(self, author_user_id: int) -> None:
+        """Keep track of author_user_id queuing audio when they had none.
+
+        Args:
+            self: This RoundRobinPolicy
+            author_user_id: The ID of the member who joined the ring
+        """
+
+    def remove(self, audio_queue_element) -> None:
+        """Remove audio_queue_element from its member's queue.
+
+        If its member has no audio left in queue, they leave the ring.
+
+        Args:
+            self: This RoundRobinPolicy
+            audio_queue_element: The AudioQueueElement removed from self.queue
+        """
+        super().remove(audio_queue_element)
+        node = self.author_node_dict.pop(
+            audio_queue_element.audio_queue_element_id,
+            None
+        )
+        if node is None:
+            return
+        author_user_id = audio_queue_element.author_user_id
+        author_queue = node.queue
+        author_queue.remove_node(node)
+        if len(author_queue) == 0:
+            del self.author_queue_dict[author_user_id]
+            self.author_ring.remove_node(
+                self.ring_node_dict.pop(author_user_id)
+            )
+            self.deactivate(author_user_id)
+
+    def deactivate(self, author_user_id: int) -> None:
+        """Forget author_user_id, who has no audio left in queue.
+
+        Args:
+            self: This RoundRobinPolicy
+            author_user_id: The ID of the member who left the ring
+        """
+
+    def bump(self, audio_queue_element) -> None:
+        """Play audio_queue_element next, once any current audio finishes.
+
+        Move audio_queue_element to the front of its member's queue, after
+        self.current_audio, if it's theirs, and give its member the next turn,
+        leaving self.current_audio playing.
+
+        Args:
+            self: This RoundRobinPolicy
+            audio_queue_element: The AudioQueueElement moved to the front of
+                self.queue, right after self.current_audio, if there is one
+        """
+        node = self.author_node_dict.get(
+            audio_queue_element.audio_queue_element_id,
+            None
+        )
+        if node is None:
+            return
+        author_queue = node.queue
+        author_queue.remove_node(node)
+        previous_node = None if self.current_audio is None \
+            else self.author_node_dict.get(
+                self.current_audio.audio_queue_element_id,
+                None
+            )
+        if previous_node is not None and previous_node.queue != author_queue:
+            previous_node = None
+        author_queue.insert_node_after(node, previous_node)
+        self.prioritize(audio_queue_element.author_user_id)
+
+    def prioritize(self, author_user_id: int) -> None:
+        """Give author_user_id the next turn, moving them to the front of the
+        ring.
+
+        Args:
+            self: This RoundRobinPolicy
+            author_user_id: The ID of a member with audio in queue
+        """
+        ring_node = self.ring_node_dict[author_user_id]
+        self.author_ring.remove_node(ring_node)
+        self.author_ring.append_node_left(ring_node)
+
+    def start(self, audio_queue_element) -> None:
+        """Keep playing audio_queue_element until it's removed, and end the
+        turn of its member, moving them to the back of the ring, unless it's
+        only resuming.
+
+        Args:
+            self: This RoundRobinPolicy
+            audio_queue_element: The AudioQueueElement started playing
+        """
+        if self.current_audio == audio_queue_element:
+            return
+        super().start(audio_queue_element)
+        ring_node = self.ring_node_dict.get(
+            audio_queue_element.author_user_id,
+            None
+        )
+        if ring_node is not None:
+            self.author_ring.remove_node(ring_node)
+            self.author_ring.append_node(ring_node)
+
+    def get_author_order(self) -> list:
+        """Get the order members are expected to get their next turns in.
+
+        Args:
+            self: This RoundRobinPolicy
+
+        Returns:
+            A list of the ID of each member with audio in queue, the member
+            whose turn is next first.
+        """
+        return list(self.author_ring)
+
+    def peek(self):
+        """Get the AudioQueueElement that should be playing.
+
+        Get the audio last started, if it's still in queue, so audio is never
+        cut off by another member's turn, otherwise, get the first audio of the
+        member whose turn is next.
+
+        Args:
+            self: This RoundRobinPolicy
+
+        Returns:
+            The AudioQueueElement to play, None if self.queue is empty.
+        """
+        if self.current_audio is not None:
+            return self.current_audio
+        for author_user_id in self.iterate_author_order():
+            return self.author_queue_dict[author_user_id].peek()
+        return None
+
+    def iterate_author_order(self):
+        """Iterate over members in the order get_author_order() gives.
+
+        Args:
+            self: This RoundRobinPolicy
+
+        Yields:
+            The ID of each member with audio in queue, the member whose turn is
+            next first.
+        """
+        yield from self.author_ring
+
+    def peek_after(self, playing_audio_list: list):
+        """Get the AudioQueueElement expected to play after playing_audio_list.
+
+        Args:
+            self: This RoundRobinPolicy
+            playing_audio_list: A list of the AudioQueueElement currently
+                playing
+
+        Returns:
+            The first audio not in playing_audio_list of the first member in
+            turn order who has some, None if there is none.
+        """
+        if self.current_audio is not None and \
+            self.current_audio not in playing_audio_list:
+            return self.current_audio
+        for author_user_id in self.iterate_author_order():
+            for queued_audio in self.author_queue_dict[author_user_id]:
+                if queued_audio not in playing_audio_list:
+                    return queued_audio
+        return None
+
+    def get_num_ahead(self, audio_queue_element) -> int:
+        """Get how much audio will play before audio_queue_element.
+
+        Count the audio last started, then, for each other member, as many of
+        their audio as turns they get before audio_queue_element's member gets
+        to it, if nothing else is queued, removed, or bumped.
+
+        Args:
+            self: This RoundRobinPolicy
+            audio_queue_element: An AudioQueueElement in self.queue
+
+        Returns:
+            The number of AudioQueueElement expected to play before
+            audio_queue_element.
+        """
+        if audio_queue_element == self.current_audio:
+            return 0
+        num_ahead = 0 if self.current_audio is None else 1
+
+        # Count the member's own audio ahead of audio_queue_element, which is
+        # how many turns they need before it plays
+        node = self.author_node_dict.get(
+            audio_queue_element.audio_queue_element_id,
+            None
+        )
+        if node is None:
+            return -1
+        num_turns = 0
+        node = node.previous_node
+        while node is not None:
+            if node.value != self.current_audio:
+                num_turns += 1
+            node = node.previous_node
+
+        # Each member before them gets one more turn than each member after
+        is_before = True
+        for author_user_id in self.get_author_order():
+            num_queued = len(self.author_queue_dict[author_user_id])
+            if self.current_audio is not None and \
+                self.current_audio.author_user_id == author_user_id:
+                num_queued -= 1
+            if author_user_id == audio_queue_element.author_user_id:
+                num_ahead += num_turns
+                is_before = False
+            elif is_before:
+                num_ahead += min(num_queued, num_turns + 1)
+            else:
+                num_ahead += min(num_queued, num_turns)
+        return num_ahead
+
+    def iterate_play_order(self):
+        """Iterate over the audio in queue in the order it's expected to play.
+
+        Expect one turn per member per round, in get_author_order(), the same
+        order get_num_ahead() counts by.
+
+        Args:
+            self: This RoundRobinPolicy
+
+        Yields:
+            self.current_audio, if there is one, then the next audio of each
+            member in turn order, round after round, until every
+            AudioQueueElement in self.queue has been yielded.
+        """
+        if self.current_audio is not None:
+            yield self.current_audio
+        author_queue_iterator_list = [
+            iter(self.author_queue_dict[author_user_id]) \
+            for author_user_id in self.get_author_order()
+        ]
+        while len(author_queue_iterator_list) > 0:
+            next_author_queue_iterator_list = []
+            for author_queue_iterator in author_queue_iterator_list:
+                for queued_audio in author_queue_iterator:
+                    if queued_audio != self.current_audio:
+                        yield queued_audio
+                        next_author_queue_iterator_list.append(
+                            author_queue_iterator
+                        )
+                        break
+            author_queue_iterator_list = next_author_queue_iterator_list
+
+
+
+class FairSharePolicy(RoundRobinPolicy):
+    """Define a scheduling policy that shares playing time between members.
+
+    Define a weighted fair queueing policy, where each member with audio in
+    queue has a virtual time, raised by how many seconds of their audio played,
+    divided by their weight, and the member with the lowest virtual time plays
+    next, so members who queue long audio wait longer for their next turn than
+    members who queue short audio. A member who queues audio when they had none
+    starts at the lowest virtual time of the other members, so they can't save
+    up turns by being away. Members are kept in a heap by virtual time, so the
+    next member is found without looking at every member.
+
+    Attributes:
+        get_weight: A function that takes the ID of a member and returns their
+            weight, for example 2.0 = twice the playing time of weight 1.0.
+        virtual_time_dict: A dictionary, where each key is the ID of a member
+            with audio in queue, and each value is their virtual time.
+        sequence_dict: A dictionary, where each key is the ID of a member with
+            audio in queue, and each value is when they last joined, to break
+            ties in virtual time by, in the order members joined, or negative,
+            if they were last bumped, so they win ties.
+        heap: A heapq heap of tuples of the virtual time, sequence, and ID of
+            each member. Tuples whose virtual time is out of date are left in,
+            and skipped once they reach the top.
+        sequence_counter: An itertools.count() to number members joining, or
+            being bumped, by.
+        last_virtual_time: The virtual time of the member who last played,
+            for members joining to start at if no one else has audio in queue.
+    """
+    def __init__(self, queue, get_weight = None):
+        """Initialize this FairSharePolicy.
+
+        Args:
+            self: This FairSharePolicy
+            queue: What to initialize self.queue as
+            get_weight: What to initialize self.get_weight as, None to weigh
+                every member as 1.0
+        """
+        super().__init__(queue)
+        self.get_weight = get_weight if get_weight is not None \
+            else lambda author_user_id: 1.0
+        self.virtual_time_dict = {}
+        self.sequence_dict = {}
+        self.heap = []
+        self.sequence_counter = itertools.count()
+        self.last_virtual_time = 0.0
+
+    def activate(self, author_user_id: int) -> None:
+        """Start author_user_id at the lowest virtual time of anyone else.
+
+        Args:
+            self: This FairSharePolicy
+            author_user_id: The ID of the member who queued audio
+        """
+        top_author_user_id = self.get_top_author()
+        virtual_time = self.last_virtual_time if top_author_user_id is None \
+            else self.virtual_time_dict[top_author_user_id]
+        self.virtual_time_dict[author_user_id] = virtual_time
+        self.sequence_dict[author_user_id] = next(self.sequence_counter)
+        self.push(author_user_id)
+
+    def deactivate(self, author_user_id: int) -> None:
+        """Forget the virtual time of author_user_id.
+
+        Args:
+            self: This FairSharePolicy
+            author_user_id: The ID of the member with no audio left in queue
+        """
+        self.last_virtual_time = max(
+            self.last_virtual_time,
+            self.virtual_time_dict.pop(author_user_id)
+        )
+        del self.sequence_dict[author_user_id]
+
+    def prioritize(self, author_user_id: int) -> None:
+        """Give author_user_id the next turn, lowering their virtual time to
+        the lowest of anyone's, and winning any tie.
+
+        Args:
+            self: This FairSharePolicy
+            author_user_id: The ID of a member with audio in queue
+        """
+        top_author_user_id = self.get_top_author()
+        self.virtual_time_dict[author_user_id] = min(
+            self.virtual_time_dict[author_user_id],
+            self.virtual_time_dict[top_author_user_id]
+        )
+        self.sequence_dict[author_user_id] = -next(self.sequence_counter)
+        self.push(author_user_id)
+
+    def push(self, author_user_id: int) -> None:
+        """Push the current virtual time of author_user_id onto self.heap.
+
+        Args:
+            self: This FairSharePolicy
+            author_user_id: The ID of a member with audio in queue
+        """
+        heapq.heappush(self.heap, (
+            self.virtual_time_dict[author_user_id],
+            self.sequence_dict[author_user_id],
+            author_user_id
+        ))
+
+    def is_up_to_date(self, heap_entry: tuple) -> bool:
+        """Get whether heap_entry is the current virtual time of its member.
+
+        Args:
+            self: This FairSharePolicy
+            heap_entry: A tuple from self.heap
+
+        Returns:
+            Whether the member of heap_entry still has audio in queue, with the
+            same virtual time, since joining the same time.
+        """
+        virtual_time, sequence, author_user_id = heap_entry
+        return self.sequence_dict.get(author_user_id, None) == sequence and \
+            self.virtual_time_dict[author_user_id] == virtual_time
+
+    def get_top_author(self):
+        """Get the member with the lowest virtual time.
+
+        Pop out of date tuples off the top of self.heap until the top is up to
+        date.
+
+        Args:
+            self: This FairSharePolicy
+
+        Returns:
+            The ID of the member with the lowest virtual time, None if no member
+            has audio in queue.
+        """
+        while len(self.heap) > 0 and not self.is_up_to_date(self.heap[0]):
+            heapq.heappop(self.heap)
+        return None if len(self.heap) == 0 else self.heap[0][2]
+
+    def start(self, audio_queue_element) -> None:
+        """Keep playing audio_queue_element until it's removed.
+
+        Args:
+            self: This FairSharePolicy
+            audio_queue_element: The AudioQueueElement started playing
+        """
+        self.current_audio = audio_queue_element
+
+    def charge(self, audio_queue_element, seconds_played: float) -> None:
+        """Raise the virtual time of audio_queue_element's member.
+
+        Args:
+            self: This FairSharePolicy
+            audio_queue_element: The AudioQueueElement that stopped playing
+            seconds_played: How many seconds of it played, since it last started
+        """
+        author_user_id = audio_queue_element.author_user_id
+        if author_user_id not in self.virtual_time_dict:
+            return
+        self.virtual_time_dict[author_user_id] += seconds_played \
+            / max(self.get_weight(author_user_id), .01)
+        self.push(author_user_id)
+
+    def get_author_order(self) -> list:
+        """Get the order members are expected to get their next turns in.
+
+        Args:
+            self: This FairSharePolicy
+
+        Returns:
+            A list of the ID of each member with audio in queue, from lowest
+            virtual time to highest.
+        """
+        return sorted(
+            self.virtual_time_dict,
+            key = lambda author_user_id: (
+                self.virtual_time_dict[author_user_id],
+                self.sequence_dict[author_user_id]
+            )
+        )
+
+    def iterate_author_order(self):
+        """Iterate over members from lowest virtual time to highest.
+
+        Only sort every member if the member with the lowest virtual time has
+        no audio that fits, which is rare.
+
+        Args:
+            self: This FairSharePolicy
+
+        Yields:
+            The ID of each member with audio in queue, from lowest virtual time
+            to highest.
+        """
+        top_author_user_id = self.get_top_author()
+        if top_author_user_id is None:
+            return
+        yield top_author_user_id
+        for author_user_id in self.get_author_order():
+            if author_user_id != top_author_user_id:
+                yield author_user_id
+
+
+
+# Define the scheduling policies an audio queue can use, where each key is the
+# name of the policy, and each value is its class
+POLICY_DICT = {
+    POLICY_FIFO : FifoPolicy,
+    POLICY_ROUND_ROBIN : RoundRobinPolicy,
+    POLICY_FAIR_SHARE : FairSharePolicy,
+}
@@ -0,0 +1,540 @@
+"""Audio sources for shaping audio before it is played in voice chat.
+
+This file defines discord.AudioSource wrappers the audio queue chains together
+to change how audio is read, such as reading some of it ahead of time, so it is
+ready the moment it should be played, and a mixer that plays several of them at
+once in one voice connection.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for efficient double-ended queues
+import collections
+
+# Import API for sharing data between threads safely
+import threading
+
+# Import API for keeping track of time
+import time
+
+# Import Discord Python API
+import discord
+
+# Import API for fast operations on arrays of audio samples
+import numpy
+
+#==============================================================================#
+# Define constants                                                             #
+#==============================================================================#
+
+# Number of seconds of audio in one frame, for both PCM and Opus audio
+FRAME_LENGTH_SECONDS = .02
+
+# Number of 16-bit samples in one 20ms frame of 48kHz stereo PCM audio
+FRAME_NUM_SAMPLES = 960 * 2
+
+# A 20ms frame of silence, already Opus encoded, so it needs no encoding
+OPUS_SILENCE_FRAME = b"\xf8\xff\xfe"
+
+# Gain lower priority tracks are played at while a higher priority track plays
+DEFAULT_DUCKING_GAIN = .25
+
+# Number of frames of silence played when the mixer runs out of tracks, before
+# the mixer stops, so audio queued right after doesn't have to restart playing
+NUM_SILENT_FRAMES_BEFORE_STOP = 10
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+class PrebufferedAudio(discord.AudioSource):
+    """Define an audio source that can read its first frames ahead of time.
+
+    Define a wrapper around another audio source, such as a
+    discord.FFmpegPCMAudio, that can read its first few frames before it starts
+    playing. Making the wrapped audio source starts its FFmpeg process, and
+    prebuffering waits for that process to output audio, so neither delays the
+    audio the moment it's played.
+
+    Also count the frames actually read out for playing, so how far into its
+    audio it got can be known exactly, without measuring time.
+
+    Attributes:
+        original: The audio source being wrapped.
+        frame_list: A collections.deque of frames read from self.original ahead
+            of time, that have not been played yet.
+        num_frames_read: The number of frames read out by read(), not counting
+            frames read ahead of time that have not been read out yet.
+        time_first_read: When the first frame was read out by read(), measured
+            in seconds since the last epoch, None if none has been yet.
+        lock: A threading.Lock, so frames are not read ahead of time by one
+            thread while being played by another thread out of order.
+        on_cleanup: A function called with no arguments the first time this
+            PrebufferedAudio is cleaned up, None if there is none.
+    """
+    def __init__(self, original: discord.AudioSource, on_cleanup = None):
+        """Initialize this PrebufferedAudio.
+
+        Set the members of this PrebufferedAudio to their defaults or passed in
+        values.
+
+        Args:
+            self: This PrebufferedAudio
+            original: What to initialize self.original as
+            on_cleanup: What to initialize self.on_cleanup as
+        """
+        self.original = original
+        self.frame_list = collections.deque()
+        self.num_frames_read = 0
+        self.time_first_read = None
+        self.lock = threading.Lock()
+        self.on_cleanup = on_cleanup
+
+    def prebuffer(self, num_frames: int) -> None:
+        """Read up to num_frames frames from self.original ahead of time.
+
+        Read frames from self.original into self.frame_list until num_frames
+        have been read or self.original runs out of audio. Blocks until
+        self.original outputs audio, so call it from a thread other than the
+        bot's event loop.
+
+        Args:
+            self: This PrebufferedAudio
+            num_frames: The number of frames to read ahead of time.
+        """
+        for _ in range(num_frames):
+            with self.lock:
+                frame = self.original.read()
+                self.frame_list.append(frame)
+            if not frame:
+                return
+
+    def read(self) -> bytes:
+        """Read the next frame of audio.
+
+        Read the next frame read ahead of time, if there is one, otherwise, read
+        the next frame from self.original.
+
+        Args:
+            self: This PrebufferedAudio
+
+        Returns:
+            20ms of audio, b"" if there is no more.
+        """
+        with self.lock:
+            if len(self.frame_list) > 0:
+                frame = self.frame_list.popleft()
+            else:
+                frame = self.original.read()
+            if frame:
+                if self.num_frames_read == 0:
+                    self.time_first_read = time.time()
+                self.num_frames_read += 1
+            return frame
+
+    def get_seconds_read(self) -> float:
+        """Get the number of seconds of audio read out by read().
+
+        Args:
+            self: This PrebufferedAudio
+
+        Returns:
+            The number of seconds of audio read out by read().
+        """
+        return self.num_frames_read * FRAME_LENGTH_SECONDS
+
+    def is_opus(self) -> bool:
+        """Get whether this PrebufferedAudio reads Opus encoded audio.
+
+        Args:
+            self: This PrebufferedAudio
+
+        Returns:
+            Whether self.original reads Opus encoded audio.
+        """
+        return self.original.is_opus()
+
+    def cleanup(self) -> None:
+        """Clean up self.original, such as stopping its FFmpeg process.
+
+        Call self.on_cleanup, if this is the first time this PrebufferedAudio
+        is cleaned up.
+
+        Args:
+            self: This PrebufferedAudio
+        """
+        self.frame_list.clear()
+        self.original.cleanup()
+        with self.lock:
+            on_cleanup = self.on_cleanup
+            self.on_cleanup = None
+        if on_cleanup is not None:
+            on_cleanup()
+
+
+
+class VolumeAudio(discord.AudioSource):
+    """Define an audio source that changes the volume of PCM audio.
+
+    Define a wrapper around a PCM audio source, such as a
+    discord.FFmpegPCMAudio, that multiplies each of its 16-bit samples by a
+    gain with NumPy, saturating samples that would overflow instead of letting
+    them wrap around. Replaces discord.PCMVolumeTransformer, which relies on
+    audioop, removed in Python 3.13. At a gain of 1.0 frames are passed through
+    untouched.
+
+    Attributes:
+        original: The PCM audio source being wrapped.
+        gain: What to multiply each sample by, for example 2.0 = 200% volume.
+        sample_array: A numpy.ndarray reused to scale each frame's samples in,
+            so a new one doesn't have to be made for every frame.
+    """
+    def __init__(self, original: discord.AudioSource, gain: float = 1.0):
+        """Initialize this VolumeAudio.
+
+        Set the members of this VolumeAudio to their defaults or passed in
+        values.
+
+        Args:
+            self: This VolumeAudio
+            original: What to initialize self.original as
+            gain: What to initialize self.gain as
+
+        Raises:
+            discord.ClientException: original reads Opus encoded audio.
+        """
+        if original.is_opus():
+            raise discord.ClientException(
+                "AudioSource must not be Opus encoded."
+            )
+        self.original = original
+        self.gain = gain
+        self.sample_array = numpy.empty(FRAME_NUM_SAMPLES, dtype=numpy.float32)
+
+    def read(self) -> bytes:
+        """Read the next frame of audio, at a (self.gain * 100)% volume.
+
+        Args:
+            self: This VolumeAudio
+
+        Returns:
+            20ms of 16-bit 48kHz stereo PCM audio, b"" if there is no more.
+        """
+        frame = self.original.read()
+        if not frame or self.gain == 1.0:
+            return frame
+        samples = numpy.frombuffer(frame, dtype=numpy.int16)
+        scaled_samples = self.sample_array[:len(samples)]
+        numpy.multiply(samples, numpy.float32(self.gain), out=scaled_samples)
+        numpy.minimum(scaled_samples, 32767, out=scaled_samples)
+        numpy.maximum(scaled_samples, -32768, out=scaled_samples)
+        return scaled_samples.astype(numpy.int16).tobytes()
+
+    def cleanup(self) -> None:
+        """Clean up self.original, such as stopping its FFmpeg process.
+
+        Args:
+            self: This VolumeAudio
+        """
+        self.original.cleanup()
+
+
+
+class AudioMixerTrack():
+    """Define one audio source being played by an AudioMixer.
+
+    Attributes:
+        source: The discord.AudioSource being played.
+        priority: The priority of self.source. Tracks with a lower priority
+            than the highest priority track are ducked.
+        on_stop: A function called with None from the audio player's thread,
+            once self.source runs out of audio.
+        decoder: A discord.opus.Decoder, made the first time self.source has to
+            be mixed while it reads Opus encoded audio, otherwise None.
+    """
+    def __init__(self, source: discord.AudioSource, priority: int, on_stop):
+        """Initialize this AudioMixerTrack.
+
+        Set the members of this AudioMixerTrack to their defaults or passed in
+        values.
+
+        Args:
+            self: This AudioMixerTrack
+            source: What to initialize self.source as
+            priority: What to initialize self.priority as
+            on_stop: What to initialize self.on_stop as
+        """
+        self.source = source
+        self.priority = priority
+        self.on_stop = on_stop
+        self.decoder = None
+
+    def read_pcm(self) -> bytes:
+        """Read the next frame of self.source as PCM audio.
+
+        Read the next frame of self.source, decoding it if it's Opus encoded, so
+        it can be mixed with other tracks.
+
+        Args:
+            self: This AudioMixerTrack
+
+        Returns:
+            20ms of 16-bit 48kHz stereo PCM audio, b"" if there is no more.
+        """
+        frame = self.source.read()
+        if not frame or not self.source.is_opus():
+            return frame
+        if self.decoder is None:
+            self.decoder = discord.opus.Decoder()
+        return self.decoder.decode(frame, fec=False)
+
+
+
+class AudioMixer(discord.AudioSource):
+    """Define an audio source that plays several audio sources at once.
+
+    Define an audio source that one voice connection plays for its whole
+    session, and that audio is played through by adding it as a track. While
+    one track plays, its frames are passed through as they are, so Opus encoded
+    audio is still never re-encoded. While more than one track plays, their
+    frames are decoded if needed and added together with NumPy, with every
+    track of a lower priority than the highest priority track ducked, so
+    important audio can be played over music without stopping it.
+
+    discord.VoiceClient asks its audio source whether it's Opus encoded after
+    every frame it reads, so this AudioMixer can switch between passing Opus
+    encoded frames through and returning mixed PCM audio from frame to frame.
+
+    Attributes:
+        track_list: A list of the AudioMixerTracks being played.
+        ducking_gain: The gain lower priority tracks are played at.
+        lock: A threading.Lock, so self.track_list is not changed by one
+            thread while the audio player's thread takes a snapshot of it to
+            read. Tracks are read without holding it, since reading an audio
+            source may block.
+        reading_track_list: The snapshot of self.track_list being read by the
+            audio player's thread, empty if it's not reading.
+        removed_track_list: A list of the tracks removed while being read,
+            whose audio sources are cleaned up once they're done being read.
+        is_last_frame_opus: Whether the last frame read was Opus encoded.
+        num_silent_frames_left: The number of frames of silence left to play
+            before this AudioMixer stops, while it has no tracks.
+    """
+    def __init__(self, ducking_gain: float = DEFAULT_DUCKING_GAIN):
+        """Initialize this AudioMixer.
+
+        Set the members of this AudioMixer to their defaults or passed in
+        values. self.is_last_frame_opus starts as False, so
+        discord.VoiceClient.play() makes the Opus encoder mixed audio needs.
+
+        Args:
+            self: This AudioMixer
+            ducking_gain: What to initialize self.ducking_gain as
+        """
+        self.track_list = []
+        self.ducking_gain = ducking_gain
+        self.lock = threading.Lock()
+        self.reading_track_list = []
+        self.removed_track_list = []
+        self.is_last_frame_opus = False
+        self.num_silent_frames_left = NUM_SILENT_FRAMES_BEFORE_STOP
+
+    def add_track(
+        self,
+        source: discord.AudioSource,
+        priority: int,
+        on_stop
+    ) -> AudioMixerTrack:
+        """Start playing source alongside the other tracks.
+
+        Args:
+            self: This AudioMixer
+            source: The audio source to play
+            priority: The priority of source, see AudioMixerTrack
+            on_stop: A function called with None from the audio player's
+                thread, once source runs out of audio
+
+        Returns:
+            The AudioMixerTrack made for source, to remove it with later.
+        """
+        track = AudioMixerTrack(source, priority, on_stop)
+        with self.lock:
+            self.track_list.append(track)
+        return track
+
+    def remove_track(self, track: AudioMixerTrack) -> bool:
+        """Stop playing a track early, and clean up its audio source.
+
+        Doesn't call track.on_stop, since the caller already knows the track
+        stopped.
+
+        Args:
+            self: This AudioMixer
+            track: The track to stop playing
+
+        Returns:
+            Whether track was still playing.
+        """
+        with self.lock:
+            if track not in self.track_list:
+                return False
+            self.track_list.remove(track)
+            self.cleanup_track(track)
+        return True
+
+    def get_num_tracks(self) -> int:
+        """Get the number of tracks being played.
+
+        Args:
+            self: This AudioMixer
+
+        Returns:
+            The number of tracks being played.
+        """
+        return len(self.track_list)
+
+    def clear(self) -> None:
+        """Stop playing all tracks early, and clean up their audio sources.
+
+        Args:
+            self: This AudioMixer
+        """
+        with self.lock:
+            for track in self.track_list:
+                self.cleanup_track(track)
+            self.track_list.clear()
+
+    def cleanup_track(self, track: AudioMixerTrack) -> None:
+        """Clean up the audio source of a removed track, once it's not read.
+
+        Clean up track.source now, unless the audio player's thread is reading
+        it, in which case, leave it to be cleaned up once it's done. Must be
+        called with self.lock held.
+
+        Args:
+            self: This AudioMixer
+            track: The track removed from self.track_list
+        """
+        if track in self.reading_track_list:
+            self.removed_track_list.append(track)
+        else:
+            track.source.cleanup()
+
+    def finish_track(self, track: AudioMixerTrack) -> None:
+        """Stop playing a track that ran out of audio, and call its on_stop.
+
+        Must be called with self.lock held.
+
+        Args:
+            self: This AudioMixer
+            track: The track that ran out of audio
+        """
+        self.track_list.remove(track)
+        track.source.cleanup()
+        track.on_stop(None)
+
+    def read(self) -> bytes:
+        """Read the next frame of audio.
+
+        Read the next frame of the only track as is, or mix the next frames of
+        all tracks. Read silence for a short while once there are no tracks
+        left, then b"" to stop. Tracks are read from a snapshot of
+        self.track_list, without holding self.lock, and frames of tracks
+        removed meanwhile are dropped.
+
+        Args:
+            self: This AudioMixer
+
+        Returns:
+            20ms of audio, b"" if there is no more.
+        """
+        with self.lock:
+            # Play silence for a short while once there are no tracks left
+            if len(self.track_list) == 0:
+                if self.num_silent_frames_left <= 0:
+                    return b""
+                self.num_silent_frames_left -= 1
+                self.is_last_frame_opus = True
+                return OPUS_SILENCE_FRAME
+            self.num_silent_frames_left = NUM_SILENT_FRAMES_BEFORE_STOP
+            self.reading_track_list = list(self.track_list)
+        reading_track_list = self.reading_track_list
+
+        # Read the next frame of every track, without holding self.lock, as is
+        # if a track is playing by itself, so it can be passed through
+        try:
+            if len(reading_track_list) == 1:
+                track_frame_list = [
+                    (reading_track_list[0], reading_track_list[0].source.read())
+                ]
+            else:
+                track_frame_list = [
+                    (track, track.read_pcm()) for track in reading_track_list
+                ]
+
+        # Clean up the tracks removed while they were read
+        finally:
+            with self.lock:
+                self.reading_track_list = []
+                for track in self.removed_track_list:
+                    track.source.cleanup()
+                self.removed_track_list.clear()
+
+        # Finish tracks out of audio, and drop frames of tracks removed while
+        # they were read
+        with self.lock:
+            playing_track_frame_list = []
+            for track, frame in track_frame_list:
+                if track not in self.track_list:
+                    continue
+                if not frame:
+                    self.finish_track(track)
+                    continue
+                playing_track_frame_list.append((track, frame))
+        if len(playing_track_frame_list) == 0:
+            self.is_last_frame_opus = True
+            return OPUS_SILENCE_FRAME
+
+        # Pass the frame of a track playing by itself through as it is
+        if len(reading_track_list) == 1:
+            track, frame = playing_track_frame_list[0]
+            self.is_last_frame_opus = track.source.is_opus()
+            return frame
+
+        # Add the frames together, ducking lower priorities
+        top_priority = max(
+            track.priority for track, _ in playing_track_frame_list
+        )
+        mixed_frame = numpy.zeros(FRAME_NUM_SAMPLES, dtype=numpy.float32)
+        for track, frame in playing_track_frame_list:
+            samples = numpy.frombuffer(frame, dtype=numpy.int16)
+            samples = samples[:FRAME_NUM_SAMPLES]
+            gain = 1.0 if track.priority >= top_priority \
+                else self.ducking_gain
+            mixed_frame[:len(samples)] += samples * numpy.float32(gain)
+        numpy.clip(mixed_frame, -32768, 32767, out=mixed_frame)
+        self.is_last_frame_opus = False
+        return mixed_frame.astype(numpy.int16).tobytes()
+
+    def is_opus(self) -> bool:
+        """Get whether the last frame read was Opus encoded.
+
+        Args:
+            self: This AudioMixer
+
+        Returns:
+            Whether the last frame read was Opus encoded.
+        """
+        return self.is_last_frame_opus
+
+    def cleanup(self) -> None:
+        """Do nothing once the audio player stops playing this AudioMixer.
+
+        Keep any tracks left, since this AudioMixer is played again if there
+        are, and tracks are only cleaned up once they're finished or removed.
+
+        Args:
+            self: This AudioMixer
+        """
@@ -0,0 +1,192 @@
+"""Functions for limiting how many FFmpeg processes run at once.
+
+This file defines helpers for sharing the CPU between the two kinds of FFmpeg
+work the bot does: live playback, which decodes audio as it plays in voice chat
+and stutters if it falls behind, and batch work, such as normalizing,
+converting, or joining audio files, which only has to finish eventually. Each
+kind has its own limit on how many processes may run at once, and live playback
+always comes first: batch work waits while live playback uses the CPU, and runs
+at a lower OS priority.
+"""
+
+#==============================================================================#
+# Import libraries                                                             #
+#==============================================================================#
+
+# Import API for waiting on events without blocking the bot
+import asyncio
+
+# Import API for running functions in a pool of threads
+import concurrent.futures
+
+# Import API for sharing data between threads safely
+import threading
+
+# Import API for making functions with some arguments already filled in
+import functools
+
+# Import API for spawning subprocesses for running command-line prompts
+import subprocess
+
+# Import API for finding programs on the bot owner's computer
+import shutil
+
+# Import operating system API for things like counting CPUs
+import os
+
+#==============================================================================#
+# Define constants                                                             #
+#==============================================================================#
+
+# Number of CPUs FFmpeg processes can share
+NUM_CPUS = os.cpu_count() or 1
+
+# Most FFmpeg processes to run at once, live and batch together, before batch
+# work has to wait, other than the one batch job that may always run, so batch
+# work is never starved for good
+MAX_NUM_JOBS = NUM_CPUS
+
+# Most live playback FFmpeg processes to run at once, before audio that is only
+# being prepared ahead of time stops being prepared. Audio that has to play now
+# is always allowed to.
+MAX_NUM_LIVE_JOBS = 2 * NUM_CPUS
+
+# Most batch FFmpeg processes to run at once
+MAX_NUM_BATCH_JOBS = max(1, NUM_CPUS // 2)
+
+# Most threads to run batch work, and wait for its turn to, in. Batch work is
+# run in its own threads, so batch work waiting for its turn never takes up
+# threads live playback reads audio ahead of time in.
+MAX_NUM_BATCH_THREADS = 4 * MAX_NUM_BATCH_JOBS
+
+# How much to lower the OS priority of batch FFmpeg processes by, from 0 to 19
+BATCH_NICENESS = 10
+
+#==============================================================================#
+# Define underlying structure                                                  #
+#==============================================================================#
+
+# Define a global count of each kind of FFmpeg process running, and a
+# threading.Condition to change them under, and wait on them to change with,
+# since FFmpeg processes are started and stopped from many threads
+global job_condition
+job_condition = threading.Condition()
+global num_live_jobs
+num_live_jobs = 0
+global num_batch_jobs
+num_batch_jobs = 0
+
+# Define a global pool of threads to run batch work in
+global batch_executor
+batch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers = MAX_NUM_BATCH_THREADS,
+    thread_name_prefix = "ffmpeg_batch"
+)
+
+
+
+def start_live_job(is_required: bool) -> bool:
+    """Count a live playback FFmpeg process as started, if there's room.
+
+    Args:
+        is_required: Whether the audio has to play now, so the process is
+            started even if MAX_NUM_LIVE_JOBS are already running, instead of
+            only being prepared ahead of time
+
+    Returns:
+        Whether the process may be started. Call end_live_job() once it's
+        stopped, if so.
+    """
+    global num_live_jobs
+    with job_condition:
+        if is_required is False and num_live_jobs >= MAX_NUM_LIVE_JOBS:
+            return False
+        num_live_jobs += 1
+        return True
+
+
+
+def end_live_job() -> None:
+    """Count a live playback FFmpeg process as stopped."""
+    global num_live_jobs
+    with job_condition:
+        num_live_jobs = max(0, num_live_jobs - 1)
+        job_condition.notify_all()
+
+
+
+def start_batch_job() -> None:
+    """Wait until a batch FFmpeg process may start, and count it as started.
+
+    Wait until fewer than MAX_NUM_BATCH_JOBS batch processes, and fewer than
+    MAX_NUM_JOBS processes in total, are running, or no batch process is.
+    Blocks, so call it from a thread other than the bot's event loop. Call
+    end_batch_job() once the process is stopped.
+    """
+    global num_batch_jobs
+    with job_condition:
+        job_condition.wait_for(lambda: num_batch_jobs == 0 or (
+            num_batch_jobs < MAX_NUM_BATCH_JOBS and \
+            num_live_jobs + num_batch_jobs < MAX_NUM_JOBS
+        ))
+        num_batch_jobs += 1
+
+
+
+def end_batch_job() -> None:
+    """Count a batch FFmpeg process as stopped."""
+    global num_batch_jobs
+    with job_condition:
+        num_batch_jobs = max(0, num_batch_jobs - 1)
+        job_condition.notify_all()
+
+
+
+def run_batch_command(
+    command_list: list,
+    **kwargs
+) -> subprocess.CompletedProcess:
+    """Run a batch command, such as FFmpeg, once it's its turn.
+
+    Wait for a batch slot via start_batch_job(), then run command_list at a
+    lower OS priority, if the nice command exists, so it doesn't slow down live
+    playback. Blocks, so call it from a thread other than the bot's event loop.
+
+    Args:
+        command_list: The command to run, as a list of the command name and
+            each of its arguments, like subprocess.run() takes
+        kwargs: Any other keyword arguments to pass to subprocess.run(), such
+            as capture_output
+
+    Returns:
+        The subprocess.CompletedProcess of the command.
+    """
+    if shutil.which("nice") is not None:
+        command_list = ["nice", "-n", str(BATCH_NICENESS)] + command_list
+    start_batch_job()
+    try:
+        return subprocess.run(command_list, **kwargs)
+    finally:
+        end_batch_job()
+
+
+
+async def run_batch(function, *args, **kwargs):
+    """Run function, which does blocking batch work, outside the event loop.
+
+    Run function in batch_executor, so downloading, normalizing, or otherwise
+    processing files doesn't block the bot's event loop, which also keeps live
+    playback going.
+
+    Args:
+        function: The function to run
+        args: The positional arguments to call function with
+        kwargs: The keyword arguments to call function with
+
+    Returns:
+        What function returned.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        batch_executor,
+        functools.partial(function, *args, **kwargs)
+    )
@@ -9,9 +9,6 @@ overhead from uneccessary redownloads.
 # Import libraries                                                             #
 #==============================================================================#
 
-# Import API for spawning subprocesses for running command-line prompts
-import subprocess
-
 # Import operating system API for things like moving files
 import os
 
@@ -21,12 +18,447 @@ import hashlib
 # Import API for handling ascii strings as binary lists
 import binascii
 
+# Import API for reading FFmpeg's loudness measurements
+import json
+
+# Import API for doing basic math conversion
+import math
+
+# Import API for sharing data between threads safely
+import threading
+
+# Import API for making functions usable in with statements
+import contextlib
+
+# Import API for finding silence in decoded audio, all samples at once
+import numpy
+
+# Import helper for limiting how many FFmpeg processes run at once
+from discord_slash_commands.helpers import ffmpeg_pool
+
+# Import helper for interacting with internal database
+from discord_slash_commands.helpers import sqlite
+
 #==============================================================================#
 # Define underlying structure                                                  #
 #==============================================================================#
 
 CACHE_DIR = "cache"
 
+# Define the formats a FileCacheList can store audio in. Each key is the file
+# extension of the format, and each value is a tuple of the ffmpeg encoder,
+# bitrate, and sample rate to encode audio for the format with (None = let the
+# encoder decide). Opus at 48kHz is what Discord sends over voice chat, so
+# Ogg/Opus (.opus) files can be played without decoding and re-encoding them.
+AUDIO_FORMAT_MP3 = "mp3"
+AUDIO_FORMAT_OPUS = "opus"
+AUDIO_FORMAT_DICT = {
+    AUDIO_FORMAT_MP3 : ("libmp3lame", None, None),
+    AUDIO_FORMAT_OPUS : ("libopus", "96k", "48000"),
+}
+
+# Define the database and table of the cache index, which keeps what's been
+# measured about each audio file in a FileCacheList, such as its loudness and
+# duration, by file path, so nothing has to be measured twice
+INDEX_FILE_NAME = "file_cache_index"
+INDEX_TABLE_NAME = "cached_audio_files"
+
+# Define the loudness to normalize audio to, in LUFS, and the highest its true
+# peak may be raised to, in dBTP, the same defaults ffmpeg-normalize used
+TARGET_LOUDNESS = -23.0
+MAX_TRUE_PEAK = -2.0
+
+# Define how far from TARGET_LOUDNESS audio may be, in dB, to still be played
+# at its own volume. Opus audio played at its own volume can be passed straight
+# through to Discord, without decoding and re-encoding it, so audio cached as
+# Opus has its gain applied once, when it's converted, instead.
+LOUDNESS_TOLERANCE = 1.0
+
+# Define how silence is trimmed off the start and end of audio: audio is
+# decoded to mono PCM at SILENCE_SAMPLE_RATE, and split into windows of
+# SILENCE_WINDOW_SECONDS. Windows with an RMS level, in dBFS, under
+# SILENCE_THRESHOLD are silent. SILENCE_PADDING_SECONDS of silence is kept
+# around what's audible, so speech doesn't start or end abruptly, and audio is
+# only trimmed if it would save at least MIN_TRIMMED_SECONDS.
+SILENCE_SAMPLE_RATE = 16000
+SILENCE_WINDOW_SECONDS = .01
+SILENCE_THRESHOLD = -50.0
+SILENCE_PADDING_SECONDS = .1
+MIN_TRIMMED_SECONDS = .05
+
+# Keep how much silence has been trimmed off audio added to each FileCacheList,
+# where each key is a FileCacheList's directory, and each value is a list of
+# how many files were trimmed, and how many seconds were trimmed off them
+trimmed_silence_dict = {}
+
+
+
+def find_audible_range(samples: numpy.ndarray, sample_rate: int):
+    """Find where audio starts and stops being audible.
+
+    Split samples into windows of SILENCE_WINDOW_SECONDS, measure the RMS level
+    of every window at once, and find the first and last windows at or over
+    SILENCE_THRESHOLD, padded by SILENCE_PADDING_SECONDS.
+
+    Args:
+        samples: The mono, signed 16-bit PCM samples of the audio
+        sample_rate: The sample rate of samples, in Hz
+
+    Returns:
+        A tuple of when the audible audio starts and stops, in seconds, None if
+        the audio is silent throughout.
+    """
+    window_length = max(1, int(sample_rate * SILENCE_WINDOW_SECONDS))
+    num_windows = -(-len(samples) // window_length)
+    if num_windows == 0:
+        return None
+
+    # Pad the last window with silence, so every window is the same length
+    window_array = numpy.zeros(num_windows * window_length, numpy.float32)
+    window_array[0:len(samples)] = samples
+    window_array = window_array.reshape(num_windows, window_length)
+
+    # Compare each window's mean square to the threshold's, instead of
+    # comparing each window's RMS level in dBFS, to avoid a square root and
+    # logarithm per window
+    threshold = (32768 * 10 ** (SILENCE_THRESHOLD / 20)) ** 2
+    audible_index_array = numpy.flatnonzero(
+        numpy.mean(numpy.square(window_array), axis=1) >= threshold
+    )
+    if len(audible_index_array) == 0:
+        return None
+
+    duration = len(samples) / sample_rate
+    start_time = float(audible_index_array[0]) * window_length / sample_rate
+    end_time = float(audible_index_array[-1] + 1) * window_length \
+        / sample_rate
+    return (
+        max(0.0, start_time - SILENCE_PADDING_SECONDS),
+        min(duration, end_time + SILENCE_PADDING_SECONDS)
+    )
+
+
+
+def find_trim_range(file_path: str):
+    """Find what to keep of file_path, to trim the silence off its ends.
+
+    Decode file_path to PCM with FFmpeg and find_audible_range() of it. FFmpeg
+    is run as batch work, via ffmpeg_pool, so this blocks until it's its turn,
+    and should be called from a thread other than the bot's event loop.
+
+    Args:
+        file_path: The path to the audio file
+
+    Returns:
+        A tuple of when to start and stop file_path, and how many seconds
+        doing so trims off it, None if it's not worth trimming, or couldn't be
+        decoded.
+    """
+    try:
+        completed_process = ffmpeg_pool.run_batch_command(
+            [
+                # Command name, don't print progress, only errors
+                "ffmpeg",
+                "-hide_banner",
+                "-nostats",
+                "-loglevel",
+                "error",
+                # Input file
+                "-i",
+                file_path,
+                # Disable video, decode to mono 16-bit PCM
+                "-vn",
+                "-f",
+                "s16le",
+                "-ac",
+                "1",
+                "-ar",
+                str(SILENCE_SAMPLE_RATE),
+                # Output to stdout
+                "-",
+            ],
+            capture_output = True
+        )
+    except OSError as error:
+        print(error)
+        return None
+    if completed_process.returncode != 0:
+        print(completed_process.stderr.decode(errors="replace"))
+        return None
+
+    samples = numpy.frombuffer(
+        completed_process.stdout,
+        numpy.int16,
+        len(completed_process.stdout) // 2
+    )
+    audible_range = find_audible_range(samples, SILENCE_SAMPLE_RATE)
+    # Don't trim audio that's silent throughout, there'd be nothing left
+    if audible_range is None:
+        return None
+    start_time, end_time = audible_range
+    trimmed_seconds = len(samples) / SILENCE_SAMPLE_RATE \
+        - (end_time - start_time)
+    if trimmed_seconds < MIN_TRIMMED_SECONDS:
+        return None
+    return (start_time, end_time, trimmed_seconds)
+
+
+
+def parse_loudness(ffmpeg_output: str):
+    """Get the loudness FFmpeg's loudnorm filter measured from its output.
+
+    Args:
+        ffmpeg_output: What FFmpeg printed while running the loudnorm filter
+            with print_format=json
+
+    Returns:
+        A tuple of the integrated loudness, in LUFS, and true peak, in dBTP,
+        measured, None if ffmpeg_output has no measurements.
+    """
+    start_index = ffmpeg_output.rfind("{")
+    end_index = ffmpeg_output.rfind("}")
+    if start_index == -1 or end_index < start_index:
+        return None
+    try:
+        measurement_dict = json.loads(ffmpeg_output[start_index:end_index + 1])
+        return (
+            float(measurement_dict["input_i"]),
+            float(measurement_dict["input_tp"])
+        )
+    except (ValueError, KeyError):
+        return None
+
+
+
+def measure_loudness(file_path: str, trim_range = None):
+    """Measure the loudness of file_path with FFmpeg's loudnorm filter.
+
+    FFmpeg is run as batch work, via ffmpeg_pool, so this blocks until it's
+    its turn, and should be called from a thread other than the bot's event
+    loop.
+
+    Args:
+        file_path: The path to the audio file
+        trim_range: A tuple from find_trim_range() of the part of file_path to
+            measure, None to measure all of it
+
+    Returns:
+        A tuple of the integrated loudness, in LUFS, and true peak, in dBTP,
+        measured, None if file_path couldn't be measured.
+    """
+    command_list = [
+        # Command name, don't print progress, only loudnorm's measurements
+        # and errors
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+    ]
+    if trim_range is not None:
+        command_list += [
+            # Only read the part of the input file to keep
+            "-ss",
+            f"{trim_range[0]:.3f}",
+            "-to",
+            f"{trim_range[1]:.3f}",
+        ]
+    command_list += [
+        # Input file
+        "-i",
+        file_path,
+        # Disable video, only measure loudness, in JSON
+        "-vn",
+        "-af",
+        f"loudnorm=I={TARGET_LOUDNESS}:TP={MAX_TRUE_PEAK}:print_format=json",
+        # Output nothing
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        completed_process = ffmpeg_pool.run_batch_command(
+            command_list,
+            capture_output = True,
+            text = True
+        )
+    except OSError as error:
+        print(error)
+        return None
+    if completed_process.returncode != 0:
+        print(completed_process.stderr)
+        return None
+    return parse_loudness(completed_process.stderr)
+
+
+
+def probe_duration(file_path: str):
+    """Get the duration of file_path from FFprobe.
+
+    FFprobe is run as batch work, via ffmpeg_pool, so this blocks until it's
+    its turn, and should be called from a thread other than the bot's event
+    loop.
+
+    Args:
+        file_path: The path to the audio file
+
+    Returns:
+        The duration of file_path, in seconds, None if it couldn't be probed.
+    """
+    try:
+        completed_process = ffmpeg_pool.run_batch_command(
+            [
+                # Command name, only print errors
+                "ffprobe",
+                "-v",
+                "error",
+                # Only print the duration, without its name
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                # Input file
+                file_path,
+            ],
+            capture_output = True,
+            text = True
+        )
+    except OSError as error:
+        print(error)
+        return None
+    if completed_process.returncode != 0:
+        print(completed_process.stderr)
+        return None
+    try:
+        duration = float(completed_process.stdout.strip())
+    except ValueError:
+        return None
+    return duration if math.isfinite(duration) else None
+
+
+
+def save_to_index(file_path: str, loudness, duration) -> bool:
+    """Save what was measured about file_path in the cache index.
+
+    Args:
+        file_path: The path to the audio file
+        loudness: A tuple of the integrated loudness, in LUFS, and true peak,
+            in dBTP, of file_path, None if it wasn't measured
+        duration: The duration of file_path, in seconds, None if it wasn't
+            probed
+
+    Returns:
+        Whether anything was measured, and saved.
+    """
+    if loudness is None and duration is None:
+        return False
+    if loudness is None:
+        loudness = (None, None)
+    return sqlite.run(
+        file_name = INDEX_FILE_NAME,
+        query = f"INSERT OR REPLACE INTO {INDEX_TABLE_NAME} VALUES " \
+            + "(?, ?, ?, ?)",
+        query_parameters = (file_path,) + tuple(loudness) + (duration,),
+        commit = True
+    ).success
+
+
+
+def remove_from_index(file_path: str) -> bool:
+    """Forget everything the cache index keeps about file_path.
+
+    Args:
+        file_path: The path to the audio file, removed from its FileCacheList
+
+    Returns:
+        Whether the cache index could be changed.
+    """
+    return sqlite.run(
+        file_name = INDEX_FILE_NAME,
+        query = f"DELETE FROM {INDEX_TABLE_NAME} WHERE file_path = ?",
+        query_parameters = (file_path,),
+        commit = True
+    ).success
+
+
+
+def get_gain_in_db(loudness) -> float:
+    """Get the gain, in dB, to bring audio of loudness to TARGET_LOUDNESS.
+
+    Get the gain that brings loudness to TARGET_LOUDNESS, lowered if needed to
+    keep its true peak at or under MAX_TRUE_PEAK. Within LOUDNESS_TOLERANCE of
+    TARGET_LOUDNESS, audio is played at its own volume.
+
+    Args:
+        loudness: A tuple of the integrated loudness, in LUFS, and true peak,
+            in dBTP, of the audio, None if it wasn't measured
+
+    Returns:
+        The gain to raise the audio by, in dB, 0.0 if it's to be played at its
+        own volume.
+    """
+    if loudness is None:
+        return 0.0
+    integrated_loudness, true_peak = loudness
+
+    # Silence has no loudness to normalize
+    if integrated_loudness is None or not math.isfinite(integrated_loudness):
+        return 0.0
+    gain_in_db = TARGET_LOUDNESS - integrated_loudness
+    if true_peak is not None and math.isfinite(true_peak):
+        gain_in_db = min(gain_in_db, MAX_TRUE_PEAK - true_peak)
+    if abs(gain_in_db) <= LOUDNESS_TOLERANCE:
+        return 0.0
+    return gain_in_db
+
+
+
+def get_gain(file_path: str) -> float:
+    """Get the gain to play file_path at, to play it at TARGET_LOUDNESS.
+
+    Get the gain get_gain_in_db() gives the loudness measured for file_path,
+    which is 1.0 for audio whose gain was applied when it was converted.
+
+    Args:
+        file_path: The path to the audio file
+
+    Returns:
+        The gain to multiply the audio of file_path by, 1.0 if its loudness
+        was never measured.
+    """
+    loudness_list = sqlite.run(
+        file_name = INDEX_FILE_NAME,
+        query = "SELECT integrated_loudness, true_peak FROM " \
+            + f"{INDEX_TABLE_NAME} WHERE file_path = ?",
+        query_parameters = (file_path,),
+        commit = False
+    ).result
+    if len(loudness_list) == 0:
+        return 1.0
+    gain_in_db = get_gain_in_db(loudness_list[0])
+    if gain_in_db == 0.0:
+        return 1.0
+    return 10 ** (gain_in_db / 20)
+
+
+
+def get_duration(file_path: str):
+    """Get the duration probed for file_path when it was added to its cache.
+
+    Args:
+        file_path: The path to the audio file
+
+    Returns:
+        The duration of file_path, in seconds, None if it was never probed.
+    """
+    duration_list = sqlite.run(
+        file_name = INDEX_FILE_NAME,
+        query = f"SELECT duration FROM {INDEX_TABLE_NAME} WHERE file_path = ?",
+        query_parameters = (file_path,),
+        commit = False
+    ).result
+    if len(duration_list) == 0:
+        return None
+    return duration_list[0][0]
+
 
 
 class FileCacheElement():
@@ -79,11 +511,22 @@ class FileCacheList():
         directory: The directory to monitor the files of
         max_bytes: The max size, in bytes, to allow the directory specified
             by self.directory get to
+        audio_format: The file extension of the format, from
+            AUDIO_FORMAT_DICT, to store audio added to self.directory as. None
+            to store audio in whatever format it was added as.
+        lock: A threading.Lock, so files are not moved into or removed from
+            self.directory by more than one thread at once, and to change
+            self.file_lock_dict under.
+        file_lock_dict: A dictionary, where each key is the name of a file
+            being made by a thread in lock_file(), and each value is a list of
+            the threading.Lock to make it under, and how many threads are
+            making or waiting to make it.
     """
     def __init__(
         self,
         directory: str,
-        max_bytes: int
+        max_bytes: int,
+        audio_format: str = None
     ):
         """Initialize this FileCacheList.
 
@@ -93,11 +536,46 @@ class FileCacheList():
             self: This FileCacheList
             directory: What initialize self.directory as
             max_size_in_bytes: What initialize self.max_size_in_bytes as
+            audio_format: What to initialize self.audio_format as
         """
         self.directory = f"{CACHE_DIR}/{directory}"
         self.max_bytes = max_bytes
+        self.audio_format = audio_format
+        self.lock = threading.Lock()
+        self.file_lock_dict = {}
         # TODO: Create directories if they don't exist?
 
+    @contextlib.contextmanager
+    def lock_file(self, file_name: str):
+        """Make one thread at a time make the file named file_name.
+
+        Use in a with statement around checking whether a file exists and
+        making and add()ing it if it doesn't, so threads making the same file
+        at once don't overwrite each other's files in CACHE_DIR. Threads making
+        different files don't wait on each other.
+
+        Args:
+            self: This FileCacheList
+            file_name: The name of the file to make
+
+        Yields:
+            Nothing, once it's this thread's turn to make file_name.
+        """
+        with self.lock:
+            file_lock_entry = self.file_lock_dict.setdefault(
+                file_name,
+                [threading.Lock(), 0]
+            )
+            file_lock_entry[1] += 1
+        try:
+            with file_lock_entry[0]:
+                yield
+        finally:
+            with self.lock:
+                file_lock_entry[1] -= 1
+                if file_lock_entry[1] == 0:
+                    del self.file_lock_dict[file_name]
+
     def get_hashed_file_name(
         self,
         content_to_hash: tuple,
@@ -157,6 +635,26 @@ class FileCacheList():
         """
         return f"{self.directory}/{file_name}"
 
+    def get_cached_file_name(self, file_name: str) -> str:
+        """Get the name file_name will have once added to self.directory.
+
+        If self.audio_format is set, audio is converted to it when added, so
+        file_name's file extension is replaced with self.audio_format.
+
+        Args:
+            self: This FileCacheList
+            file_name: The name of the file, as downloaded to CACHE_DIR
+
+        Returns:
+            The name of the file once add(file_name) has been called on it.
+        """
+        if self.audio_format is None:
+            return file_name
+        index_of_last_period = file_name.rfind(".")
+        if index_of_last_period == -1:
+            return f"{file_name}.{self.audio_format}"
+        return f"{file_name[0:index_of_last_period]}.{self.audio_format}"
+
     def file_exists(self, file_name: str) -> bool:
         """Check whether file_name exists within self.directory.
 
@@ -172,29 +670,116 @@ class FileCacheList():
         """
         return os.path.isfile(self.get_file_path(file_name))
 
-    def add(self, file_name: str, normalize_audio : bool) -> bool:
+    def concatenate(
+        self,
+        file_name_list: list,
+        output_file_name: str
+    ) -> bool:
+        """Join files in self.directory end to end into a new file.
+
+        Use ffmpeg's concat demuxer to copy the audio of each file in
+        file_name_list, in order, into one file, output_file_name, then add()
+        it to self.directory, measuring its loudness. The audio is copied as
+        is, not re-encoded, so the files in file_name_list must all be in the
+        same format, for example, all added to this FileCacheList. FFmpeg is
+        run as batch work, via ffmpeg_pool, so this blocks until it's its turn,
+        and should be called from a thread other than the bot's event loop.
+
+        Args:
+            self: This FileCacheList
+            file_name_list: A list of the names of the files in self.directory
+                to join, in the order to join them
+            output_file_name: The name of the file to make
+
+        Returns:
+            Whether the operation was successful. It may not be, for example,
+            if a file in file_name_list does not exist.
+        """
+        list_file_path = f"{CACHE_DIR}/{output_file_name}.txt"
+        try:
+            # List the files to join for the concat demuxer, quoted, with any
+            # quotes in their paths escaped
+            with open(list_file_path, "w", encoding="utf-8") as list_file:
+                for file_name in file_name_list:
+                    file_path = os.path.abspath(self.get_file_path(file_name))
+                    file_path = file_path.replace("'", "'\\''")
+                    list_file.write(f"file '{file_path}'\n")
+
+            # Copy the audio of each file into one file, without re-encoding
+            completed_process = ffmpeg_pool.run_batch_command([
+                # Command name, don't ask before overwriting files
+                "ffmpeg",
+                "-y",
+                # Input files, listed in list_file_path, by absolute path
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_file_path,
+                # Copy audio as is
+                "-c",
+                "copy",
+                # Output file
+                f"{CACHE_DIR}/{output_file_name}",
+            ])
+            if completed_process.returncode != 0:
+                raise OSError()
+
+        except OSError as error:
+            print(error)
+            return False
+
+        finally:
+            # Remove the list of files to join, whether or not they were joined
+            if os.path.exists(list_file_path):
+                os.remove(list_file_path)
+
+        return self.add(file_name = output_file_name, normalize_audio = True)
+
+    def add(
+        self,
+        file_name: str,
+        normalize_audio : bool,
+        trim_silence: bool = False
+    ) -> bool:
         """Move a file downloaded to cache to self.directory.
 
         After you've downloaded a file in CACHE_DIR, use this function to try
         to add it to the directory at self.directory.
-        If normalize_audio is True, your file will be normalized, and the
-        original audio will be overwritten by normalized audio.
+        If normalize_audio is True, your file's loudness will be measured and
+        saved in the cache index, for get_gain() to normalize it by when it's
+        played, instead of re-encoding it at a normalized volume, unless
+        self.audio_format is AUDIO_FORMAT_OPUS, in which case its gain is
+        applied while converting it, so it can be passed through to Discord
+        without re-encoding it every time it's played. Its duration
+        is probed and saved in the cache index too, for get_duration().
+        If self.audio_format is set, your file will be converted to it, and
+        renamed to get_cached_file_name(file_name).
+        If trim_silence is True, silence is trimmed off the start and end of
+        your file, re-encoding it, and how many seconds were trimmed is added
+        to trimmed_silence_dict.
         If the file matching file_name is larger than self.max_bytes, don't
         allow the file in self.directory and delete it.
         Otherwise, remove every file in self.directory, starting from the least
         recently accessed, until adding the file matching file_name to
         self.directory would not make the directory exceed self.max_bytes, then,
         move the file to self.directory.
+        FFmpeg is run as batch work, via ffmpeg_pool, so this blocks until it's
+        its turn, and should be called from a thread other than the bot's event
+        loop.
 
         Args:
             self: This FileCacheList
             file_name: The name of the file you wish to move to the directory
                 specified by self.directory
-            normalize_audio: If file_name is an audio file, whether to use
-                ffmpeg-normalize to normalize its audio. For this purpose,
-                normalizing audio is making it a near-constant volume, so it
-                has a smoother listening experience and doesn't surprise anyone
-                with sudden loud bursts.
+            normalize_audio: If file_name is an audio file, whether to measure
+                its loudness, so it can be normalized when played. For this
+                purpose, normalizing audio is playing every file at the same
+                loudness, so it has a smoother listening experience and doesn't
+                surprise anyone with sudden loud bursts.
+            trim_silence: If file_name is an audio file, whether to trim the
+                silence off its start and end, so less dead air is played
 
         Returns:
             Whether the operation was successful. It may not be, for
@@ -203,85 +788,205 @@ class FileCacheList():
         """
         # Assumes file is already downloaded in CACHE_DIR, but no deeper
 
+        # Get the name the file will be stored as, and how to encode it (if
+        # self.audio_format isn't set, let FFmpeg pick the encoder for the
+        # file's own extension)
+        cached_file_name = self.get_cached_file_name(file_name)
+        encoder, bitrate, sample_rate = AUDIO_FORMAT_DICT.get(
+            self.audio_format,
+            (None, None, None)
+        )
+
+        # Find what to keep of the audio, if its silence is to be trimmed.
+        # Trimming it means re-encoding it, even if it's in the right format.
+        trim_range = None
+        if trim_silence is True:
+            trim_range = find_trim_range(f"{CACHE_DIR}/{file_name}")
+        is_converted = cached_file_name != file_name or trim_range is not None
+
+        # Opus audio is only passed through to Discord if it's played at its
+        # own volume, so measure the loudness of audio cached as Opus first,
+        # and apply its gain once, while converting it, instead of every time
+        # it's played. Applying it means re-encoding it, too.
+        loudness = None
+        gain_in_db = 0.0
+        is_measured_first = normalize_audio is True and \
+            self.audio_format == AUDIO_FORMAT_OPUS
+        if is_measured_first:
+            loudness = measure_loudness(f"{CACHE_DIR}/{file_name}", trim_range)
+            gain_in_db = get_gain_in_db(loudness)
+            if gain_in_db != 0.0:
+                is_converted = True
+                loudness = tuple(
+                    None if measurement is None else measurement + gain_in_db \
+                    for measurement in loudness
+                )
+
         # Execute all code calling the os library within the safety of a try
         # Assuming you gave a file_name that exists, and you created your
         # cache_directory correctly, these *should* never throw an error
         try:
-            # Normalize the audio via ffmpeg-normalize
-            # See: https://github.com/slhck/ffmpeg-normalize/wiki/examples
-            if normalize_audio is True:
-                # Create a new normalized version of the audio
-                completed_process = subprocess.run([
-                    # Command name
-                    "ffmpeg-normalize",
-                    # Input file
-                    f"{CACHE_DIR}/{file_name}",
-                    # Use mp3 encoder
-                    "-c:a",
-                    "libmp3lame",
+            # Convert the audio, if it's not in the right format or is to be
+            # trimmed, and measure its loudness, if it's to be normalized, all
+            # in one FFmpeg run, so the audio is only decoded once
+            completed_process = None
+            command_list = [
+                # Command name, don't ask before overwriting files, don't print
+                # progress, only loudnorm's measurements and errors
+                "ffmpeg",
+                "-y",
+                "-hide_banner",
+                "-nostats",
+            ]
+            if trim_range is not None:
+                command_list += [
+                    # Only read the audible part of the input file, so both
+                    # outputs are trimmed
+                    "-ss",
+                    f"{trim_range[0]:.3f}",
+                    "-to",
+                    f"{trim_range[1]:.3f}",
+                ]
+            command_list += [
+                # Input file
+                "-i",
+                f"{CACHE_DIR}/{file_name}",
+            ]
+            if is_converted:
+                command_list += [
+                    # Disable video, apply any gain, use encoder for
+                    # self.audio_format
+                    "-vn",
+                ] + (["-af", f"volume={gain_in_db}dB"] \
+                    if gain_in_db != 0.0 else []) \
+                + (["-c:a", encoder] if encoder is not None else []) \
+                + (["-b:a", bitrate] if bitrate is not None else []) \
+                + (["-ar", sample_rate] if sample_rate is not None else []) \
+                + [
                     # Output file
-                    "-o",
-                    f"{CACHE_DIR}/normalized_{file_name}",
-                ])
+                    f"{CACHE_DIR}/converted_{cached_file_name}",
+                ]
+            is_measured_now = normalize_audio is True and not is_measured_first
+            if is_measured_now:
+                command_list += [
+                    # Disable video, only measure loudness, in JSON
+                    "-vn",
+                    "-af",
+                    f"loudnorm=I={TARGET_LOUDNESS}:TP={MAX_TRUE_PEAK}" \
+                        + ":print_format=json",
+                    # Output nothing
+                    "-f",
+                    "null",
+                    "-",
+                ]
+            if is_converted or is_measured_now:
+                completed_process = ffmpeg_pool.run_batch_command(
+                    command_list,
+                    capture_output = True,
+                    text = True
+                )
                 if completed_process.returncode != 0:
+                    print(completed_process.stderr)
                     raise OSError()
 
-                # Overwrite the non-normalized version of the file
+            # Keep how much silence was trimmed
+            if trim_range is not None:
+                with self.lock:
+                    trimmed_silence = trimmed_silence_dict.setdefault(
+                        self.directory,
+                        [0, 0.0]
+                    )
+                    trimmed_silence[0] += 1
+                    trimmed_silence[1] += trim_range[2]
+
+            # Keep the measured loudness, if it could be measured
+            if is_measured_now:
+                loudness = parse_loudness(completed_process.stderr)
+
+            # Overwrite the unconverted version of the file
+            if is_converted:
                 os.remove(f"{CACHE_DIR}/{file_name}")
                 os.rename(
-                    src = f"{CACHE_DIR}/normalized_{file_name}",
-                    dst = f"{CACHE_DIR}/{file_name}",
+                    src = f"{CACHE_DIR}/converted_{cached_file_name}",
+                    dst = f"{CACHE_DIR}/{cached_file_name}",
                 )
 
             # Get information on the new file
-            new_file = FileCacheElement(CACHE_DIR, file_name)
+            new_file = FileCacheElement(CACHE_DIR, cached_file_name)
 
             # If this file is bigger than the directory is allowed to be,
             # it'll be impossible to add this file while staying within size
             # constraints, remove it entirely
             if new_file.size_in_bytes > self.max_bytes:
-                os.path.remove(new_file.file_path)
+                os.remove(new_file.file_path)
                 return False
 
-            # If adding this file would not put self.directory over
-            # self.max_bytes, can just move it into self.directory,
-            # no fuss
-            if os.path.getsize(self.directory) + new_file.size_in_bytes <= \
-                self.max_bytes:
-                os.rename(new_file.file_path, self.get_file_path(file_name))
-                return True
-
-            # This file is safe to add to self.directory and requires other
-            # files within self.directory to be deleted to have it fit
-            # within self.max_bytes...
-
-            # Get each file name, access time, etc. in self.directory
-            files_in_dir = []
-            for file_name_in_dir in os.listdir(self.directory):
-                files_in_dir.append(
-                    FileCacheElement(
-                        directory = self.directory,
-                        file_name = file_name_in_dir
+            # Probe the new file before waiting for self.lock, so other
+            # threads don't wait on FFprobe
+            duration = probe_duration(new_file.file_path)
+
+            # Only let one thread at a time move files into, or remove files
+            # from, self.directory, so they don't count on room another thread
+            # is taking
+            with self.lock:
+                # If adding this file would not put self.directory over
+                # self.max_bytes, can just move it into self.directory,
+                # no fuss
+                if os.path.getsize(self.directory) \
+                    + new_file.size_in_bytes <= self.max_bytes:
+                    os.rename(
+                        new_file.file_path,
+                        self.get_file_path(cached_file_name)
+                    )
+                    save_to_index(
+                        self.get_file_path(cached_file_name),
+                        loudness,
+                        duration
+                    )
+                    return True
+
+                # This file is safe to add to self.directory and requires other
+                # files within self.directory to be deleted to have it fit
+                # within self.max_bytes...
+
+                # Get each file name, access time, etc. in self.directory
+                files_in_dir = []
+                for file_name_in_dir in os.listdir(self.directory):
+                    files_in_dir.append(
+                        FileCacheElement(
+                            directory = self.directory,
+                            file_name = file_name_in_dir
+                        )
                     )
-                )
 
-            # Sort file_cache_element_sorted_list by access time,
-            # [0] == least recently accessed
-            files_in_dir = sorted(
-                files_in_dir,
-                key=lambda file_info: file_info.last_access_time
-            )
+                # Sort file_cache_element_sorted_list by access time,
+                # [0] == least recently accessed
+                files_in_dir = sorted(
+                    files_in_dir,
+                    key=lambda file_info: file_info.last_access_time
+                )
 
-            # Remove the least recently accessed file until we have enough
-            # space for the new file
-            while self.max_bytes > \
-                os.path.getsize(self.directory) + new_file.size_in_bytes:
-                os.path.remove(self.get_file_path(files_in_dir[0].file_name))
-                files_in_dir.pop(0)
+                # Remove the least recently accessed file until we have enough
+                # space for the new file
+                while self.max_bytes > \
+                    os.path.getsize(self.directory) + new_file.size_in_bytes:
+                    os.remove(self.get_file_path(files_in_dir[0].file_name))
+                    remove_from_index(
+                        self.get_file_path(files_in_dir[0].file_name)
+                    )
+                    files_in_dir.pop(0)
 
-            # Move the file from general cache into this cache, now that
-            # there's room
-            os.rename(new_file.file_path, self.get_file_path(file_name))
+                # Move the file from general cache into this cache, now that
+                # there's room
+                os.rename(
+                    new_file.file_path,
+                    self.get_file_path(cached_file_name)
+                )
+                save_to_index(
+                    self.get_file_path(cached_file_name),
+                    loudness,
+                    duration
+                )
 
         except OSError as error:
             print(error)
@@ -28,6 +28,16 @@ import sqlite3
 global connection_dict
 connection_dict = {}
 
+# Define the keywords a table constraint, rather than a column, starts with, in
+# a column_list given to add_connection()
+TABLE_CONSTRAINT_KEYWORD_TUPLE = (
+    "CONSTRAINT",
+    "PRIMARY",
+    "UNIQUE",
+    "CHECK",
+    "FOREIGN",
+)
+
 # TODO: Always check for bad return and throw values for functions.
 # TODO: Check for database files getting too big.
 
@@ -45,12 +55,16 @@ def add_connection(
     Create a sqlite3.Connection for the file at ./db/$table_name.db. Check the
     internals of that file to make sure each table_name in table_name_list
     exists in it. If it doesn't, create that table with the columns provided in
-    column_list. Add the new connection to connection_dict. You should call
-    this function in your top-level thread, then make new threads, so all
-    threads use the same, multi-thread safe connections saved in
-    connection_dict. If you need new connections after you've made multiple
-    sub-threads, please restart the bot and call this function for it in your
-    top level thread.
+    column_list. If it does, add any column in column_list it's missing, so
+    columns added to column_list after the table was made exist in it too.
+    Columns are only ever added to the end of a table, so add new ones to the
+    end of column_list, and give them a DEFAULT if they're NOT NULL, to fill
+    in the rows already in the table. Add the new connection to
+    connection_dict. You should call this function in your top-level thread,
+    then make new threads, so all threads use the same, multi-thread safe
+    connections saved in connection_dict. If you need new connections after
+    you've made multiple sub-threads, please restart the bot and call this
+    function for it in your top level thread.
 
     Args:
         file_name: The name of the database file to get a connection for
@@ -85,6 +99,21 @@ def add_connection(
                 f"CREATE TABLE {table_name}({','.join(column_list)})"
             )
 
+        # Otherwise, add any column the table was made without
+        else:
+            existing_column_name_set = {
+                column_info[1] for column_info in \
+                cursor.execute(f"PRAGMA table_info('{table_name}')")
+            }
+            for column in column_list:
+                column_name = column.split()[0]
+                if column_name.upper() in TABLE_CONSTRAINT_KEYWORD_TUPLE or \
+                    column_name in existing_column_name_set:
+                    continue
+                cursor.execute(
+                    f"ALTER TABLE {table_name} ADD COLUMN {column}"
+                )
+
         # Commit changes
         connection.commit()
 
@@ -157,3 +186,49 @@ def run(
 
     # Return results
     return Status(True, sqlite_response.fetchall())
+
+
+
+def run_many(
+    file_name: str,
+    query: str,
+    query_parameters_list: list,
+    commit: bool
+) -> Status:
+    """Run query once for each tuple in query_parameters_list.
+
+    Run the SQL command query once with each tuple of parameters in
+    query_parameters_list, all at once, on the prexisting connection for
+    ./db/file_name.db in connection_dict. Commit the changes if commit is True.
+    Much faster than calling run() for each tuple, when writing many rows.
+
+    Args:
+        file_name: The file name of the database you wish to access
+        query: The general SQL command you wish to execute
+        query_parameters_list: A list of tuples of the parameters that will be
+            used in query (if you put user-entered info straight into query,
+            you may be vulnerable to SQL injection attacks!)
+        commit: Whether to commit changes after executing query
+
+    Returns:
+        A Status, giving both whether the query ran smoothly and what the query
+        returned.
+    """
+    # Get pre-existing connection from connection_dict, if one doesn't exist,
+    # can't do the query and return failure
+    if file_name not in connection_dict:
+        return Status(False, [])
+    connection = connection_dict[file_name]
+
+    # Get cursor (iterator-like object) for the connection
+    cursor = connection.cursor()
+
+    # Run query for every tuple of parameters
+    sqlite_response = cursor.executemany(query, query_parameters_list)
+
+    # Commit if necessary
+    if commit is True:
+        connection.commit()
+
+    # Return results
+    return Status(True, sqlite_response.fetchall())
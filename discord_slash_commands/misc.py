@@ -18,6 +18,15 @@ import discord_slash_commands.helpers.application_context_checks as ctx_check
 # Import user permissions for each guild
 import discord_slash_commands.helpers.user_permission as user_perm
 
+# Import helper for queueing audio in voice chat
+from discord_slash_commands.helpers import audio_queue
+
+# Import helper for measuring how long audio takes to play
+from discord_slash_commands.helpers import audio_latency
+
+# Import helper for managing new files
+from discord_slash_commands.helpers import file_cache
+
 #==============================================================================#
 # Define underlying structure                                                  #
 #==============================================================================#
@@ -77,12 +86,61 @@ async def bot_kill(ctx):
     for cog_name in cog_names:
         ctx.bot.remove_cog(cog_name)
 
+    # Stop every guild's audio queue for the same reason
+    audio_queue.remove_all_audio_queue_lists()
+
     # Close the bot's connection to Discord
     await ctx.bot.close()
     return True
 
 
 
+@bot_slash_command_group.command(
+    name="latency",
+    description="Show how long audio has recently taken to play here.",
+    checks = [ctx_check.assert_author_is_bot_owner]
+)
+async def bot_latency(ctx):
+    """Tell bot to show how long each stage of playing audio takes.
+
+    Show the percentiles of how long each stage of getting queued audio to play
+    in voice chat has taken in this guild, over the most recent audio played,
+    from the command queueing it being called, to its first frame being sent,
+    to it finishing, and how long audio of each priority waited in queue.
+    Also show how much silence has been trimmed off cached audio, in every
+    guild, since the bot started.
+
+    Args:
+        ctx: The context this SlashCommand was called under
+    """
+    trimmed_content = ""
+    for directory, trimmed_silence in \
+        file_cache.trimmed_silence_dict.items():
+        num_files, trimmed_seconds = trimmed_silence
+        trimmed_content += f"\n`{directory}`: `{trimmed_seconds:.1f}`s " \
+            + f"of silence trimmed off `{num_files}` files"
+    if trimmed_content != "":
+        trimmed_content = "\n\nSilence trimmed off cached audio since I " \
+            + "started:" + trimmed_content
+
+    content = audio_latency.to_str(ctx.guild.id)
+    if content == "":
+        await ctx.respond(
+            ephemeral = True,
+            content = "No audio has finished playing in this guild yet." \
+                + trimmed_content
+        )
+        return False
+    await ctx.respond(
+        ephemeral = True,
+        content = "How long audio has recently taken to play here, over the " \
+            + f"last `{audio_latency.LATENCY_WINDOW_SIZE}` audio files at " \
+            + "most:" + content + trimmed_content
+    )
+    return True
+
+
+
 @bot_slash_command_group.command(
     name="help",
     description="Give you more details about me."
@@ -10,6 +10,9 @@ what language you want your text spoken as.
 # Import libraries                                                             #
 #==============================================================================#
 
+# Import API for keeping track of time
+import time
+
 # Import API for using Google to turn text into speech
 import gtts
 
@@ -28,6 +31,9 @@ from discord_slash_commands.helpers import sqlite
 # Import helper for managing new files
 from discord_slash_commands.helpers import file_cache
 
+# Import helper for limiting how many FFmpeg processes run at once
+from discord_slash_commands.helpers import ffmpeg_pool
+
 # Import user permissions for each guild
 import discord_slash_commands.helpers.user_permission as user_perm
 
@@ -38,6 +44,14 @@ import discord_slash_commands.helpers.user_permission as user_perm
 # Define some constants for readability and to avoid copy/paste
 MAX_SPOKEN_NAME_LEN = 20
 
+# Define whether to join the audio of a member's spoken name and their text into
+# one file, queued as one piece of audio, instead of queueing each on their own
+TTS_COMBINE_NAME_AND_TEXT = True
+
+# Define about how many seconds gTTS takes to say each character of text, to
+# estimate how long TTS audio will be before making it
+TTS_SECONDS_PER_CHARACTER = .07
+
 
 
 class TTSUserPreference():
@@ -222,7 +236,8 @@ class TTSUserPreference():
 # Create class instances
 tts_file_cache = file_cache.FileCacheList(
     directory = "tts",
-    max_bytes = 20*1000000
+    max_bytes = 20*1000000,
+    audio_format = file_cache.AUDIO_FORMAT_OPUS
 )
 
 
@@ -255,33 +270,104 @@ def make_tts_audio_file(
     """Download audio for the text_to_say in language_to_speak from gtts.
 
     Download TTS audio for text_to_say and language_to_speak if it doesn't
-    already exist, then return the path to the file containing the audio.
+    already exist, then return the path to the file containing the audio. Run
+    in batch threads, so only one thread at a time makes the same file.
 
     Args:
         text_to_say: The text to say in TTS
         language_to_speak: The language to speak text_to_say in
 
     Returns:
-        A string containing the path to the file containing to TTS audio.
+        A string containing the path to the file containing to TTS audio, None
+        if it could not be added to tts_file_cache.
     """
     # Generate file name for text_to_say and language_to_speak
+    # (gtts always makes mp3, the cache may store it as another format)
     file_name = tts_file_cache.get_hashed_file_name(
         content_to_hash = (text_to_say, language_to_speak),
         file_extension = "mp3"
     )
+    cached_file_name = tts_file_cache.get_cached_file_name(file_name)
+
+    # If the file is not already downloaded, download it, unless another
+    # thread just did
+    with tts_file_cache.lock_file(cached_file_name):
+        if not tts_file_cache.file_exists(cached_file_name):
+            speech_from_text = gtts.tts.gTTS(
+                text=text_to_say,
+                lang=language_to_speak
+            )
+            speech_from_text.save(f"{file_cache.CACHE_DIR}/{file_name}")
+            if not tts_file_cache.add(
+                file_name = file_name,
+                normalize_audio = True,
+                trim_silence = True
+            ):
+                return None
+
+    # Return file path with generated audio
+    return tts_file_cache.get_file_path(cached_file_name)
+
+
+
+def make_tts_message_audio_file(
+    spoken_name : str,
+    text_to_say : str,
+    language_to_speak : str
+):
+    """Make audio of spoken_name followed by text_to_say in language_to_speak.
+
+    Make TTS audio for spoken_name and text_to_say via make_tts_audio_file(),
+    then join them into one file, without re-encoding them, if it doesn't
+    already exist, then return the path to the file containing the audio. Run
+    in batch threads, so only one thread at a time makes the same file.
 
-    # If the file is not already downloaded, download it
-    if not tts_file_cache.file_exists(file_name):
-        speech_from_text = gtts.tts.gTTS(
-            text=text_to_say,
-            lang=language_to_speak
+    Args:
+        spoken_name: The name of the member text_to_say is said on behalf of
+        text_to_say: The text to say in TTS
+        language_to_speak: The language to speak spoken_name and text_to_say in
+
+    Returns:
+        A string containing the path to the file containing the TTS audio, None
+        if the audio of either part could not be made, or joined into one file.
+    """
+    # Generate file name for spoken_name, text_to_say and language_to_speak
+    cached_file_name = tts_file_cache.get_cached_file_name(
+        tts_file_cache.get_hashed_file_name(
+            content_to_hash = (
+                "message",
+                spoken_name,
+                text_to_say,
+                language_to_speak
+            ),
+            file_extension = "mp3"
         )
-        speech_from_text.save(f"{file_cache.CACHE_DIR}/{file_name}")
-        # TODO: error should never happen, but add check anyways
-        tts_file_cache.add(file_name = file_name, normalize_audio = True)
+    )
+
+    # If the file is not already made, make it from the audio of each part,
+    # unless another thread just did
+    with tts_file_cache.lock_file(cached_file_name):
+        if not tts_file_cache.file_exists(cached_file_name):
+            file_path_list = [
+                make_tts_audio_file(
+                    text_to_say = spoken_name,
+                    language_to_speak = language_to_speak
+                ),
+                make_tts_audio_file(
+                    text_to_say = text_to_say,
+                    language_to_speak = language_to_speak
+                )
+            ]
+            if None in file_path_list or not tts_file_cache.concatenate(
+                file_name_list = [
+                    file_path.split("/")[-1] for file_path in file_path_list
+                ],
+                output_file_name = cached_file_name
+            ):
+                return None
 
     # Return file path with generated audio
-    return tts_file_cache.get_file_path(file_name)
+    return tts_file_cache.get_file_path(cached_file_name)
 
 
 
@@ -308,12 +394,16 @@ async def tts_play(
     """Tell bot to say text_to_say in voice chat.
 
     Make bot generate audio for text_to_say, then play it in its current
-    voice chat, prefaced by the author of this command.
+    voice chat, prefaced by the author of this command, unless their last TTS
+    message was just before it.
 
     Args:
         ctx: The context this SlashCommand was called under
         text_to_say: The text to say in voice chat
     """
+    # Remember when this command was called, to measure how long playing takes
+    time_enqueued = time.time()
+
     # Determine if the author's arguments are valid
     err_msg = ""
     if len(text_to_say) < 0:
@@ -352,32 +442,181 @@ async def tts_play(
     # If we got here, the arguments and bot state should be valid and safe to
     # act upon.
 
-    # Get/create audio file for name
-    name_audio_file_path = make_tts_audio_file(
-        text_to_say=tts_user_preference.spoken_name,
+    # Pull audio queue
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
+
+    # Don't announce the author's name if their last message was just before
+    # this one, everyone still knows who's speaking
+    spoken_name = tts_user_preference.spoken_name
+    if audio_queue_list.is_last_speaker(
+        author_user_id = ctx.author.id,
+        priority = audio_queue.HIGH_PRIORITY
+    ):
+        spoken_name = ""
+
+    # Don't make audio there isn't room in queue for, estimating how long it
+    # will be from its text, and tell author how long they'd have to wait
+    if not audio_queue_list.can_admit(
+        author_user_id = ctx.author.id,
+        priority = audio_queue.HIGH_PRIORITY,
+        seconds = TTS_SECONDS_PER_CHARACTER \
+            * (len(spoken_name) + len(text_to_say))
+    ):
+        seconds_until_played = \
+            audio_queue_list.get_seconds_until_new_audio_plays(
+                audio_queue.HIGH_PRIORITY
+            )
+        await ctx.respond(
+            ephemeral = True,
+            content = "My audio queue already has as much high-priority " \
+                + f"(priority level `{audio_queue.HIGH_PRIORITY}`) audio as " \
+                + "it can hold, from everyone or from you." \
+                + "\nAudio queued now would wait about " \
+                + "`" + audio_queue.seconds_to_timestamp(
+                    round(seconds_until_played)
+                ) + "` to play, please try again later."
+        )
+        return False
+
+    # Get/create one audio file for both name and text, or just text if the
+    # name isn't announced, and queue it
+    if TTS_COMBINE_NAME_AND_TEXT is True or spoken_name == "":
+        # Make audio outside the event loop, so audio keeps playing meanwhile
+        message_audio_file_path = None
+        if spoken_name == "":
+            message_audio_file_path = await ffmpeg_pool.run_batch(
+                make_tts_audio_file,
+                text_to_say=text_to_say,
+                language_to_speak=tts_user_preference.language
+            )
+
+            # Someone else's audio may have been queued, or the author's last
+            # message removed or played too long ago, while the audio was
+            # made, so make sure the name can still be skipped right before
+            # queuing it, and make the audio with the name if it can't
+            if not audio_queue_list.is_last_speaker(
+                author_user_id = ctx.author.id,
+                priority = audio_queue.HIGH_PRIORITY
+            ):
+                spoken_name = tts_user_preference.spoken_name
+        if spoken_name != "":
+            message_audio_file_path = await ffmpeg_pool.run_batch(
+                make_tts_message_audio_file,
+                spoken_name=spoken_name,
+                text_to_say=text_to_say,
+                language_to_speak=tts_user_preference.language
+            )
+        # If the bot left or rejoined voice chat while the audio was made, its
+        # audio queue was closed, don't queue anything in it
+        if audio_queue.get_audio_queue_list(ctx.guild.id) is not \
+            audio_queue_list:
+            await ctx.respond(
+                ephemeral = True,
+                content = "I left voice chat while making your audio, so I " \
+                    + "didn't queue it."
+            )
+            return False
+
+        message_audio_queue_element_id = -1
+        if message_audio_file_path is not None:
+            message_audio_queue_element_id = audio_queue_list.add(
+                ctx = ctx,
+                description = f"{spoken_name}: {text_to_say}" \
+                    if spoken_name != "" else text_to_say,
+                file_path = message_audio_file_path,
+                gain = file_cache.get_gain(message_audio_file_path),
+                priority = audio_queue.HIGH_PRIORITY,
+                time_enqueued = time_enqueued,
+                is_coalescable = True
+            )
+
+        # If the name and text could be added to audio queue successfully,
+        # everything went well, exit early
+        if message_audio_queue_element_id > -1:
+            audio_queue_list.set_last_speaker(
+                author_user_id = ctx.author.id,
+                audio_queue_element_id = message_audio_queue_element_id
+            )
+            num_files_ahead = audio_queue_list.get_index_in_queue(
+                audio_queue_element_id = message_audio_queue_element_id
+            )
+            seconds_until_played = audio_queue_list.get_seconds_until_played(
+                audio_queue_element_id = message_audio_queue_element_id
+            )
+            await ctx.respond(
+                ephemeral = True,
+                content = (
+                    f"Queued `{spoken_name}` and " if spoken_name != "" \
+                    else "Queued "
+                ) + f"`{text_to_say}` as ID " \
+                    + f"`{message_audio_queue_element_id}`." \
+                    + f"\nThere are `{num_files_ahead}` other high-priority "
+                    + f"(priority level `{audio_queue.HIGH_PRIORITY}`) audio " \
+                    + "files ahead of you, it should play in about " \
+                    + "`" + audio_queue.seconds_to_timestamp(
+                        round(seconds_until_played)
+                    ) + "`."
+            )
+            return True
+
+        # Something went wrong in making or queuing the audio, tell author
+        await ctx.respond(
+            ephemeral = True,
+            content = "An internal error occured queuing your name and " \
+                + "text_to_say."
+        )
+        return True
+
+    # Otherwise, get/create audio file for name
+    name_audio_file_path = await ffmpeg_pool.run_batch(
+        make_tts_audio_file,
+        text_to_say=spoken_name,
         language_to_speak=tts_user_preference.language
     )
     # Get/create audio file for text
-    text_audio_file_path = make_tts_audio_file(
+    text_audio_file_path = await ffmpeg_pool.run_batch(
+        make_tts_audio_file,
         text_to_say=text_to_say,
         language_to_speak=tts_user_preference.language
     )
 
-    # Pull audio queue
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    # If either audio file couldn't be made, tell author, there's nothing to
+    # queue
+    if name_audio_file_path is None or text_audio_file_path is None:
+        await ctx.respond(
+            ephemeral = True,
+            content = "An internal error occured making audio of your name " \
+                + "and text_to_say."
+        )
+        return True
+
+    # If the bot left or rejoined voice chat while the audio was made, its
+    # audio queue was closed, don't queue anything in it
+    if audio_queue.get_audio_queue_list(ctx.guild.id) is not audio_queue_list:
+        await ctx.respond(
+            ephemeral = True,
+            content = "I left voice chat while making your audio, so I " \
+                + "didn't queue it."
+        )
+        return False
+
     # Queue name
     name_audio_queue_element_id = audio_queue_list.add(
         ctx = ctx,
-        description = tts_user_preference.spoken_name,
+        description = spoken_name,
         file_path = name_audio_file_path,
-        priority = audio_queue.HIGH_PRIORITY
+        gain = file_cache.get_gain(name_audio_file_path),
+        priority = audio_queue.HIGH_PRIORITY,
+        time_enqueued = time_enqueued
     )
     # Queue text
     text_audio_queue_element_id = audio_queue_list.add(
         ctx = ctx,
         description = text_to_say,
         file_path = text_audio_file_path,
-        priority = audio_queue.HIGH_PRIORITY
+        gain = file_cache.get_gain(text_audio_file_path),
+        priority = audio_queue.HIGH_PRIORITY,
+        time_enqueued = time_enqueued
     )
 
     # If both name and text could be added to audio queue successfully,
@@ -385,18 +624,27 @@ async def tts_play(
     if name_audio_queue_element_id > -1 and \
         text_audio_queue_element_id > -1 and \
         text_audio_queue_element_id == name_audio_queue_element_id + 1:
+        audio_queue_list.set_last_speaker(
+            author_user_id = ctx.author.id,
+            audio_queue_element_id = text_audio_queue_element_id
+        )
         num_files_ahead = audio_queue_list.get_index_in_queue(
-            audio_queue_element_id = name_audio_queue_element_id,
-            priority = audio_queue.HIGH_PRIORITY
+            audio_queue_element_id = name_audio_queue_element_id
+        )
+        seconds_until_played = audio_queue_list.get_seconds_until_played(
+            audio_queue_element_id = name_audio_queue_element_id
         )
         await ctx.respond(
             ephemeral = True,
-            content = f"Queued `{tts_user_preference.spoken_name}` as ID " \
+            content = f"Queued `{spoken_name}` as ID " \
                 + f"`{name_audio_queue_element_id}`, and `{text_to_say}` as " \
                 + f"ID `{text_audio_queue_element_id}`." \
                 + f"\nThere are `{num_files_ahead}` other high-priority "
                 + f"(priority level `{audio_queue.HIGH_PRIORITY}`) audio " \
-                + "files ahead of you."
+                + "files ahead of you, it should play in about " \
+                + "`" + audio_queue.seconds_to_timestamp(
+                    round(seconds_until_played)
+                ) + "`."
         )
         return True
     # If the name queued sucessfully, remove it, name and text must queue after
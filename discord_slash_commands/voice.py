@@ -10,6 +10,9 @@ otherwise interface with audio in voice chat.
 # Import public libraries                                                      #
 #==============================================================================#
 
+# Import operating system module
+import os
+
 # Import Discord Python API
 import discord
 
@@ -22,12 +25,18 @@ import discord_slash_commands.helpers.application_context_checks as ctx_check
 # Import helper for queueing audio in voice chat
 from discord_slash_commands.helpers import audio_queue
 
+# Import helper for remembering what audio has played
+from discord_slash_commands.helpers import audio_history
+
 #==============================================================================#
 # Define underlying structure                                                  #
 #==============================================================================#
 
-# NOTE: This bot currently only supports being in one voice chat at a time,
-# and all coding of this bot assumes this.
+# NOTE: This bot can be in one voice chat per guild at a time. Each guild's
+# voice chat gets its own audio queue, see audio_queue.get_audio_queue_list().
+
+# Define how many recently played audio files to list per page of history
+HISTORY_PAGE_LENGTH = 10
 
 
 
@@ -71,12 +80,23 @@ async def voice_join(ctx):
 
     # Join the author's voice chat
     # TODO: Play a high bark on entry
-    await ctx.author.voice.channel.connect()
-    ctx.bot.add_cog(audio_queue.AudioQueueList(ctx.bot.voice_clients[0]))
+    voice_client = await ctx.author.voice.channel.connect()
+    audio_queue_list = audio_queue.add_audio_queue_list(
+        ctx.guild.id,
+        voice_client
+    )
+
+    # Let the author know if audio queued before the bot last left was restored
+    content = "I have tried to connect to your voice channel."
+    num_audio_files_queued = audio_queue_list.get_num_audio_files_queued()
+    if num_audio_files_queued > 0:
+        content += f"\nRestored `{num_audio_files_queued}` audio files " \
+            + "queued from before I last left voice chat, see them with " \
+            + "`/voice queue list`."
     await ctx.respond(
         ephemeral = False,
         delete_after = 60*30,
-        content = "I have tried to connect to your voice channel."
+        content = content
     )
     return True
 
@@ -100,8 +120,8 @@ async def voice_leave(ctx):
     """
     # Leave the author's voice chat
     # TODO: Play a low bark on exit
+    audio_queue.remove_audio_queue_list(ctx.guild.id)
     await ctx.voice_client.disconnect()
-    ctx.bot.remove_cog("AudioQueueList")
     await ctx.respond(
         ephemeral=False,
         delete_after=60*30,
@@ -121,7 +141,6 @@ voice_queue_slash_command_group = voice_slash_command_group.create_subgroup(
     checks = [
         ctx_check.assert_bot_is_in_voice_chat,
         ctx_check.assert_bot_is_in_same_voice_chat_as_author,
-        ctx_check.assert_bot_audio_queue_length_is_non_zero,
     ],
     #name_localizations = default,
     #description_localizations = default,
@@ -132,6 +151,7 @@ voice_queue_slash_command_group = voice_slash_command_group.create_subgroup(
 @voice_queue_slash_command_group.command(
     name="remove",
     description="Make me skip playing a certain item in my audio queue.",
+    checks=[ctx_check.assert_bot_audio_queue_length_is_non_zero]
 )
 async def voice_queue_remove(
     ctx,
@@ -143,35 +163,48 @@ async def voice_queue_remove(
     ),
     priority: discord.Option(
         int,
-        description="The priority level of the audio queue item to skip.",
+        description="If skipping top of queue, the priority level of the " \
+            "queue to skip the top of.",
         default=0
     )
 ):
     """Tell bot to remove a certain item from its audio queue.
 
     Make bot remove the audio queue element specified by audio_queue_element_id
-    from its audio queue. If None is provided, remove the top of the audio
-    queue, effectively skipping whatever is currently playing or will play next.
+    from its audio queue. If None is provided, remove the audio the scheduling
+    policy of the given priority is playing, or will play next, effectively
+    skipping it.
 
     Args:
         ctx: The context this SlashCommand was called under
         audio_queue_element_id: The audio_queue_element_id of the
             AudioQueueElement to remove from audio_queue
+        priority: If audio_queue_element_id is None, the priority level of the
+            queue to remove the top of
     """
     # Get the audio queue,
-    # fill in the audio_queue_element_id if None was provided
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    # fill in the audio_queue_element_id if None was provided, with the audio
+    # the priority's scheduling policy is playing, or will play next
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
     if audio_queue_element_id is None:
-        audio_queue_element_id = \
-            audio_queue_list.queue_list[priority][0].audio_queue_element_id
+        audio_queue_element = None
+        if 0 <= priority < audio_queue_list.num_priority_levels:
+            audio_queue_element = audio_queue_list.policy_list[priority].peek()
+        if audio_queue_element is None:
+            await ctx.respond(
+                ephemeral=True,
+                content="There is no audio in my audio queue with a " \
+                    + f"priority of `{priority}`."
+            )
+            return False
+        audio_queue_element_id = audio_queue_element.audio_queue_element_id
 
     # Try to remove audio_queue_element_id from audio_queue
-    if audio_queue_list.remove(audio_queue_element_id, priority) is False:
+    if audio_queue_list.remove(audio_queue_element_id) is False:
         await ctx.respond(
             ephemeral=True,
-            content="I could not find an item in my audio queue with a " \
-                + f"priority of `{priority}` and an ID of " \
-                + f"`{audio_queue_element_id}`."
+            content="I could not find an item in my audio queue with an ID " \
+                + f"of `{audio_queue_element_id}`."
         )
         return False
 
@@ -179,9 +212,94 @@ async def voice_queue_remove(
     await ctx.respond(
         ephemeral=False,
         delete_after=60,
-        content="I removed the audio queue item with a priority of " \
-            + f"`{priority}` and ID of `{audio_queue_element_id}` from my " \
-            + "audio queue."
+        content="I removed the audio queue item with an ID of " \
+            + f"`{audio_queue_element_id}` from my audio queue."
+    )
+    return True
+
+
+
+@voice_queue_slash_command_group.command(
+    name="bump",
+    description="Make me play a certain item in my audio queue next.",
+    checks=[ctx_check.assert_bot_audio_queue_length_is_non_zero]
+)
+async def voice_queue_bump(
+    ctx,
+    audio_queue_element_id: discord.Option(
+        int,
+        description="ID of audio queue item to play next."
+    )
+):
+    """Tell bot to move a certain item to the top of its audio queue.
+
+    Make bot move the audio queue element specified by audio_queue_element_id
+    ahead of all other audio of the same priority in its audio queue, right
+    after any audio of that priority already playing.
+
+    Args:
+        ctx: The context this SlashCommand was called under
+        audio_queue_element_id: The audio_queue_element_id of the
+            AudioQueueElement to move to the top of audio_queue
+    """
+    # Get the audio queue, try to move audio_queue_element_id to its top
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
+    if audio_queue_list.move_to_front(audio_queue_element_id) is False:
+        await ctx.respond(
+            ephemeral=True,
+            content="I could not find an item in my audio queue with an ID " \
+                + f"of `{audio_queue_element_id}`."
+        )
+        return False
+
+    await ctx.respond(
+        ephemeral=False,
+        delete_after=60,
+        content="I moved the audio queue item with an ID of " \
+            + f"`{audio_queue_element_id}` to the top of my audio queue."
+    )
+    return True
+
+
+
+@voice_queue_slash_command_group.command(
+    name="capacity",
+    description="Change how many items my audio queue can hold in this guild.",
+)
+async def voice_queue_capacity(
+    ctx,
+    max_queue_length: discord.Option(
+        int,
+        description="The most items to allow in my audio queue, from 1 to " \
+            + f"{audio_queue.MAX_MAX_QUEUE_LENGTH}.",
+        min_value=1,
+        max_value=audio_queue.MAX_MAX_QUEUE_LENGTH
+    )
+):
+    """Tell bot how many items to allow in its audio queue.
+
+    Change the maximum number of audio queue elements the bot allows in its
+    audio queue for this guild. Audio already queued is kept.
+
+    Args:
+        ctx: The context this SlashCommand was called under
+        max_queue_length: The maximum number of AudioQueueElement to allow in
+            audio_queue
+    """
+    # Get the audio queue, try to change its capacity
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
+    if audio_queue_list.set_max_queue_length(max_queue_length) is False:
+        await ctx.respond(
+            ephemeral=True,
+            content="Please give me a capacity from 1 to " \
+                + f"`{audio_queue.MAX_MAX_QUEUE_LENGTH}`."
+        )
+        return False
+
+    await ctx.respond(
+        ephemeral=False,
+        delete_after=60,
+        content=f"My audio queue can now hold `{max_queue_length}` items."
     )
     return True
 
@@ -190,6 +308,7 @@ async def voice_queue_remove(
 @voice_queue_slash_command_group.command(
     name="pause",
     description="Ask me to pause or unpause playing my audio queue.",
+    checks=[ctx_check.assert_bot_audio_queue_length_is_non_zero]
 )
 async def voice_queue_pause(
     ctx,
@@ -211,7 +330,7 @@ async def voice_queue_pause(
         action: Whether to start or stop pausing audio queue
     """
     # Get the audio queue, set whether to pause or unpause it
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
     if action == "start":
         audio_queue_list.pause()
         await ctx.respond(ephemeral=True, content="I paused my audio queue.")
@@ -226,6 +345,7 @@ async def voice_queue_pause(
 @voice_queue_slash_command_group.command(
     name="list",
     description="Give you a list of what is currently in my audio queue.",
+    checks=[ctx_check.assert_bot_audio_queue_length_is_non_zero]
 )
 async def voice_queue_list(ctx):
     """Tell bot to list audio queue.
@@ -236,15 +356,16 @@ async def voice_queue_list(ctx):
         ctx: The context this SlashCommand was called under
     """
     # Get the audio queue
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
 
     # Make a list of strings, each list element afer the 1st representing an
-    # AudioQueueElement
+    # AudioQueueElement, in the order each priority's scheduling policy is
+    # expected to play them
     page_list = ["Summary:" \
         + "\n`Priority : Audio Queue Element ID : " \
         + "First 50 characters of description`"]
-    for queue in reversed(audio_queue_list.queue_list):
-        for audio_queue_element in queue:
+    for policy in reversed(audio_queue_list.policy_list):
+        for audio_queue_element in policy.iterate_play_order():
             page_list[0] += f"\n`{audio_queue_element.priority} : "\
                 f"{audio_queue_element.audio_queue_element_id} : " \
                 + f"{audio_queue_element.description[:49]}`"
@@ -254,3 +375,145 @@ async def voice_queue_list(ctx):
     paginator = pages.Paginator(pages=page_list, loop_pages=False)
     await paginator.respond(ctx.interaction, ephemeral=True)
     return True
+
+
+
+@voice_queue_slash_command_group.command(
+    name="history",
+    description="Give you a list of the audio I most recently played here."
+)
+async def voice_queue_history(ctx):
+    """Tell bot to list the audio it most recently played.
+
+    Tell the bot to give you a list of the audio that most recently finished
+    playing in this guild, most recent first, with the index to replay each
+    with.
+
+    Args:
+        ctx: The context this SlashCommand was called under
+    """
+    history = audio_history.get_history(ctx.guild.id)
+    if len(history) == 0:
+        await ctx.respond(
+            ephemeral=True,
+            content="I haven't finished playing any audio here yet."
+        )
+        return False
+
+    # Make a list of strings, each listing up to HISTORY_PAGE_LENGTH of the
+    # audio in history
+    page_list = []
+    for index, played_audio in enumerate(history):
+        if index % HISTORY_PAGE_LENGTH == 0:
+            page_list.append("Recently played, replay any with " \
+                + "`/voice queue replay $index`:" \
+                + "\n`Index : Author : First 50 characters of description " \
+                + ": Finished`")
+        page_list[-1] += played_audio.to_str(index + 1)
+
+    # Return a neat page view of the history
+    paginator = pages.Paginator(pages=page_list, loop_pages=False)
+    await paginator.respond(ctx.interaction, ephemeral=True)
+    return True
+
+
+
+@voice_queue_slash_command_group.command(
+    name="replay",
+    description="Make me queue audio I recently played here again."
+)
+async def voice_queue_replay(
+    ctx,
+    history_index: discord.Option(
+        int,
+        description="Index of the audio in `/voice queue history` to replay. " \
+            "Leave blank for the last audio played.",
+        default=1,
+        min_value=1,
+        max_value=audio_history.HISTORY_LENGTH
+    )
+):
+    """Tell bot to queue audio it recently played again.
+
+    Make bot queue the audio at history_index in this guild's history again,
+    straight from the file it was played from, with the same priority and
+    volume, so nothing is downloaded or made again.
+
+    Args:
+        ctx: The context this SlashCommand was called under
+        history_index: Where the audio to replay is in this guild's history,
+            1 = most recently played
+    """
+    # Get the audio to replay, if its file is still cached
+    played_audio = audio_history.get(ctx.guild.id, history_index)
+    if played_audio is None:
+        await ctx.respond(
+            ephemeral=True,
+            content="I have no audio in my history with an index of " \
+                + f"`{history_index}`, see `/voice queue history`."
+        )
+        return False
+    if not os.path.isfile(played_audio.file_path):
+        await ctx.respond(
+            ephemeral=True,
+            content=f"`{played_audio.description[:49]}` is no longer in my " \
+                + "cache, please queue it again with the command that first " \
+                + "queued it."
+        )
+        return False
+
+    # Don't queue audio there isn't room in queue for, and tell author how long
+    # they'd have to wait
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
+    if not audio_queue_list.can_admit(
+        author_user_id = ctx.author.id,
+        priority = played_audio.priority,
+        seconds = played_audio.duration or 0.0
+    ):
+        seconds_until_played = \
+            audio_queue_list.get_seconds_until_new_audio_plays(
+                played_audio.priority
+            )
+        await ctx.respond(
+            ephemeral=True,
+            content="My audio queue already has as much audio of priority " \
+                + f"level `{played_audio.priority}` as it can hold, from " \
+                + "everyone or from you." \
+                + "\nAudio queued now would wait about " \
+                + "`" + audio_queue.seconds_to_timestamp(
+                    round(seconds_until_played)
+                ) + "` to play, please try again later."
+        )
+        return False
+
+    # Queue the audio again, as it was played
+    audio_queue_element_id = audio_queue_list.add(
+        ctx = ctx,
+        description = played_audio.description,
+        file_path = played_audio.file_path,
+        priority = played_audio.priority,
+        gain = played_audio.gain,
+        duration = played_audio.duration
+    )
+    if audio_queue_element_id == -1:
+        await ctx.respond(
+            ephemeral=True,
+            content="I could not add " \
+                + f"`{played_audio.description[:49]}` to my audio queue, it " \
+                + "may be full."
+        )
+        return False
+
+    seconds_until_played = audio_queue_list.get_seconds_until_played(
+        audio_queue_element_id = audio_queue_element_id
+    )
+    await ctx.respond(
+        ephemeral=False,
+        delete_after=60,
+        content=f"I queued `{played_audio.description[:49]}` again as ID " \
+            + f"`{audio_queue_element_id}`, it should play in about " \
+            + "`" + audio_queue.seconds_to_timestamp(
+                round(seconds_until_played)
+            ) + "`."
+    )
+    return True
@@ -8,6 +8,15 @@ videos in their current connected voice chat.
 # Import public libraries                                                      #
 #==============================================================================#
 
+# Import API for running downloads in the background
+import asyncio
+
+# Import API for making functions with some arguments already filled in
+import functools
+
+# Import API for keeping track of time
+import time
+
 # Import interface to interact with YouTube
 import youtube_dl
 
@@ -27,10 +36,32 @@ from discord_slash_commands.helpers import audio_queue
 # Define underlying structure                                                  #
 #==============================================================================#
 
+# Define the format to download and store Youtube audio files as
+YOUTUBE_AUDIO_FORMAT = file_cache.AUDIO_FORMAT_OPUS
+
+# Define whether to start playing audio that isn't cached yet by streaming it
+# from YouTube, while it's downloaded to cache in the background, instead of
+# waiting for the whole file to download before queueing it. The stream and the
+# download are separate fetches, so audio that's streamed is fetched from
+# YouTube twice, trading bandwidth for a shorter wait.
+YOUTUBE_STREAM_WHILE_DOWNLOADING = True
+
+
+
+# Define a global dictionary of downloads in progress, where each key is the
+# name a file will have in youtube_file_cache, and each value is the
+# asyncio.Task downloading it, so the same video is never downloaded twice at
+# once
+global download_task_dict
+download_task_dict = {}
+
+
+
 # Create instance of file cache for Youtube audio files
 youtube_file_cache = file_cache.FileCacheList(
     directory = "youtube",
-    max_bytes = 100 * 1000000
+    max_bytes = 100 * 1000000,
+    audio_format = YOUTUBE_AUDIO_FORMAT
 )
 
 
@@ -155,7 +186,8 @@ class YoutubeFile():
         url: The url of the YouTube video to use youtube-dl to download
         video_file_name: If the url was valid, the name of the video file
             pointed to by it, stripped of non-ASCII characters.
-        audio_file_name: video_file_name, but with an mp3 file type instead
+        audio_file_name: video_file_name, but with a YOUTUBE_AUDIO_FORMAT file
+            type instead
         length_in_seconds: An integer containing the length of the YouTube video
             pointed to by url, in seconds.
         logger: A logger instance to hold exactly how the youtube-dl transaction
@@ -213,12 +245,13 @@ class YoutubeFile():
                 return
 
         # The url was valid, set self.video_file_name and derive
-        # self.audio_file_name from it (the same file name, but ending in .mp3)
+        # self.audio_file_name from it (the same file name, but ending in
+        # .YOUTUBE_AUDIO_FORMAT)
         debug_messages = self.logger.get_messages("debug")
         self.video_file_name = debug_messages[1]
         index_of_last_period = self.video_file_name.rfind(".")
         self.audio_file_name = self.video_file_name[0:index_of_last_period] \
-            + ".mp3"
+            + f".{YOUTUBE_AUDIO_FORMAT}"
 
         # Derive self.length_in_seconds from HH:MM:SS-like timestamp
         self.length_in_seconds = audio_queue.timestamp_to_seconds(
@@ -228,10 +261,12 @@ class YoutubeFile():
     def download(self, directory : str) -> bool:
         """Download the YouTube video pointed to by self.url.
 
-        Try to download the YouTube video pointed to by self.url to
-        directory/self.audio_file_name. youtube-dl will take care of converting
-        the video file to pure audio and restricting the allowed video length
-        of the download.
+        Try to download the best audio of the YouTube video pointed to by
+        self.url to directory/self.video_file_name, as is. It isn't converted
+        to YOUTUBE_AUDIO_FORMAT here, youtube_file_cache.add() does that, so
+        only the conversion, not the whole download, is run as batch FFmpeg
+        work. Blocks while downloading, so call it from a thread other than
+        the bot's event loop.
 
         Args:
             self: This YoutubeFile
@@ -262,21 +297,13 @@ class YoutubeFile():
             "outtmpl" : f"{directory}/{self.video_file_name}",
             # Stop on download errors
             "ignoreerrors" : False,
-            # In post-processing, turn video to mp3 via ffmpeg
-            "postprocessors" : [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            # Do not keep the video file after post-processing
-            "keepvideo" : False,
             # Catch youtube-dl output in a custom logger class
             "logger" : self.logger,
         }
 
         # Start youtube-dl with youtube_dl_options, if everything went well
-        # according to our options, youtube-dl will download the YouTube video
-        # at self.url to directory/self.audio_file_name.
+        # according to our options, youtube-dl will download the audio of the
+        # YouTube video at self.url to directory/self.video_file_name.
         with youtube_dl.YoutubeDL(youtube_dl_options) as ydl:
             try:
                 ydl.download([self.url,])
@@ -288,6 +315,132 @@ class YoutubeFile():
         # There was no issue and the file was downloaded, return success
         return True
 
+    def get_stream_url(self):
+        """Get a URL to stream the audio of the YouTube video at self.url from.
+
+        Ask youtube-dl for the URL of the best audio of the video, without
+        downloading it, so FFmpeg can play it as it's streamed. Blocks while
+        waiting on YouTube, so call it from a thread other than the bot's event
+        loop.
+
+        Args:
+            self: This YoutubeFile
+
+        Returns:
+            The URL of the audio, None if it couldn't be found.
+        """
+        logger = YoutubeDlLogger()
+        youtube_dl_options = {
+            # Stream format with best audio quality
+            "format" : "bestaudio/best",
+            # If the URL is of an item in a playlist, just get the individual
+            # video instead of the playlist
+            "noplaylist" : True,
+            # Do not print (most) messages to stdout
+            "quiet" : True,
+            # Catch youtube-dl output in a custom logger class
+            "logger" : logger,
+        }
+        with youtube_dl.YoutubeDL(youtube_dl_options) as ydl:
+            try:
+                info_dict = ydl.extract_info(self.url, download = False)
+            except youtube_dl.utils.DownloadError:
+                # There was an issue accessing self.url, print verbose logs
+                logger.print_log()
+                return None
+        return info_dict.get("url", None)
+
+
+
+def download_and_add(youtube_file: YoutubeFile) -> bool:
+    """Download youtube_file, then add it to youtube_file_cache.
+
+    Adding it converts it to YOUTUBE_AUDIO_FORMAT, as batch FFmpeg work. Blocks
+    until done, so call it from a thread other than the bot's event
+    loop.
+
+    Args:
+        youtube_file: The YoutubeFile to download
+
+    Returns:
+        Whether youtube_file was downloaded and added to youtube_file_cache.
+    """
+    return youtube_file.download(file_cache.CACHE_DIR) is True and \
+        youtube_file_cache.add(
+            file_name = youtube_file.video_file_name,
+            normalize_audio = True
+        ) is True
+
+
+
+def download_to_cache(youtube_file: YoutubeFile) -> asyncio.Task:
+    """Download youtube_file to youtube_file_cache in the background.
+
+    Start downloading youtube_file, outside the event loop, so audio keeps
+    playing meanwhile, unless it's already being downloaded. The download
+    mostly waits on YouTube, so it's run in the event loop's default executor,
+    only waiting for a batch FFmpeg slot to convert the downloaded file.
+
+    Args:
+        youtube_file: The YoutubeFile to download
+
+    Returns:
+        The asyncio.Task downloading youtube_file, which results in whether it
+        was downloaded and added to youtube_file_cache.
+    """
+    cached_file_name = youtube_file_cache.get_cached_file_name(
+        youtube_file.audio_file_name
+    )
+    if cached_file_name not in download_task_dict:
+        download_task = asyncio.ensure_future(
+            asyncio.get_running_loop().run_in_executor(
+                None,
+                download_and_add,
+                youtube_file
+            )
+        )
+        download_task_dict[cached_file_name] = download_task
+        download_task.add_done_callback(
+            lambda _: download_task_dict.pop(cached_file_name, None)
+        )
+    return download_task_dict[cached_file_name]
+
+
+
+def set_gain_once_cached(
+    audio_queue_list: audio_queue.AudioQueueList,
+    audio_queue_element_id: int,
+    download_task: asyncio.Task
+) -> None:
+    """Normalize streamed audio by its cached file, if it hasn't started yet.
+
+    Once download_task has added the audio being streamed to
+    youtube_file_cache, and its loudness measured, set the gain of its
+    AudioQueueElement to normalize it, unless it has already started playing,
+    so its volume doesn't jump partway through.
+
+    Args:
+        audio_queue_list: The AudioQueueList the audio was queued in
+        audio_queue_element_id: The ID of the AudioQueueElement of the audio
+        download_task: The finished asyncio.Task that downloaded the audio
+    """
+    if download_task.cancelled() or download_task.exception() is not None or \
+        download_task.result() is not True:
+        return
+
+    # Don't change audio queues closed since the audio was queued
+    if audio_queue.get_audio_queue_list(audio_queue_list.guild_id) is not \
+        audio_queue_list:
+        return
+    audio_queue_element = audio_queue_list.get(audio_queue_element_id)
+    if audio_queue_element is None or audio_queue_element.is_playing() or \
+        audio_queue_element.time_played > 0:
+        return
+    audio_queue_element.gain = file_cache.get_gain(
+        audio_queue_element.file_path
+    )
+    audio_queue_list.mark_snapshot_dirty(audio_queue_element_id)
+
 
 
 @youtube_slash_command_group.command(
@@ -317,6 +470,9 @@ async def youtube_play(
         ctx: The context this SlashCommand was called under
         url: The URL for the YouTube video or playlist to download and play
     """
+    # Remember when this command was called, to measure how long playing takes
+    time_enqueued = time.time()
+
     # Check validity of URL
     if not(url.startswith("https://youtu.be/") or \
         url.startswith("https://www.youtube.com/playlist?list=")):
@@ -337,7 +493,14 @@ async def youtube_play(
     # Fill empty list, how many files to play will be determined by if the url
     # was a playlist or a single video
     if "/playlist?" not in url:
-        youtube_file_list.append(YoutubeFile(url))
+        # Look the video up outside the event loop, it waits on YouTube
+        youtube_file_list.append(
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                YoutubeFile,
+                url
+            )
+        )
     else:
         ctx.respond(
             ephemeral=True,
@@ -363,7 +526,7 @@ async def youtube_play(
     )
 
     # Get AudioQueue cog
-    audio_queue_list = ctx.bot.get_cog("AudioQueueList")
+    audio_queue_list = audio_queue.get_audio_queue_list(ctx.guild.id)
 
     # Download and queue all audio files
     rsp = ""
@@ -381,39 +544,104 @@ async def youtube_play(
                 + "max allowed video length of 30 minutes."
             continue
 
+        # Don't download audio there isn't room in queue for, and tell author
+        # how long they'd have to wait
+        if not audio_queue_list.can_admit(
+            author_user_id = ctx.author.id,
+            priority = audio_queue.LOW_PRIORITY,
+            seconds = youtube_file.length_in_seconds
+        ):
+            seconds_until_played = \
+                audio_queue_list.get_seconds_until_new_audio_plays(
+                    audio_queue.LOW_PRIORITY
+                )
+            rsp += f"\nRefusing to play: {youtube_file.url}, my audio queue " \
+                + "already has as much low-priority (priority level " \
+                + f"`{audio_queue.LOW_PRIORITY}`) audio as it can hold, from " \
+                + "everyone or from you. Audio queued now would wait about " \
+                + "`" + audio_queue.seconds_to_timestamp(
+                    round(seconds_until_played)
+                ) + "` to play, please try again later."
+            continue
+
         # Download the audio file for this video if it's not already downloaded
-        if not youtube_file_cache.file_exists(youtube_file.audio_file_name):
-            # Download to intermediate cache, then move to youtube file cache
-            if youtube_file.download(file_cache.CACHE_DIR) is False or \
-                youtube_file_cache.add(
-                    file_name = youtube_file.audio_file_name,
-                    normalize_audio = True
-                ) is False:
-                rsp += f"\nError downloading: {youtube_file.url}"
-                continue
-
-        # Add the downloaded file to audio queue
+        cached_file_name = youtube_file_cache.get_cached_file_name(
+            youtube_file.audio_file_name
+        )
+        stream_url = None
+        download_task = None
+        if not youtube_file_cache.file_exists(cached_file_name):
+            # Download to intermediate cache, then move to youtube file cache,
+            # outside the event loop, so audio keeps playing meanwhile
+            download_task = download_to_cache(youtube_file)
+
+            # Stream the audio until it's downloaded, if it can be streamed,
+            # otherwise wait for it to download
+            if YOUTUBE_STREAM_WHILE_DOWNLOADING is True:
+                try:
+                    stream_url = await asyncio.get_running_loop() \
+                        .run_in_executor(None, youtube_file.get_stream_url)
+                except (youtube_dl.utils.DownloadError, OSError) as error:
+                    print(error)
+            if stream_url is None:
+                is_downloaded = False
+                try:
+                    is_downloaded = await download_task
+                except (youtube_dl.utils.DownloadError, OSError) as error:
+                    print(error)
+                if is_downloaded is not True:
+                    rsp += f"\nError downloading: {youtube_file.url}"
+                    continue
+
+        # If the bot left or rejoined voice chat while the audio was
+        # downloading, its audio queue was closed, don't queue anything in it
+        if audio_queue.get_audio_queue_list(ctx.guild.id) is not \
+            audio_queue_list:
+            rsp += f"\nStopped queuing: {youtube_file.url}, I left voice " \
+                + "chat while downloading it."
+            break
+
+        # Add the downloaded file to audio queue, at a normalized volume
+        file_path = youtube_file_cache.get_file_path(cached_file_name)
         audio_queue_element_id = audio_queue_list.add(
             ctx = ctx,
             description = youtube_file.video_file_name,
-            file_path = f"{youtube_file_cache.directory}/" \
-                + f"{youtube_file.audio_file_name}",
-            priority = audio_queue.LOW_PRIORITY
+            file_path = file_path,
+            gain = file_cache.get_gain(file_path),
+            priority = audio_queue.LOW_PRIORITY,
+            time_enqueued = time_enqueued,
+            stream_url = stream_url,
+            duration = youtube_file.length_in_seconds or None,
+            is_coalescable = True
         )
         if audio_queue_element_id == -1:
             rsp += f"\nError queuing: {youtube_file.url}" \
                 + "\nWill stop adding more audio to my audio queue."
             break
 
+        # Normalize streamed audio once it's downloaded, if it's not playing
+        if stream_url is not None:
+            download_task.add_done_callback(functools.partial(
+                set_gain_once_cached,
+                audio_queue_list,
+                audio_queue_element_id
+            ))
+            rsp += f"\nStreaming {youtube_file.url} while it downloads."
+
         # Audio was sucessfully added to queue
         num_files_ahead = audio_queue_list.get_index_in_queue(
-            audio_queue_element_id = audio_queue_element_id,
-            priority = audio_queue.LOW_PRIORITY
+            audio_queue_element_id = audio_queue_element_id
+        )
+        seconds_until_played = audio_queue_list.get_seconds_until_played(
+            audio_queue_element_id = audio_queue_element_id
         )
         rsp += f"\nSuccessfully queued: {youtube_file.url} as ID " \
             + f"`{audio_queue_element_id}`." \
             + f"\nThere are `{num_files_ahead}` other low-priority (priority " \
-            + f"level `{audio_queue.LOW_PRIORITY}`) audio files ahead of you."
+            + f"level `{audio_queue.LOW_PRIORITY}`) audio files ahead of " \
+            + "you, it should play in about `" \
+            + audio_queue.seconds_to_timestamp(round(seconds_until_played)) \
+            + "`."
 
     # Tell author status of all downloading and queuing
     await ctx.respond(ephemeral=True, content=rsp)
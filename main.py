@@ -29,6 +29,9 @@ from discord_slash_commands import misc
 # Import helper for interacting with internal database
 from discord_slash_commands.helpers import sqlite
 
+# Import helper for managing new files
+from discord_slash_commands.helpers import file_cache
+
 #==============================================================================#
 # Define underlying structure                                                  #
 #==============================================================================#
@@ -119,6 +122,51 @@ async def on_ready():
         ]
     )
 
+    # Create or get connection to existing cache index database, so what's
+    # been measured about cached audio files is only measured once
+    sqlite.add_connection(
+        file_name=file_cache.INDEX_FILE_NAME,
+        table_name_list=[file_cache.INDEX_TABLE_NAME],
+        column_list=[
+            "file_path TEXT NOT NULL PRIMARY KEY",
+            "integrated_loudness REAL",
+            "true_peak REAL",
+            "duration REAL"
+        ]
+    )
+
+    # Create or get connection to existing audio queue snapshot databases, so
+    # queued audio outlives the bot leaving voice chat or restarting
+    sqlite.add_connection(
+        file_name="audio_queues",
+        table_name_list=["queued_audio"],
+        column_list=[
+            "guild_id INTEGER NOT NULL",
+            "audio_queue_element_id INTEGER NOT NULL",
+            "author_user_id INTEGER NOT NULL",
+            "description TEXT NOT NULL",
+            "source_command TEXT NOT NULL",
+            "file_path TEXT NOT NULL",
+            "priority INTEGER NOT NULL",
+            "gain REAL NOT NULL",
+            "time_played REAL NOT NULL",
+            "queue_position REAL NOT NULL",
+            "repeat_count INTEGER NOT NULL DEFAULT 1",
+            "PRIMARY KEY (guild_id, audio_queue_element_id)"
+        ]
+    )
+    sqlite.add_connection(
+        file_name="audio_queue_settings",
+        table_name_list=["audio_queue_settings"],
+        column_list=[
+            "guild_id INTEGER NOT NULL PRIMARY KEY",
+            "volume REAL NOT NULL",
+            "max_queue_length INTEGER NOT NULL",
+            "is_paused INTEGER NOT NULL",
+            "next_audio_queue_element_id INTEGER NOT NULL"
+        ]
+    )
+
     # Print string in console to let bot owner know bot is connected to Discord
     # and ready to run commands
     print(f"{discord_bot.user} is ready and online!")